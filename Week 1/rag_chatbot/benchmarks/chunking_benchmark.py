@@ -0,0 +1,174 @@
+"""Compare the token-aware chunker against the original '. ' splitter.
+
+Reports chunking throughput on a folder of documents (plus an optional
+synthetic multi-megabyte input) and, when a questions file is given, the
+retrieval hit rate of each splitter: the share of questions for which one of
+the top-k chunks contains the expected answer text.
+
+Questions file format (JSONL):
+    {"question": "How many days of PTO do I get?", "answer": "25 days"}
+
+Usage:
+    python benchmarks/chunking_benchmark.py --docs ./documents \
+        --questions questions.jsonl -k 3 --synthetic-mb 8
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.document_processor import read_document  # noqa: E402
+from src.embedding_service import EmbeddingService  # noqa: E402
+from src.text_chunker import split_text  # noqa: E402
+from src.tokenizer import count_tokens  # noqa: E402
+
+
+def legacy_split_text(text: str, chunk_size: int = 500):
+    """The splitter this repository shipped before the token-aware chunker"""
+    sentences = text.replace('\n', ' ').split('. ')
+    chunks = []
+    current_chunk = []
+    current_size = 0
+
+    for sentence in sentences:
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+
+        if not sentence.endswith('.'):
+            sentence += '.'
+
+        sentence_size = len(sentence)
+
+        if current_size + sentence_size > chunk_size and current_chunk:
+            chunks.append(' '.join(current_chunk))
+            current_chunk = [sentence]
+            current_size = sentence_size
+        else:
+            current_chunk.append(sentence)
+            current_size += sentence_size
+
+    if current_chunk:
+        chunks.append(' '.join(current_chunk))
+
+    return chunks
+
+
+SPLITTERS = {
+    "legacy": legacy_split_text,
+    "token_aware": split_text
+}
+
+
+def load_documents(folder: str) -> dict:
+    documents = {}
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not os.path.isfile(path):
+            continue
+        try:
+            documents[name] = read_document(path)
+        except Exception as e:
+            print(f"Skipping {name}: {str(e)}")
+    return documents
+
+
+def synthetic_text(megabytes: float) -> str:
+    random.seed(0)
+    fragments = [
+        "The reimbursement limit is $50 per day.", "See Fig. 2 for details.",
+        "Contact Dr. Lee, e.g. via the portal.", "Error code E-1042 means the VPN token expired.",
+        "\n\n## Section heading\n", "\n- A list item", "Policy ID FIN-204 applies"
+    ]
+    parts, size = [], 0
+    while size < megabytes * 1024 * 1024:
+        fragment = random.choice(fragments)
+        parts.append(fragment)
+        size += len(fragment) + 1
+    return " ".join(parts)
+
+
+def benchmark_throughput(texts: list) -> dict:
+    total_bytes = sum(len(text.encode('utf-8')) for text in texts)
+    results = {}
+    for name, splitter in SPLITTERS.items():
+        start = time.perf_counter()
+        chunks = [chunk for text in texts for chunk in splitter(text)]
+        elapsed = time.perf_counter() - start
+        token_counts = [count_tokens(chunk) for chunk in chunks] or [0]
+        results[name] = {
+            "chunks": len(chunks),
+            "seconds": elapsed,
+            "mb_per_sec": total_bytes / (1024 * 1024) / elapsed if elapsed else 0.0,
+            "mean_tokens": float(np.mean(token_counts)),
+            "max_tokens": int(np.max(token_counts))
+        }
+    return results
+
+
+def benchmark_hit_rate(documents: dict, questions: list, k: int, embedder: EmbeddingService) -> dict:
+    query_vectors = np.array(embedder.embed([q["question"] for q in questions]), dtype=np.float32)
+    query_vectors /= np.linalg.norm(query_vectors, axis=1, keepdims=True)
+
+    results = {}
+    for name, splitter in SPLITTERS.items():
+        chunks = [chunk for text in documents.values() for chunk in splitter(text)]
+        chunk_vectors = np.array(embedder.embed(chunks), dtype=np.float32)
+        chunk_vectors /= np.linalg.norm(chunk_vectors, axis=1, keepdims=True)
+
+        top_k = np.argsort(-(query_vectors @ chunk_vectors.T), axis=1)[:, :k]
+        hits = 0
+        for question, indices in zip(questions, top_k):
+            answer = question["answer"].lower()
+            if any(answer in chunks[i].lower() for i in indices):
+                hits += 1
+
+        results[name] = {
+            "hit_rate": hits / len(questions),
+            "context_tokens": float(np.mean([
+                sum(count_tokens(chunks[i]) for i in indices) for indices in top_k]))
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--docs", help="Folder of .txt/.md/.pdf/.docx documents")
+    parser.add_argument("--questions", help="JSONL file of {question, answer} pairs")
+    parser.add_argument("-k", type=int, default=3, help="Chunks retrieved per question")
+    parser.add_argument("--synthetic-mb", type=float, default=0,
+                        help="Also time a synthetic input of this many megabytes")
+    args = parser.parse_args()
+
+    documents = load_documents(args.docs) if args.docs else {}
+    texts = list(documents.values())
+    if args.synthetic_mb:
+        texts.append(synthetic_text(args.synthetic_mb))
+    if not texts:
+        parser.error("Provide --docs and/or --synthetic-mb")
+
+    print("Chunking throughput")
+    print(f"{'splitter':<12} {'chunks':>8} {'seconds':>9} {'MB/s':>8} {'mean tok':>9} {'max tok':>8}")
+    for name, row in benchmark_throughput(texts).items():
+        print(f"{name:<12} {row['chunks']:>8} {row['seconds']:>9.3f} {row['mb_per_sec']:>8.2f} "
+              f"{row['mean_tokens']:>9.1f} {row['max_tokens']:>8}")
+
+    if args.questions and documents:
+        with open(args.questions, 'r', encoding='utf-8') as file:
+            questions = [json.loads(line) for line in file if line.strip()]
+
+        print(f"\nRetrieval hit rate@{args.k} over {len(questions)} questions")
+        print(f"{'splitter':<12} {'hit rate':>9} {'context tok':>12}")
+        hit_rates = benchmark_hit_rate(documents, questions, args.k, EmbeddingService())
+        for name, row in hit_rates.items():
+            print(f"{name:<12} {row['hit_rate']:>9.1%} {row['context_tokens']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Offline retrieval and answer evaluation for RAGChatbot.
+
+Runs a JSONL file of questions with their expected source documents through
+the batch retrieval path and reports recall@k and MRR over the retrieved
+chunks, per-question retrieval latency percentiles and, with --generate,
+answer latency and token usage from batch_query. With --min-recall/--min-mrr
+the exit code is non-zero when a metric drops below the threshold, so the
+script can gate retrieval changes.
+
+Questions file format (JSONL):
+    {"question": "What is the meal allowance?", "sources": ["reimbursement_policy.md"]}
+
+Usage:
+    python benchmarks/eval_runner.py --questions eval.jsonl -k 5 \
+        --min-recall 0.8 --generate --concurrency 8 --json report.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def load_questions(path: str):
+    questions = []
+    with open(path, 'r', encoding='utf-8') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            sources = row.get("sources") or [row["source"]]
+            questions.append((row["question"], set(sources)))
+    return questions
+
+
+def retrieval_metrics(ranked_sources, expected) -> tuple:
+    """Recall of expected sources in the top-k chunks, and reciprocal rank of the first hit"""
+    recall = len(expected.intersection(ranked_sources)) / len(expected)
+    reciprocal_rank = next(
+        (1.0 / rank for rank, source in enumerate(ranked_sources, start=1) if source in expected), 0.0)
+    return recall, reciprocal_rank
+
+
+def percentiles(values) -> dict:
+    p50, p95, p99 = np.percentile(values, [50, 95, 99]) * 1000
+    return {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99}
+
+
+def evaluate(chatbot, questions, k: int, tenant=None, where=None, generate: bool = False,
+             concurrency: int = None) -> dict:
+    texts = [question for question, _ in questions]
+
+    start = time.perf_counter()
+    _, results = chatbot.retrieve_batch(texts, k, tenant, where)
+    batch_seconds = time.perf_counter() - start
+
+    recalls, reciprocal_ranks = [], []
+    for (_, expected), search_results in zip(questions, results):
+        ranked_sources = [meta['source'] for meta in search_results['metadatas'][0]]
+        recall, reciprocal_rank = retrieval_metrics(ranked_sources, expected)
+        recalls.append(recall)
+        reciprocal_ranks.append(reciprocal_rank)
+
+    # The interactive path retrieves one question at a time
+    latencies = []
+    vector_db = chatbot.get_vector_db(tenant)
+    for question in texts:
+        start = time.perf_counter()
+        embedding = vector_db.embedder.embed_query(question)
+        chatbot._rerank(question, vector_db.search(
+            question, chatbot._candidate_count(k), embedding, where), k)
+        latencies.append(time.perf_counter() - start)
+
+    report = {
+        "questions": len(questions),
+        "k": k,
+        f"recall@{k}": float(np.mean(recalls)),
+        "mrr": float(np.mean(reciprocal_ranks)),
+        "batch_retrieval_seconds": batch_seconds,
+        "retrieval_latency": percentiles(latencies)
+    }
+
+    if generate:
+        start = time.perf_counter()
+        answers = chatbot.batch_query(texts, k, concurrency, tenant, where)
+        elapsed = time.perf_counter() - start
+        prompt_tokens = sum(answer["prompt_tokens"] for answer in answers)
+        completion_tokens = sum(answer["completion_tokens"] for answer in answers)
+        report["generation"] = {
+            "seconds": elapsed,
+            "questions_per_sec": len(answers) / elapsed if elapsed > 0 else 0.0,
+            "latency": percentiles([answer["generation_seconds"] for answer in answers]),
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "avg_prompt_tokens": prompt_tokens / len(answers),
+            "errors": sum(answer["error"] is not None for answer in answers),
+            "response_cache_hits": sum(answer["response_cache"] == "hit" for answer in answers)
+        }
+    return report
+
+
+def print_report(report: dict):
+    k = report["k"]
+    latency = report["retrieval_latency"]
+    print(f"\n{report['questions']} questions, k={k}")
+    print(f"  recall@{k}: {report[f'recall@{k}']:.3f}")
+    print(f"  MRR:       {report['mrr']:.3f}")
+    print(f"  batch retrieval: {report['batch_retrieval_seconds']:.2f}s")
+    print(f"  single-query retrieval: p50 {latency['p50_ms']:.1f} ms, "
+          f"p95 {latency['p95_ms']:.1f} ms, p99 {latency['p99_ms']:.1f} ms")
+    generation = report.get("generation")
+    if generation:
+        latency = generation["latency"]
+        print(f"  answers: {generation['questions_per_sec']:.1f} q/s, "
+              f"p50 {latency['p50_ms']:.0f} ms, p95 {latency['p95_ms']:.0f} ms, "
+              f"{generation['errors']} errors, {generation['response_cache_hits']} cache hits")
+        print(f"  tokens: {generation['prompt_tokens']} prompt "
+              f"({generation['avg_prompt_tokens']:.0f} per question), "
+              f"{generation['completion_tokens']} completion")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", required=True, help="JSONL file of questions and sources")
+    parser.add_argument("-k", type=int, default=5, help="chunks retrieved per question")
+    parser.add_argument("--persist-directory", default="chroma_db")
+    parser.add_argument("--tenant", default=None)
+    parser.add_argument("--filter", nargs="*", default=[],
+                        help="metadata filters such as department=it_docs")
+    parser.add_argument("--generate", action="store_true",
+                        help="also answer every question with batch_query")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="LLM calls in flight with --generate")
+    parser.add_argument("--min-recall", type=float, default=None)
+    parser.add_argument("--min-mrr", type=float, default=None)
+    parser.add_argument("--json", default=None, help="write the report to this file")
+    args = parser.parse_args()
+
+    from src.rag_chatbot import RAGChatbot
+    from src.vector_database import parse_filters
+
+    chatbot = RAGChatbot(args.persist_directory)
+    report = evaluate(chatbot, load_questions(args.questions), args.k, args.tenant,
+                      parse_filters(args.filter), args.generate, args.concurrency)
+    print_report(report)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+
+    failed = []
+    if args.min_recall is not None and report[f"recall@{args.k}"] < args.min_recall:
+        failed.append(f"recall@{args.k} {report[f'recall@{args.k}']:.3f} < {args.min_recall}")
+    if args.min_mrr is not None and report["mrr"] < args.min_mrr:
+        failed.append(f"MRR {report['mrr']:.3f} < {args.min_mrr}")
+    if failed:
+        print("\n❌ Regression gate failed: " + "; ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
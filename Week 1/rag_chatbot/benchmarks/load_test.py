@@ -0,0 +1,265 @@
+"""Load-test the async query path against a local mock Azure OpenAI server.
+
+Starts a local HTTP server (in a child process) that answers chat
+completions after a fixed delay plus a per-token delay, builds a small
+knowledge base, then runs 1, 10 and 100 concurrent sessions through
+AsyncRAGChatbot. Each session asks a standalone question followed by
+follow-ups, so contextualization and speculative retrieval are exercised.
+Reports per-query latency percentiles and throughput; with --stream, answers
+are streamed and time-to-first-token percentiles are reported as well.
+
+Usage:
+    python benchmarks/load_test.py --sessions 1 10 100 --turns 3 \
+        --llm-latency-ms 200 --token-ms 20 --hash-embeddings --stream
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+QUESTIONS = [
+    ("What is the VPN policy?", "Does it apply to contractors?", "What about interns?"),
+    ("How many vacation days do employees get?", "Can they be carried over?", "And sick days?"),
+    ("What is the travel reimbursement limit?", "Does that include meals?", "What about hotels?"),
+]
+
+DOCUMENTS = {
+    "vpn_policy.md": "# VPN Policy\n\nAll employees must connect through the corporate VPN "
+                     "when working remotely. Contractors receive VPN access for the length "
+                     "of their contract. Interns use the guest VPN profile.",
+    "leave_policy.md": "# Leave Policy\n\nEmployees get 25 vacation days per year. Up to 5 "
+                       "unused days can be carried over. Sick days are unlimited with a "
+                       "doctor's note after three consecutive days.",
+    "travel_policy.md": "# Travel Policy\n\nThe reimbursement limit is $50 per day for meals. "
+                        "Hotels are reimbursed up to $200 per night in major cities.",
+}
+
+
+class MockOpenAIServer:
+    """Minimal HTTP server answering chat completions after a delay.
+
+    Runs in its own process, so serving requests does not compete with the
+    chatbot under test for the GIL, and the simulated latency is a
+    non-blocking sleep so hundreds of requests can wait at once.
+    """
+
+    answer = ("Mock answer based on the provided context. " * 8).strip()
+
+    def __init__(self, latency_ms: float, token_ms: float = 0):
+        self.latency_seconds = latency_ms / 1000
+        self.token_seconds = token_ms / 1000
+        self.port = None
+        self._process = None
+
+    def start(self):
+        ports = multiprocessing.Queue()
+        self._process = multiprocessing.Process(target=self._serve, args=(ports,), daemon=True)
+        self._process.start()
+        self.port = ports.get(timeout=30)
+
+    def _serve(self, ports):
+        async def serve():
+            server = await asyncio.start_server(self._handle, "127.0.0.1", 0, backlog=1024)
+            ports.put(server.sockets[0].getsockname()[1])
+            await server.serve_forever()
+
+        asyncio.run(serve())
+
+    def shutdown(self):
+        self._process.terminate()
+        self._process.join()
+
+    def reply(self, body: dict) -> str:
+        user_message = body["messages"][-1]["content"]
+        question = re.search(r"Question:\n(.*)$", user_message, re.DOTALL)
+        # Contextualization requests get a rewritten question back
+        return f"{question.group(1)} (regarding company policy)" if question else self.answer
+
+    @staticmethod
+    def completion(body: dict, content: str) -> dict:
+        return {
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        }
+
+    @staticmethod
+    def chunk(body: dict, content: str) -> bytes:
+        payload = json.dumps({
+            "id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "finish_reason": None,
+                         "delta": {"role": "assistant", "content": content}}]
+        })
+        return f"data: {payload}\n\n".encode("utf-8")
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = re.search(rb"content-length:\s*(\d+)", head, re.IGNORECASE)
+            body = json.loads(await reader.readexactly(int(length.group(1)))) if length else {}
+
+            content = self.reply(body)
+            words = content.split(" ")
+            await asyncio.sleep(self.latency_seconds)
+            # One request per connection: idle keep-alive sockets made the
+            # client's pool stall for seconds at high concurrency
+            if body.get("stream"):
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                             b"Connection: close\r\n\r\n")
+                for i, word in enumerate(words):
+                    writer.write(self.chunk(body, word if i == 0 else " " + word))
+                    await writer.drain()
+                    await asyncio.sleep(self.token_seconds)
+                writer.write(b"data: [DONE]\n\n")
+            else:
+                await asyncio.sleep(self.token_seconds * len(words))
+                payload = json.dumps(self.completion(body, content)).encode("utf-8")
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                             b"Connection: close\r\n"
+                             b"Content-Length: " + str(len(payload)).encode() + b"\r\n\r\n" + payload)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+class HashingEmbedder:
+    """Model-free bag-of-words embedder, so the test measures the query path only"""
+
+    def __init__(self, dimensions: int = 256):
+        self.dimensions = dimensions
+
+    def embed(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+    def embed_queries(self, texts):
+        return self.embed(texts)
+
+    def embed_query(self, text):
+        vector = np.zeros(self.dimensions, dtype=np.float32)
+        for word in re.findall(r"\w+", text.lower()):
+            vector[int(hashlib.md5(word.encode()).hexdigest(), 16) % self.dimensions] += 1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def get_stats(self):
+        return {}
+
+
+def start_mock_server(latency_ms: float, token_ms: float = 0) -> MockOpenAIServer:
+    server = MockOpenAIServer(latency_ms, token_ms)
+    server.start()
+    return server
+
+
+def build_chatbot(work_dir: str, hash_embeddings: bool):
+    from src.async_rag_chatbot import AsyncRAGChatbot
+
+    # No response cache, so every turn reaches the mock LLM
+    os.environ["RESPONSE_CACHE_SIZE"] = "0"
+    chatbot = AsyncRAGChatbot(os.path.join(work_dir, "chroma_db"), ingest_workers=1)
+    if hash_embeddings:
+        chatbot.vector_db.embedder = HashingEmbedder()
+
+    docs_dir = os.path.join(work_dir, "docs")
+    os.makedirs(docs_dir, exist_ok=True)
+    for name, text in DOCUMENTS.items():
+        with open(os.path.join(docs_dir, name), "w", encoding="utf-8") as file:
+            file.write(text)
+    chatbot.add_documents(docs_dir)
+    return chatbot
+
+
+async def run_session(chatbot, questions, latencies: list, first_tokens: list, stream: bool):
+    session_id = chatbot.create_session()
+    for question in questions:
+        start = time.perf_counter()
+        if stream:
+            first_token = None
+            async for kind, _ in chatbot.query_stream(question, session_id):
+                if kind == "token" and first_token is None:
+                    first_token = time.perf_counter() - start
+            first_tokens.append(first_token)
+        else:
+            await chatbot.query(question, session_id)
+        latencies.append(time.perf_counter() - start)
+
+
+async def run_level(chatbot, sessions: int, turns: int, stream: bool) -> dict:
+    latencies, first_tokens = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*[
+        run_session(chatbot, QUESTIONS[i % len(QUESTIONS)][:turns], latencies, first_tokens, stream)
+        for i in range(sessions)])
+    elapsed = time.perf_counter() - start
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) * 1000
+    row = {"queries": len(latencies), "p50": p50, "p95": p95, "p99": p99,
+           "qps": len(latencies) / elapsed}
+    if first_tokens:
+        row["ttft_p50"], row["ttft_p95"] = np.percentile(first_tokens, [50, 95]) * 1000
+    return row
+
+
+async def main_async(args):
+    server = start_mock_server(args.llm_latency_ms, args.token_ms)
+    os.environ.update({
+        "AZURE_OPENAI_ENDPOINT": f"http://127.0.0.1:{server.port}",
+        "AZURE_OPENAI_API_KEY": "mock-key",
+        "AZURE_OPENAI_DEPLOYMENT_NAME": "mock-deployment",
+    })
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        chatbot = build_chatbot(work_dir, args.hash_embeddings)
+        try:
+            print(f"\nMock LLM latency {args.llm_latency_ms:.0f} ms + {args.token_ms:.0f} ms/token, "
+                  f"{args.turns} turns per session{', streaming' if args.stream else ''}")
+            header = f"{'sessions':>8} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'q/s':>8}"
+            if args.stream:
+                header += f" {'ttft p50':>9} {'ttft p95':>9}"
+            print(header)
+            for sessions in args.sessions:
+                row = await run_level(chatbot, sessions, args.turns, args.stream)
+                line = (f"{sessions:>8} {row['queries']:>8} {row['p50']:>8.1f} {row['p95']:>8.1f} "
+                        f"{row['p99']:>8.1f} {row['qps']:>8.1f}")
+                if args.stream:
+                    line += f" {row['ttft_p50']:>9.1f} {row['ttft_p95']:>9.1f}"
+                print(line)
+        finally:
+            await chatbot.close()
+            server.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 10, 100],
+                        help="Concurrent session counts to test")
+    parser.add_argument("--turns", type=int, default=3, choices=[1, 2, 3],
+                        help="Questions asked per session")
+    parser.add_argument("--llm-latency-ms", type=float, default=200,
+                        help="Delay of every mock completion")
+    parser.add_argument("--token-ms", type=float, default=20,
+                        help="Additional delay per generated word")
+    parser.add_argument("--stream", action="store_true",
+                        help="Stream answers and report time to first token")
+    parser.add_argument("--hash-embeddings", action="store_true",
+                        help="Use a model-free embedder instead of the sentence transformer")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
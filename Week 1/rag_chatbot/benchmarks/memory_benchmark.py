@@ -0,0 +1,108 @@
+"""Measure conversation memory footprint and history access at scale.
+
+Fills each backend with many sessions of chat turns and reports the memory
+it holds (tracemalloc), the time to build the prompt history of every
+session, and, for the SQLite backend, the size of the database on disk. The
+original unbounded dict-of-lists store is included as the baseline.
+
+Usage:
+    python benchmarks/memory_benchmark.py --sessions 10000 --turns 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.conversation_memory import ConversationMemory, SQLiteConversationMemory  # noqa: E402
+
+
+class LegacyConversationMemory:
+    """The store this repository shipped before bounded backends"""
+
+    def __init__(self):
+        self.conversations = {}
+
+    def create_session(self):
+        session_id = str(uuid.uuid4())
+        self.conversations[session_id] = []
+        return session_id
+
+    def add_message(self, session_id, role, content):
+        if session_id not in self.conversations:
+            self.conversations[session_id] = []
+        self.conversations[session_id].append({
+            "role": role,
+            "content": content,
+            "timestamp": datetime.now().isoformat()
+        })
+
+    def format_history_for_prompt(self, session_id, max_messages=5):
+        history = self.conversations.get(session_id, [])[-max_messages:]
+        formatted_history = ""
+        for msg in history:
+            role = "Human" if msg["role"] == "user" else "Assistant"
+            formatted_history += f"{role}: {msg['content']}\n\n"
+        return formatted_history.strip()
+
+
+def fill(memory, sessions: int, turns: int):
+    session_ids = []
+    for s in range(sessions):
+        session_id = memory.create_session()
+        for t in range(turns):
+            memory.add_message(session_id, "user", f"Question {t} of session {s}: what is the leave policy?")
+            memory.add_message(session_id, "assistant", f"Answer {t}: employees get 25 days of paid leave. " * 4)
+        session_ids.append(session_id)
+    return session_ids
+
+
+def run(name: str, factory, sessions: int, turns: int):
+    tracemalloc.start()
+    start = time.perf_counter()
+    memory = factory()
+    session_ids = fill(memory, sessions, turns)
+    fill_time = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for session_id in session_ids:
+        memory.format_history_for_prompt(session_id)
+    history_time = time.perf_counter() - start
+
+    print(f"{name:<10} held {current / 1e6:8.1f} MB (peak {peak / 1e6:8.1f} MB), "
+          f"fill {fill_time:6.2f}s, "
+          f"history {history_time / len(session_ids) * 1e6:7.1f} us/session")
+    return memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--turns", type=int, default=20)
+    parser.add_argument("--max-messages", type=int, default=20,
+                        help="per-session cap for the bounded backends")
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.turns} turns, cap {args.max_messages} messages\n")
+    run("legacy", LegacyConversationMemory, args.sessions, args.turns)
+    run("memory", lambda: ConversationMemory(max_messages=args.max_messages),
+        args.sessions, args.turns)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "conversations.sqlite")
+        memory = run("sqlite", lambda: SQLiteConversationMemory(
+            db_path, max_messages=args.max_messages), args.sessions, args.turns)
+        memory.close()
+        size = sum(os.path.getsize(os.path.join(tmp, f)) for f in os.listdir(tmp))
+        print(f"{'':<10} on disk {size / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
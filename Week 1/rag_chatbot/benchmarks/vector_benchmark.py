@@ -0,0 +1,124 @@
+"""Compare recall, latency and footprint of the Chroma and flat vector backends.
+
+Loads the same embeddings into VectorDatabase on Chroma and on the flat
+quantized backend (int8 and binary, with and without float re-scoring),
+then runs semantic_search for perturbed copies of stored vectors and reports
+recall@k against exact float32 search, query latency percentiles, size on
+disk and, for the flat backend, the bytes a brute-force query scans. By
+default the embeddings are synthetic clustered 384-d unit vectors; pass
+--embeddings with an .npy file of real ones for representative numbers.
+
+Usage:
+    python benchmarks/vector_benchmark.py --documents 50000 --queries 200 -k 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.flat_index import FlatVectorClient  # noqa: E402
+from src.vector_database import VectorDatabase  # noqa: E402
+
+
+class PrecomputedEmbedder:
+    """Maps "doc <i>" to row i of the embedding matrix"""
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+
+    def embed(self, texts):
+        return [self.vectors[int(text.split()[1])].tolist() for text in texts]
+
+    def get_stats(self):
+        return {}
+
+
+def synthetic_embeddings(documents: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(documents // 100, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), documents)]
+    vectors = vectors + 0.8 * rng.standard_normal((documents, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    distances = (queries ** 2).sum(axis=1)[:, None] + (vectors ** 2).sum(axis=1)[None] \
+        - 2 * queries @ vectors.T
+    return np.argsort(distances, axis=1)[:, :k]
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, dirs, files in os.walk(path):
+        # Only the vector store itself; the BM25 index is the same for every backend
+        dirs[:] = [name for name in dirs if name != "bm25_index"]
+        total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+    return total
+
+
+def run(name: str, client_factory, vectors: np.ndarray, queries: np.ndarray,
+        truth: np.ndarray, k: int, batch_size: int = 5000):
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ["RETRIEVAL_MODE"] = "dense"
+        vector_db = VectorDatabase(tmp, PrecomputedEmbedder(vectors), client=client_factory(tmp))
+
+        start = time.perf_counter()
+        for offset in range(0, len(vectors), batch_size):
+            rows = range(offset, min(offset + batch_size, len(vectors)))
+            vector_db.upsert([f"id{i}" for i in rows], [f"doc {i}" for i in rows],
+                             [{"source": f"doc_{i % 100}.md", "chunk": i} for i in rows])
+        vector_db.commit()
+        load_time = time.perf_counter() - start
+
+        latencies, recalls = [], []
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            results = vector_db.semantic_search("", k, query.tolist())
+            latencies.append(time.perf_counter() - start)
+            found = {int(id_[2:]) for id_ in results['ids'][0]}
+            recalls.append(len(found.intersection(expected.tolist())) / k)
+
+        p50, p95 = np.percentile(latencies, [50, 95]) * 1000
+        usage = vector_db.get_collection_info().get("flat_index")
+        scanned = f"{usage['scanned_bytes'] / 1e6:8.1f} MB" if usage else f"{'n/a':>11}"
+        print(f"{name:<22} recall@{k} {np.mean(recalls):.3f}  p50 {p50:7.2f} ms  p95 {p95:7.2f} ms  "
+              f"disk {directory_size(tmp) / 1e6:8.1f} MB  scanned {scanned}  load {load_time:6.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--embeddings", default=None, help=".npy file of document embeddings")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = np.load(args.embeddings).astype(np.float32)[:args.documents]
+    else:
+        vectors = synthetic_embeddings(args.documents, args.dim)
+    rng = np.random.default_rng(1)
+    picked = rng.choice(len(vectors), args.queries, replace=False)
+    queries = vectors[picked] + 0.05 * rng.standard_normal(
+        (args.queries, vectors.shape[1])).astype(np.float32)
+    truth = exact_top_k(vectors, queries, args.k)
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {args.queries} queries\n")
+    import chromadb
+    run("chroma (hnsw, float32)", lambda path: chromadb.PersistentClient(path=path),
+        vectors, queries, truth, args.k)
+    for quantization in ("int8", "binary"):
+        for rescore in (False, True):
+            name = f"flat {quantization}" + (" + rescore" if rescore else "")
+            run(name, lambda path: FlatVectorClient(path, quantization, rescore),
+                vectors, queries, truth, args.k)
+
+
+if __name__ == "__main__":
+    main()
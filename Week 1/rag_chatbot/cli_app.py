@@ -1,14 +1,23 @@
+import argparse
 import os
 from dotenv import load_dotenv
+from src.folder_watcher import FolderWatcher
+from src.ingestion_job import format_progress
 from src.rag_chatbot import RAGChatbot
+from src.vector_database import parse_filters
 
 load_dotenv()
 
 
 class RAGChatbotCLI:
-    def __init__(self):
+    def __init__(self, resume=False, watch_folders=None):
+        self.resume = resume
+        self.watch_folders = watch_folders or []
+        self.watcher = None
         self.chatbot = None
         self.session_id = None
+        self.tenant = None
+        self.filters = []
 
     def check_environment(self):
         required_vars = [
@@ -34,6 +43,8 @@ class RAGChatbotCLI:
             print("🚀 Initializing RAG Chatbot...")
             self.chatbot = RAGChatbot()
             self.session_id = self.chatbot.create_session()
+            # Load the embedding model while the user types the first question
+            self.chatbot.warmup(background=True)
             print("✅ RAG Chatbot initialized successfully!")
             return True
         except Exception as e:
@@ -41,12 +52,73 @@ class RAGChatbotCLI:
             print("Please check your Azure OpenAI configuration")
             return False
 
+    @staticmethod
+    def print_ingest_stats(stats):
+        print(f"   New: {stats['files_added']}, updated: {stats['files_updated']}, "
+              f"unchanged: {stats['files_unchanged']}, removed: {stats['files_removed']}, "
+              f"failed: {stats['files_failed']}{' (see /failed)' if stats['files_failed'] else ''}")
+        print(f"   Throughput: {stats['files_per_sec']:.1f} files/sec, "
+              f"{stats['chunks_per_sec']:.1f} chunks/sec "
+              f"({stats['elapsed_seconds']:.1f}s)")
+        print("   Stages: " + ", ".join(
+            f"{stage} {seconds:.1f}s" for stage, seconds in stats['stage_seconds'].items()))
+
+    def resume_ingestion(self):
+        print("⏯️ Resuming interrupted ingestion jobs...")
+        try:
+            results = self.chatbot.resume_ingestion(progress_callback=print_progress)
+        except KeyboardInterrupt:
+            print("\n⏸️ Ingestion interrupted; run with --resume again to continue")
+            return
+        if not results:
+            print("   Nothing to resume")
+        for stats in results:
+            self.print_ingest_stats(stats)
+
+    def start_watching(self, folders):
+        if self.watcher is not None:
+            folders = self.watcher.folders + [folder for folder in folders
+                                              if os.path.abspath(folder) not in self.watcher.folders]
+            self.watcher.stop()
+        self.watcher = FolderWatcher(self.chatbot, folders, tenant=self.tenant, on_sync=print_sync)
+        self.watcher.start()
+
+    def stop_watching(self):
+        if self.watcher is None:
+            return False
+        self.watcher.stop()
+        self.watcher = None
+        return True
+
+    def print_trace_stats(self):
+        stats = self.chatbot.get_trace_stats()
+        if not stats["stages"]:
+            print("📈 No queries traced yet")
+            return
+        print("📈 Latency per stage (rolling window):")
+        print(f"   {'stage':<16}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}")
+        for stage, row in stats["stages"].items():
+            print(f"   {stage:<16}{row['count']:>7}{row['errors']:>8}"
+                  f"{row['p50_ms']:>10.1f}{row['p95_ms']:>10.1f}")
+        tokens = stats["tokens"]
+        print(f"   Tokens: {tokens['prompt_tokens']} prompt, {tokens['completion_tokens']} completion")
+        for error in stats["errors"]:
+            print(f"   ❌ {error['count']}× {error['type']} in {error['stage'] or 'n/a'}")
+
     def print_help(self):
         print("\n📋 Available Commands:")
         print("  /help          - Show this help message")
-        print("  /add <path>    - Add documents from folder to knowledge base")
+        print("  /add [--resume] <path> - Add documents from folder to knowledge base")
+        print("                   (--resume continues an interrupted /add of that folder)")
+        print("  /failed        - List files that could not be ingested, with errors")
+        print("  /watch [path]  - Keep a folder in sync as its files change (no path: status)")
+        print("  /unwatch       - Stop watching folders")
         print("  /info          - Show knowledge base information")
-        print("  /search <query> - Search documents without generating response")
+        print("  /stats         - Show p50/p95 latency per query stage, errors and token usage")
+        print("  /search [key=value ...] <query> - Search documents without generating response")
+        print("  /tenant [name] - Switch to a tenant's collection (no name: default)")
+        print("  /filter [key=value ...] - Filter answers by metadata, e.g. department=it")
+        print("                   doc_type=pdf date>=20240101 page<=3 (no filters: clear)")
         print("  /clear         - Clear conversation history")
         print("  /new           - Start new conversation session")
         print("  /history       - Show conversation history")
@@ -63,8 +135,11 @@ class RAGChatbotCLI:
             self.print_help()
 
         elif cmd == "/add":
+            resume = arg.startswith("--resume")
+            if resume:
+                arg = arg[len("--resume"):].strip()
             if not arg:
-                print("❌ Please specify a folder path: /add <path>")
+                print("❌ Please specify a folder path: /add [--resume] <path>")
                 return
 
             if not os.path.exists(arg):
@@ -73,25 +148,117 @@ class RAGChatbotCLI:
 
             print(f"📤 Adding documents from '{arg}'...")
             try:
-                self.chatbot.add_documents(arg)
+                stats = self.chatbot.add_documents(arg, tenant=self.tenant, resume=resume,
+                                                   progress_callback=print_progress)
                 print("✅ Documents added successfully!")
+                self.print_ingest_stats(stats)
+            except KeyboardInterrupt:
+                print(f"\n⏸️ Ingestion interrupted; continue it with /add --resume {arg}")
             except Exception as e:
                 print(f"❌ Error adding documents: {str(e)}")
+                print(f"   Progress was checkpointed; continue with /add --resume {arg}")
+
+        elif cmd == "/failed":
+            failed = self.chatbot.get_failed_files(self.tenant)
+            if not failed:
+                print("✅ No failed files")
+            for entry in failed:
+                print(f"   • {entry['path']}: {entry['error']}")
+
+        elif cmd == "/watch":
+            if not arg:
+                if self.watcher is None:
+                    print("👀 Not watching any folder")
+                    return True
+                stats = self.watcher.get_stats()
+                print(f"👀 Watching {', '.join(stats['folders'])}: {stats['events']} events, "
+                      f"{stats['batches']} batches, {stats['files_synced']} files synced, "
+                      f"{stats['errors']} errors")
+                return True
+            if not os.path.isdir(arg):
+                print(f"❌ Folder '{arg}' does not exist")
+                return True
+            self.start_watching([arg])
+            print(f"👀 Watching '{arg}'; changes are synced in the background")
+
+        elif cmd == "/unwatch":
+            print("✅ Stopped watching" if self.stop_watching() else "👀 Not watching any folder")
+
+        elif cmd == "/stats":
+            self.print_trace_stats()
 
         elif cmd == "/info":
-            info = self.chatbot.get_knowledge_base_info()
+            info = self.chatbot.get_knowledge_base_info(self.tenant)
             print(f"📊 Knowledge Base Information:")
             print(
                 f"   Total document chunks: {info.get('total_documents', 0)}")
             print(f"   Collection name: {info.get('collection_name', 'N/A')}")
+            cache = info.get('embedding_cache')
+            if cache:
+                print(f"   Embedding cache hit rate: {cache['hit_rate']:.1%} "
+                      f"({cache['cache_hits']} hits, {cache['embedded']} embedded)")
+            responses = info.get('response_cache')
+            if responses:
+                print(f"   Response cache: {responses['hits']} hits, {responses['misses']} misses "
+                      f"({responses['hit_rate']:.1%} hit rate, {responses['entries']} cached)")
+            rewrites = info.get('query_rewrites')
+            if rewrites:
+                print(f"   Query rewrites (all sessions): {rewrites['llm']} LLM calls, "
+                      f"{rewrites['avoided']} avoided "
+                      f"({rewrites['standalone']} standalone, {rewrites['memo']} memoized)")
+            reranker = info.get('reranker')
+            if reranker:
+                print(f"   Re-ranking: {reranker['reranked']} reranked, {reranker['fallback']} fell back "
+                      f"to vector order, {reranker['cache_hits']} cached scores")
+            startup = self.chatbot.get_startup_metrics()
+            loaded = ", ".join(
+                f"{name} {startup[key]:.2f}s" for name, key in (
+                    ("vector DB", "vector_db_seconds"),
+                    ("embedding model", "embedding_model_seconds"),
+                    ("LLM client", "openai_client_seconds"))
+                if key in startup)
+            print(f"   Startup: {startup['init_seconds']:.2f}s" + (f" (then {loaded})" if loaded else ""))
 
         elif cmd == "/search":
-            if not arg:
-                print("❌ Please specify a search query: /search <query>")
-                return
+            # Leading key=value words are metadata filters, the rest is the query
+            words = arg.split()
+            filters = []
+            while words and parse_filter_word(words[0]):
+                filters.append(words.pop(0))
+            query = " ".join(words)
+            if not query:
+                print("❌ Please specify a search query: /search [key=value ...] <query>")
+                return True
 
-            print(f"🔍 Searching for: '{arg}'")
-            self.chatbot.print_search_results(arg)
+            try:
+                where = parse_filters(self.filters + filters)
+            except ValueError as e:
+                print(f"❌ {str(e)}")
+                return True
+            print(f"🔍 Searching for: '{query}'")
+            self.chatbot.print_search_results(query, tenant=self.tenant, where=where)
+
+        elif cmd == "/tenant":
+            try:
+                self.chatbot.get_vector_db(arg or None)
+            except ValueError as e:
+                print(f"❌ {str(e)}")
+                return True
+            self.tenant = arg or None
+            print(f"✅ Using {'tenant ' + arg if arg else 'the default collection'}")
+            tenants = self.chatbot.list_tenants()
+            if tenants:
+                print(f"   Tenants: {', '.join(tenants)}")
+
+        elif cmd == "/filter":
+            filters = arg.split()
+            try:
+                parse_filters(filters)
+            except ValueError as e:
+                print(f"❌ {str(e)}")
+                return True
+            self.filters = filters
+            print(f"✅ Filters: {' '.join(filters)}" if filters else "✅ Filters cleared")
 
         elif cmd == "/clear":
             self.chatbot.clear_conversation(self.session_id)
@@ -113,6 +280,7 @@ class RAGChatbotCLI:
                 print(f"   {i}. {role}: {msg['content'][:100]}...")
 
         elif cmd in ["/quit", "/exit"]:
+            self.stop_watching()
             print("👋 Goodbye!")
             return False
 
@@ -132,6 +300,12 @@ class RAGChatbotCLI:
         if not self.initialize_chatbot():
             return
 
+        if self.resume:
+            self.resume_ingestion()
+
+        if self.watch_folders:
+            self.start_watching(self.watch_folders)
+
         print("\n💡 Type /help for available commands")
         print("💬 Start asking questions about your documents!")
         print("🚪 Type /quit to exit\n")
@@ -150,20 +324,38 @@ class RAGChatbotCLI:
 
                 print("🤔 Thinking...")
                 try:
-                    response, sources = self.chatbot.query(
-                        user_input, self.session_id)
-
-                    print(f"\n🤖 Bot: {response}")
+                    sources = []
+                    print(f"\n🤖 Bot: ", end="", flush=True)
+                    for kind, value in self.chatbot.query_stream(
+                            user_input, self.session_id, tenant=self.tenant,
+                            where=parse_filters(self.filters)):
+                        if kind == "token":
+                            print(value, end="", flush=True)
+                        else:
+                            sources = value
+                    print()
 
                     if sources:
                         print(f"\n📚 Sources:")
                         for source in sources:
                             print(f"   • {source}")
 
+                    metrics = self.chatbot.get_turn_metrics(self.session_id)
+                    if 'ttft_seconds' in metrics:
+                        print(f"\n   ⏱️ First token {metrics['ttft_seconds']:.2f}s, "
+                              f"total {metrics['total_seconds']:.2f}s, "
+                              f"query rewrite: {metrics['rewrite']}"
+                              f"{'' if metrics['rewrite_llm_call'] else ' (LLM call avoided)'}, "
+                              f"response cache: {metrics.get('response_cache', 'n/a')}, "
+                              f"history: {metrics['history_tokens']} tokens"
+                              f"{', rerank: ' + metrics['rerank'] if 'rerank' in metrics else ''}")
+
                     print()
 
                 except Exception as e:
-                    print(f"❌ Error: {str(e)}")
+                    error = self.chatbot.get_turn_metrics(self.session_id).get("error")
+                    stage = f" during {error['stage']}" if error and error["stage"] else ""
+                    print(f"\n❌ {type(e).__name__}{stage}: {str(e)}")
                     print()
 
             except KeyboardInterrupt:
@@ -173,9 +365,42 @@ class RAGChatbotCLI:
                 print("\n\n👋 See you soon!")
                 break
 
+        self.stop_watching()
+
+
+def parse_filter_word(word):
+    try:
+        return parse_filters([word]) is not None
+    except ValueError:
+        return False
+
+
+def print_progress(snapshot):
+    # Rewrites one terminal line; the final snapshot ends it
+    done = snapshot["files_done"] >= snapshot["files_total"]
+    print("\r   " + format_progress(snapshot), end="\n" if done else "", flush=True)
+
+
+def print_sync(folder, stats):
+    changed = stats["files_added"] + stats["files_updated"] + stats["files_removed"]
+    if changed or stats["files_failed"]:
+        print(f"\n🔄 Synced {os.path.basename(folder)}: {stats['files_added']} new, "
+              f"{stats['files_updated']} updated, {stats['files_removed']} removed, "
+              f"{stats['files_failed']} failed")
+
 
 def main():
-    cli = RAGChatbotCLI()
+    parser = argparse.ArgumentParser(description="RAG-based Chatbot with Azure OpenAI")
+    parser.add_argument("--resume", action="store_true",
+                        help="finish interrupted /add jobs before starting the chat")
+    parser.add_argument("--watch", nargs="*", default=None, metavar="FOLDER",
+                        help="keep these folders in sync as files change "
+                             "(no folders: WATCH_FOLDERS from the environment)")
+    args = parser.parse_args()
+    watch_folders = args.watch
+    if watch_folders == []:
+        watch_folders = [folder for folder in os.getenv("WATCH_FOLDERS", "").split(os.pathsep) if folder]
+    cli = RAGChatbotCLI(resume=args.resume, watch_folders=watch_folders)
     cli.run()
 
 
@@ -1,12 +1,20 @@
 from .rag_chatbot import RAGChatbot
-from .vector_database import VectorDatabase
-from .azure_openai_client import AzureOpenAIClient
-from .conversation_memory import ConversationMemory
+from .async_rag_chatbot import AsyncRAGChatbot
+from .vector_database import VectorDatabase, AsyncVectorDatabase, parse_filters
+from .azure_openai_client import AzureOpenAIClient, AsyncAzureOpenAIClient
+from .conversation_memory import ConversationMemory, SQLiteConversationMemory, create_memory
+from .embedding_service import EmbeddingService
+from .lexical_index import BM25Index
+from .flat_index import FlatVectorClient
+from .ingestion_manifest import IngestionManifest
+from .folder_watcher import FolderWatcher
+from .telemetry import Tracer
 from .document_processor import (
     read_document,
     split_text,
     process_document,
-    process_and_add_documents
+    process_and_add_documents,
+    process_changed_files
 )
 
 __version__ = "1.0.0"
@@ -14,11 +22,24 @@ __author__ = "Ayushi Saxena"
 
 __all__ = [
     "RAGChatbot",
+    "AsyncRAGChatbot",
     "VectorDatabase", 
+    "AsyncVectorDatabase",
+    "parse_filters",
     "AzureOpenAIClient",
+    "AsyncAzureOpenAIClient",
     "ConversationMemory",
+    "SQLiteConversationMemory",
+    "create_memory",
+    "EmbeddingService",
+    "BM25Index",
+    "FlatVectorClient",
+    "IngestionManifest",
+    "FolderWatcher",
+    "Tracer",
     "read_document",
     "split_text",
     "process_document",
-    "process_and_add_documents"
+    "process_and_add_documents",
+    "process_changed_files"
 ]
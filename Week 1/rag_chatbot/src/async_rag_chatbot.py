@@ -0,0 +1,251 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, List, Optional, Tuple
+from .azure_openai_client import AsyncAzureOpenAIClient
+from .rag_chatbot import RAGChatbot
+from .telemetry import Trace
+from .tokenizer import count_tokens
+from .vector_database import AsyncVectorDatabase
+
+
+class AsyncRAGChatbot(RAGChatbot):
+    """RAGChatbot whose query path is async end to end.
+
+    LLM calls go through AsyncAzureOpenAI and vector search runs on a thread
+    pool, so one event loop can serve many sessions at once. Retrieval for
+    the raw question starts while the question is being contextualized and
+    is reused whenever the rewrite leaves the question unchanged.
+    Ingestion and the other knowledge-base methods stay synchronous.
+    """
+
+    openai_client_class = AsyncAzureOpenAIClient
+
+    def __init__(self, persist_directory: str = "chroma_db", ingest_workers: int = None,
+                 search_threads: int = None):
+        self.search_threads = search_threads
+        self._async_vector_db = None
+        super().__init__(persist_directory, ingest_workers)
+
+    @property
+    def async_vector_db(self) -> AsyncVectorDatabase:
+        if self._async_vector_db is None:
+            vector_db = self.vector_db
+            with self._init_lock:
+                if self._async_vector_db is None:
+                    self._async_vector_db = AsyncVectorDatabase(vector_db, self.search_threads)
+        return self._async_vector_db
+
+    def _check_connection(self):
+        # The async client is bound to the caller's event loop; await check_health() instead
+        pass
+
+    async def check_health(self) -> bool:
+        self.connection_ok = await self.openai_client.check_health()
+        return self.connection_ok
+
+    async def test_connection(self) -> bool:
+        return await self.openai_client.test_connection()
+
+    def get_async_vector_db(self, tenant: Optional[str] = None) -> AsyncVectorDatabase:
+        if not tenant:
+            return self.async_vector_db
+        return self.async_vector_db.for_database(self.get_vector_db(tenant))
+
+    async def _retrieve(self, query: str, n_chunks: int, trace: Trace, tenant: Optional[str] = None,
+                        where: Optional[dict] = None, speculative: bool = False):
+        with trace.span("embed_query", speculative=speculative):
+            query_embedding = await self.async_vector_db.embed_query(query)
+        with trace.span("search", n_results=self._candidate_count(n_chunks), speculative=speculative):
+            search_results = await self.get_async_vector_db(tenant).search(
+                query, self._candidate_count(n_chunks), query_embedding, where)
+        if self.reranker is not None:
+            loop = asyncio.get_running_loop()
+            search_results = await loop.run_in_executor(
+                self.async_vector_db.executor, self._rerank, query, search_results, n_chunks, trace)
+        return query_embedding, search_results
+
+    async def _prepare_turn(self, question: str, session_id: str, n_chunks: int, trace: Trace,
+                            tenant: Optional[str] = None, where: Optional[dict] = None) -> dict:
+        conversation_history = self.history.build(session_id)
+
+        # Speculatively retrieve with the raw question while it is rewritten
+        speculative = asyncio.ensure_future(
+            self._retrieve(question, n_chunks, trace, tenant, where, speculative=True))
+        # A discarded speculation may still fail; don't leave that unobserved
+        speculative.add_done_callback(
+            lambda task: task.cancelled() or task.exception())
+        try:
+            with trace.span("contextualize") as span:
+                usage = {}
+                contextualized_query, rewrite_path = await self.openai_client.contextualize(
+                    question, conversation_history, usage
+                )
+                span["attributes"].update(usage, rewrite=rewrite_path)
+                trace.add_usage(usage)
+        except BaseException:
+            speculative.cancel()
+            raise
+        turn_metrics = {
+            "rewrite": rewrite_path,
+            "rewrite_llm_call": rewrite_path == "llm",
+            "history_tokens": count_tokens(conversation_history)
+        }
+        self._set_turn_metrics(session_id, turn_metrics)
+
+        if contextualized_query.strip() == question.strip():
+            query_embedding, search_results = await speculative
+            turn_metrics["speculative_retrieval"] = "used"
+        else:
+            speculative.cancel()
+            query_embedding, search_results = await self._retrieve(
+                contextualized_query, n_chunks, trace, tenant, where)
+            turn_metrics["speculative_retrieval"] = "discarded"
+
+        return self._lookup_turn(conversation_history, contextualized_query,
+                                 query_embedding, search_results, turn_metrics, trace)
+
+    async def _compact_history(self, session_id: str, turn: dict, trace: Trace):
+        plan = self.history.plan_compaction(session_id)
+        if plan is not None:
+            with trace.span("compact_history") as span:
+                usage = {}
+                summary = await self.openai_client.summarize_history(
+                    plan["summary"], plan["messages"], usage)
+                span["attributes"].update(usage)
+                trace.add_usage(usage)
+            turn["metrics"]["history_compacted"] = self.history.apply_compaction(
+                session_id, plan, summary)
+        turn["metrics"].update(trace.tokens)
+        turn["metrics"]["stages"] = trace.stage_seconds()
+
+    async def query(self, question: str, session_id: str, n_chunks: int = 3,
+                    tenant: Optional[str] = None, where: Optional[dict] = None) -> Tuple[str, List[str]]:
+        start_time = time.perf_counter()
+        with self.tracer.trace("query", tenant=tenant or "") as trace:
+            try:
+                turn = await self._prepare_turn(question, session_id, n_chunks, trace, tenant, where)
+
+                if turn["cached"] is not None:
+                    response, sources = turn["cached"]
+                else:
+                    context, sources = self.async_vector_db.get_context_with_sources(
+                        turn["results"])
+
+                    with trace.span("generate") as span:
+                        response, usage = await self.openai_client.generate_response_with_usage(
+                            turn["query"], context, turn["history"]
+                        )
+                        span["attributes"].update(usage)
+                        trace.add_usage(usage)
+
+                self._finish_turn(session_id, question, turn, response, sources,
+                                  start_time, time.perf_counter(), trace)
+                await self._compact_history(session_id, turn, trace)
+                return response, sources
+
+            except Exception as e:
+                self._record_failure(session_id, trace, e)
+                raise
+
+    async def query_stream(self, question: str, session_id: str, n_chunks: int = 3,
+                           tenant: Optional[str] = None,
+                           where: Optional[dict] = None) -> AsyncIterator[Tuple[str, Any]]:
+        """Async counterpart of RAGChatbot.query_stream"""
+        start_time = time.perf_counter()
+        with self.tracer.trace("query_stream", tenant=tenant or "") as trace:
+            try:
+                turn = await self._prepare_turn(question, session_id, n_chunks, trace, tenant, where)
+
+                if turn["cached"] is not None:
+                    response, sources = turn["cached"]
+                    first_token_time = time.perf_counter()
+                    yield "token", response
+                else:
+                    context, sources = self.async_vector_db.get_context_with_sources(
+                        turn["results"])
+
+                    pieces = []
+                    first_token_time = None
+                    with trace.span("generate", stream=True) as span:
+                        usage = {}
+                        async for piece in self.openai_client.generate_response_stream(
+                                turn["query"], context, turn["history"], usage):
+                            if first_token_time is None:
+                                first_token_time = time.perf_counter()
+                            pieces.append(piece)
+                            yield "token", piece
+                        span["attributes"].update(usage)
+                        trace.add_usage(usage)
+                    response = "".join(pieces)
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+
+                self._finish_turn(session_id, question, turn, response, sources,
+                                  start_time, first_token_time, trace)
+                await self._compact_history(session_id, turn, trace)
+                yield "sources", sources
+
+            except Exception as e:
+                self._record_failure(session_id, trace, e)
+                raise
+
+    async def simple_query(self, question: str, n_chunks: int = 3, tenant: Optional[str] = None,
+                           where: Optional[dict] = None) -> Tuple[str, List[str]]:
+        temp_session = self.create_session()
+        try:
+            return await self.query(question, temp_session, n_chunks, tenant, where)
+        finally:
+            self._discard_session(temp_session)
+
+    async def _answer_retrieved(self, question: str, query_embedding: List[float],
+                                search_results: dict, semaphore: asyncio.Semaphore,
+                                trace: Trace) -> dict:
+        async with semaphore:
+            start_time = time.perf_counter()
+            with trace.span("response_cache") as span:
+                cached = self.response_cache.lookup(query_embedding, search_results['ids'][0])
+                span["attributes"]["hit"] = cached is not None
+            error = None
+            if cached is not None:
+                (response, sources), usage = cached, {}
+            else:
+                context, sources = self.vector_db.get_context_with_sources(search_results)
+                try:
+                    with trace.span("generate") as span:
+                        response, usage = await self.openai_client.generate_response_with_usage(
+                            question, context)
+                        span["attributes"].update(usage)
+                        trace.add_usage(usage)
+                    self._store_response(query_embedding, search_results, response, sources)
+                except Exception as e:
+                    response, sources, usage = "", [], {}
+                    error = {"type": type(e).__name__, "message": str(e)}
+            return self._batch_answer(question, search_results, response, sources, usage,
+                                      cached is not None, time.perf_counter() - start_time, error)
+
+    async def batch_query(self, questions: List[str], n_chunks: int = 3, max_concurrency: int = None,
+                          tenant: Optional[str] = None, where: Optional[dict] = None) -> List[dict]:
+        """Async counterpart of RAGChatbot.batch_query"""
+        start_time = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        with self.tracer.trace("batch_query", questions=len(questions)) as trace:
+            query_embeddings, results = await loop.run_in_executor(
+                self.async_vector_db.executor, self.retrieve_batch, questions, n_chunks, tenant,
+                where, trace)
+            retrieval_seconds = time.perf_counter() - start_time
+
+            semaphore = asyncio.Semaphore(max_concurrency or int(os.getenv("BATCH_CONCURRENCY", "8")))
+            answers = await asyncio.gather(*(
+                self._answer_retrieved(question, query_embedding, search_results, semaphore, trace)
+                for question, query_embedding, search_results in zip(questions, query_embeddings, results)))
+        for answer in answers:
+            answer["retrieval_seconds"] = retrieval_seconds
+        return answers
+
+    async def close(self):
+        self.tracer.close()
+        if self._async_vector_db is not None:
+            self._async_vector_db.close()
+        if self._openai_client is not None:
+            await self._openai_client.close()
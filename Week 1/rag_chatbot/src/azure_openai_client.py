@@ -1,13 +1,31 @@
+import hashlib
 import os
-from openai import AzureOpenAI
+import threading
+from collections import OrderedDict
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+from openai import AsyncAzureOpenAI, AzureOpenAI
 from dotenv import load_dotenv
+from .query_classifier import needs_contextualization
+from .tokenizer import count_tokens
 
 load_dotenv()
 
+CONTEXTUALIZE_PROMPT = """Given a chat history and the latest user question 
+        which might reference context in the chat history, formulate a standalone 
+        question which can be understood without the chat history. Do NOT answer 
+        the question, just reformulate it if needed and otherwise return it as is."""
+
+SUMMARIZE_PROMPT = """You maintain a running summary of a conversation between a 
+        user and an assistant. Extend the existing summary with the new messages, 
+        keeping facts, names, numbers and open questions the user may refer back 
+        to. Reply with the updated summary only, in at most 150 words."""
+
 
 class AzureOpenAIClient:
+    client_class = AzureOpenAI
+
     def __init__(self):
-        self.client = AzureOpenAI(
+        self.client = self.client_class(
             api_key=os.getenv("AZURE_OPENAI_API_KEY"),
             api_version=os.getenv(
                 "AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
@@ -15,6 +33,13 @@ class AzureOpenAIClient:
         )
         self.deployment_name = os.getenv("AZURE_OPENAI_DEPLOYMENT_NAME")
         self.model_name = os.getenv("AZURE_OPENAI_MODEL_NAME", "gpt-4")
+        # Usage in streams needs API version 2024-09-01-preview or later; otherwise it is estimated
+        self.stream_usage = os.getenv("AZURE_OPENAI_STREAM_USAGE", "false").lower() in ("1", "true", "yes")
+
+        self._rewrite_memo = OrderedDict()
+        self._rewrite_memo_size = 512
+        self._rewrite_lock = threading.Lock()
+        self.rewrite_stats = {"no_history": 0, "standalone": 0, "memo": 0, "llm": 0}
 
     def get_prompt(self, context: str, conversation_history: str, query: str) -> str:
         """Generate a prompt combining context, history, and query"""
@@ -35,49 +60,190 @@ class AzureOpenAIClient:
 
         return prompt
 
+    def get_response_messages(self, query: str, context: str, conversation_history: str = "") -> List[dict]:
+        prompt = self.get_prompt(context, conversation_history, query)
+        return [
+            {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
+            {"role": "user", "content": prompt}
+        ]
+
     def generate_response(self, query: str, context: str, conversation_history: str = "") -> str:
         """Generate a response using Azure OpenAI with conversation history"""
-        prompt = self.get_prompt(context, conversation_history, query)
+        return self.generate_response_with_usage(query, context, conversation_history)[0]
+
+    @staticmethod
+    def _usage(response) -> dict:
+        usage = getattr(response, "usage", None)
+        if usage is None:
+            return {}
+        return {"prompt_tokens": usage.prompt_tokens, "completion_tokens": usage.completion_tokens}
+
+    @classmethod
+    def _add_usage(cls, usage: Optional[dict], response):
+        """Add a completion's token usage to a caller's running totals"""
+        if usage is not None:
+            for key, value in cls._usage(response).items():
+                usage[key] = usage.get(key, 0) + value
+
+    def _stream_options(self) -> dict:
+        return {"stream_options": {"include_usage": True}} if self.stream_usage else {}
 
+    def _finish_stream_usage(self, usage: Optional[dict], messages: List[dict], pieces: List[str],
+                             reported: bool):
+        if usage is None or reported:
+            return
+        usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + sum(
+            count_tokens(message["content"]) for message in messages)
+        usage["completion_tokens"] = usage.get("completion_tokens", 0) + count_tokens("".join(pieces))
+        usage["estimated"] = True
+
+    def generate_response_with_usage(self, query: str, context: str,
+                                     conversation_history: str = "") -> Tuple[str, dict]:
+        """Like generate_response, plus the token usage the API reported.
+
+        API errors propagate to the caller with their original type.
+        """
+        response = self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=self.get_response_messages(query, context, conversation_history),
+            temperature=0,
+            max_tokens=500
+        )
+        return response.choices[0].message.content, self._usage(response)
+
+    def generate_response_stream(self, query: str, context: str, conversation_history: str = "",
+                                 usage: Optional[dict] = None) -> Iterator[str]:
+        """Yield the response text piece by piece as the model produces it.
+
+        Token usage is added to `usage` once the stream ends; it is counted
+        locally (and marked "estimated") unless AZURE_OPENAI_STREAM_USAGE is on.
+        """
+        messages = self.get_response_messages(query, context, conversation_history)
+        stream = self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=messages,
+            temperature=0,
+            max_tokens=500,
+            stream=True,
+            **self._stream_options()
+        )
+        pieces, reported = [], False
+        for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                self._add_usage(usage, chunk)
+                reported = True
+            # Azure sends content-filter results as chunks without choices
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        self._finish_stream_usage(usage, messages, pieces, reported)
+
+    def contextualize_query(self, query: str, conversation_history: str) -> str:
+        return self.contextualize(query, conversation_history)[0]
+
+    def contextualize(self, query: str, conversation_history: str,
+                      usage: Optional[dict] = None) -> Tuple[str, str]:
+        """Return (standalone query, path), where path says how it was produced:
+        "no_history", "standalone", "memo" or "llm"."""
+        fast_path = self._rewrite_fast_path(query, conversation_history)
+        if fast_path is not None:
+            return fast_path
+
+        rewritten = self._contextualize_with_llm(query, conversation_history, usage)
+        return self._finish_rewrite(query, conversation_history, rewritten)
+
+    def _rewrite_fast_path(self, query: str, conversation_history: str) -> Optional[Tuple[str, str]]:
+        """Resolve a rewrite without the LLM when possible, else return None"""
+        # If no conversation history, return original query
+        if not conversation_history.strip():
+            return query, self._record_rewrite("no_history")
+
+        # Questions that don't refer back to earlier turns need no rewrite
+        if not needs_contextualization(query):
+            return query, self._record_rewrite("standalone")
+
+        memo_key = self._memo_key(query, conversation_history)
+        with self._rewrite_lock:
+            memoized = self._rewrite_memo.get(memo_key)
+            if memoized is not None:
+                self._rewrite_memo.move_to_end(memo_key)
+        if memoized is not None:
+            return memoized, self._record_rewrite("memo")
+        return None
+
+    def _finish_rewrite(self, query: str, conversation_history: str,
+                        rewritten: Optional[str]) -> Tuple[str, str]:
+        if rewritten is None:
+            return query, self._record_rewrite("llm")
+
+        with self._rewrite_lock:
+            self._rewrite_memo[self._memo_key(query, conversation_history)] = rewritten
+            if len(self._rewrite_memo) > self._rewrite_memo_size:
+                self._rewrite_memo.popitem(last=False)
+        return rewritten, self._record_rewrite("llm")
+
+    @staticmethod
+    def _memo_key(query: str, conversation_history: str) -> str:
+        return hashlib.sha256(
+            f"{conversation_history}\0{query}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def get_contextualize_messages(query: str, conversation_history: str) -> List[dict]:
+        return [
+            {"role": "system", "content": CONTEXTUALIZE_PROMPT},
+            {"role": "user", "content": f"Chat history:\n{conversation_history}\n\nQuestion:\n{query}"}
+        ]
+
+    @staticmethod
+    def get_summarize_messages(summary: str, new_messages: str) -> List[dict]:
+        return [
+            {"role": "system", "content": SUMMARIZE_PROMPT},
+            {"role": "user", "content": f"Existing summary:\n{summary or '(none)'}\n\nNew messages:\n{new_messages}"}
+        ]
+
+    def summarize_history(self, summary: str, new_messages: str,
+                          usage: Optional[dict] = None) -> Optional[str]:
+        """Fold new messages into the rolling conversation summary"""
         try:
-            response = self.client.chat.completions.create(
+            completion = self.client.chat.completions.create(
                 model=self.deployment_name,
-                messages=[
-                    {"role": "system", "content": "You are a helpful assistant that answers questions based on the provided context."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self.get_summarize_messages(summary, new_messages),
                 temperature=0,
-                max_tokens=500
+                max_tokens=250
             )
-            return response.choices[0].message.content
+            self._add_usage(usage, completion)
+            return completion.choices[0].message.content
         except Exception as e:
-            return f"Error generating response: {str(e)}"
+            print(f"Warning: Could not summarize conversation history ({str(e)}).")
+            return None
 
-    def contextualize_query(self, query: str, conversation_history: str) -> str:
-        # If no conversation history, return original query
-        if not conversation_history.strip():
-            return query
+    def _record_rewrite(self, path: str) -> str:
+        with self._rewrite_lock:
+            self.rewrite_stats[path] += 1
+        return path
 
-        contextualize_prompt = """Given a chat history and the latest user question 
-        which might reference context in the chat history, formulate a standalone 
-        question which can be understood without the chat history. Do NOT answer 
-        the question, just reformulate it if needed and otherwise return it as is."""
+    def get_rewrite_stats(self) -> dict:
+        with self._rewrite_lock:
+            stats = dict(self.rewrite_stats)
+        # Turns with history that did not need an LLM round-trip
+        stats["avoided"] = stats["standalone"] + stats["memo"]
+        return stats
 
+    def _contextualize_with_llm(self, query: str, conversation_history: str,
+                                usage: Optional[dict] = None):
         try:
             completion = self.client.chat.completions.create(
                 model=self.deployment_name,
-                messages=[
-                    {"role": "system", "content": contextualize_prompt},
-                    {"role": "user", "content": f"Chat history:\n{conversation_history}\n\nQuestion:\n{query}"}
-                ],
+                messages=self.get_contextualize_messages(query, conversation_history),
                 temperature=0,
                 max_tokens=200
             )
+            self._add_usage(usage, completion)
             return completion.choices[0].message.content
         except Exception as e:
             print(
                 f"Warning: Could not contextualize query ({str(e)}). Using original query.")
-            return query
+            return None
 
     def test_connection(self) -> bool:
         try:
@@ -91,3 +257,129 @@ class AzureOpenAIClient:
         except Exception as e:
             print(f"Connection test failed: {str(e)}")
             return False
+
+    def check_health(self) -> bool:
+        """Cheap reachability check: lists models, so no completion tokens are spent"""
+        if not self.deployment_name:
+            print("Health check failed: AZURE_OPENAI_DEPLOYMENT_NAME is not set")
+            return False
+        try:
+            self.client.with_options(timeout=10, max_retries=0).models.list()
+            return True
+        except Exception as e:
+            print(f"Health check failed: {str(e)}")
+            return False
+
+
+class AsyncAzureOpenAIClient(AzureOpenAIClient):
+    """AzureOpenAIClient on AsyncAzureOpenAI, so many sessions share one event loop.
+
+    Prompts, the standalone-question fast path and the rewrite memo are the
+    same as in the synchronous client; only the completion calls await.
+    """
+
+    client_class = AsyncAzureOpenAI
+
+    async def generate_response(self, query: str, context: str, conversation_history: str = "") -> str:
+        return (await self.generate_response_with_usage(query, context, conversation_history))[0]
+
+    async def generate_response_with_usage(self, query: str, context: str,
+                                           conversation_history: str = "") -> Tuple[str, dict]:
+        response = await self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=self.get_response_messages(query, context, conversation_history),
+            temperature=0,
+            max_tokens=500
+        )
+        return response.choices[0].message.content, self._usage(response)
+
+    async def generate_response_stream(self, query: str, context: str, conversation_history: str = "",
+                                       usage: Optional[dict] = None) -> AsyncIterator[str]:
+        messages = self.get_response_messages(query, context, conversation_history)
+        stream = await self.client.chat.completions.create(
+            model=self.deployment_name,
+            messages=messages,
+            temperature=0,
+            max_tokens=500,
+            stream=True,
+            **self._stream_options()
+        )
+        pieces, reported = [], False
+        async for chunk in stream:
+            if getattr(chunk, "usage", None) is not None:
+                self._add_usage(usage, chunk)
+                reported = True
+            if chunk.choices and chunk.choices[0].delta.content:
+                pieces.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+        self._finish_stream_usage(usage, messages, pieces, reported)
+
+    async def contextualize_query(self, query: str, conversation_history: str) -> str:
+        return (await self.contextualize(query, conversation_history))[0]
+
+    async def contextualize(self, query: str, conversation_history: str,
+                            usage: Optional[dict] = None) -> Tuple[str, str]:
+        fast_path = self._rewrite_fast_path(query, conversation_history)
+        if fast_path is not None:
+            return fast_path
+
+        rewritten = await self._contextualize_with_llm(query, conversation_history, usage)
+        return self._finish_rewrite(query, conversation_history, rewritten)
+
+    async def _contextualize_with_llm(self, query: str, conversation_history: str,
+                                      usage: Optional[dict] = None):
+        try:
+            completion = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=self.get_contextualize_messages(query, conversation_history),
+                temperature=0,
+                max_tokens=200
+            )
+            self._add_usage(usage, completion)
+            return completion.choices[0].message.content
+        except Exception as e:
+            print(
+                f"Warning: Could not contextualize query ({str(e)}). Using original query.")
+            return None
+
+    async def summarize_history(self, summary: str, new_messages: str,
+                                usage: Optional[dict] = None) -> Optional[str]:
+        try:
+            completion = await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=self.get_summarize_messages(summary, new_messages),
+                temperature=0,
+                max_tokens=250
+            )
+            self._add_usage(usage, completion)
+            return completion.choices[0].message.content
+        except Exception as e:
+            print(f"Warning: Could not summarize conversation history ({str(e)}).")
+            return None
+
+    async def test_connection(self) -> bool:
+        try:
+            await self.client.chat.completions.create(
+                model=self.deployment_name,
+                messages=[
+                    {"role": "user", "content": "Hello, this is a test."}],
+                max_tokens=10
+            )
+            return True
+        except Exception as e:
+            print(f"Connection test failed: {str(e)}")
+            return False
+
+    async def check_health(self) -> bool:
+        if not self.deployment_name:
+            print("Health check failed: AZURE_OPENAI_DEPLOYMENT_NAME is not set")
+            return False
+        try:
+            await self.client.with_options(timeout=10, max_retries=0).models.list()
+            return True
+        except Exception as e:
+            print(f"Health check failed: {str(e)}")
+            return False
+
+    async def close(self):
+        await self.client.close()
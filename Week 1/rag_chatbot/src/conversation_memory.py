@@ -1,79 +1,71 @@
+import os
+import sqlite3
+import threading
+import time
 import uuid
+from collections import OrderedDict, deque
 from datetime import datetime
+from itertools import islice
 from typing import List, Dict, Optional
 
+from .history_manager import format_messages
 
-class ConversationMemory:
-    def __init__(self):
-        self.conversations = {}
+DEFAULT_MAX_MESSAGES = int(os.getenv("MEMORY_MAX_MESSAGES", "200"))
+DEFAULT_SESSION_TTL = float(os.getenv("MEMORY_SESSION_TTL", str(24 * 3600)))
+DEFAULT_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", "100000"))
 
-    def create_session(self) -> str:
-        session_id = str(uuid.uuid4())
-        self.conversations[session_id] = []
-        return session_id
 
-    def add_message(self, session_id: str, role: str, content: str):
-        if session_id not in self.conversations:
-            self.conversations[session_id] = []
-
-        self.conversations[session_id].append({
-            "role": role,
-            "content": content,
-            "timestamp": datetime.now().isoformat()
-        })
+def _isoformat(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp).isoformat()
 
-    def get_conversation_history(self, session_id: str, max_messages: Optional[int] = None) -> List[Dict]:
-        if session_id not in self.conversations:
-            return []
 
-        history = self.conversations[session_id]
-        if max_messages:
-            history = history[-max_messages:]
+class _Message:
+    """One stored message; slots keep 10k sessions of history small"""
 
-        return history
+    __slots__ = ("role", "content", "timestamp")
 
-    def format_history_for_prompt(self, session_id: str, max_messages: int = 5) -> str:
-        history = self.get_conversation_history(session_id, max_messages)
-        formatted_history = ""
+    def __init__(self, role: str, content: str, timestamp: float):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp
 
-        for msg in history:
-            role = "Human" if msg["role"] == "user" else "Assistant"
-            formatted_history += f"{role}: {msg['content']}\n\n"
+    def to_dict(self) -> Dict:
+        return {
+            "role": self.role,
+            "content": self.content,
+            "timestamp": _isoformat(self.timestamp)
+        }
 
-        return formatted_history.strip()
 
-    def clear_session(self, session_id: str):
-        if session_id in self.conversations:
-            self.conversations[session_id] = []
+class _Session:
+    __slots__ = ("messages", "created", "last_active", "total", "summary", "summarized")
 
-    def delete_session(self, session_id: str):
-        if session_id in self.conversations:
-            del self.conversations[session_id]
+    def __init__(self, max_messages: int, now: float):
+        # Ring buffer: the oldest message drops out once the cap is reached
+        self.messages = deque(maxlen=max_messages)
+        self.created = now
+        self.last_active = now
+        # Messages ever added, and how many of the oldest the summary covers
+        self.total = 0
+        self.summary = ""
+        self.summarized = 0
 
-    def get_session_info(self, session_id: str) -> Dict:
-        if session_id not in self.conversations:
-            return {"error": "Session not found"}
 
-        history = self.conversations[session_id]
-        return {
-            "session_id": session_id,
-            "message_count": len(history),
-            "created": history[0]["timestamp"] if history else None,
-            "last_updated": history[-1]["timestamp"] if history else None
-        }
+class _MemoryBase:
+    """Prompt formatting and summaries shared by every memory backend"""
 
-    def list_sessions(self) -> List[str]:
-        return list(self.conversations.keys())
+    def format_history_for_prompt(self, session_id: str, max_messages: int = 5) -> str:
+        return format_messages(self.get_last_messages(session_id, max_messages))
 
     def get_session_summary(self, session_id: str, max_chars: int = 200) -> str:
-        history = self.get_conversation_history(session_id)
+        history = self.get_first_messages(session_id, 3)
         if not history:
             return "No conversation history"
 
         summary_parts = []
         char_count = 0
 
-        for msg in history[:3]:
+        for msg in history:
             role = "User" if msg["role"] == "user" else "Bot"
             content = msg["content"][:100] + \
                 "..." if len(msg["content"]) > 100 else msg["content"]
@@ -86,3 +78,380 @@ class ConversationMemory:
             char_count += len(part)
 
         return " | ".join(summary_parts)
+
+
+class ConversationMemory(_MemoryBase):
+    """Bounded in-process conversation store.
+
+    Each session keeps at most max_messages in a ring buffer, sessions idle
+    for longer than session_ttl seconds are evicted, and at most
+    max_sessions are kept (least recently active go first).
+    """
+
+    def __init__(self, max_messages: int = DEFAULT_MAX_MESSAGES,
+                 session_ttl: float = DEFAULT_SESSION_TTL,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.max_messages = max_messages
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        # Ordered by last activity, so expired sessions are always at the front
+        self.conversations = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id: str, now: float) -> _Session:
+        session = self.conversations.get(session_id)
+        if session is None:
+            session = self.conversations[session_id] = _Session(self.max_messages, now)
+            while len(self.conversations) > self.max_sessions:
+                self.conversations.popitem(last=False)
+        else:
+            self.conversations.move_to_end(session_id)
+        session.last_active = now
+        return session
+
+    def _get(self, session_id: str) -> Optional[_Session]:
+        session = self.conversations.get(session_id)
+        if session is not None and time.time() - session.last_active > self.session_ttl:
+            return None
+        return session
+
+    def create_session(self) -> str:
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._evict_locked(now - self.session_ttl)
+            self._touch(session_id, now)
+        return session_id
+
+    def add_message(self, session_id: str, role: str, content: str):
+        now = time.time()
+        with self._lock:
+            session = self._touch(session_id, now)
+            session.messages.append(_Message(role, content, now))
+            session.total += 1
+
+    def get_last_messages(self, session_id: str, count: int) -> List[Dict]:
+        with self._lock:
+            session = self._get(session_id)
+            if session is None or count <= 0:
+                return []
+            # Walk back from the newest message; cost depends on count only
+            messages = list(islice(reversed(session.messages), count))
+        return [msg.to_dict() for msg in reversed(messages)]
+
+    def get_first_messages(self, session_id: str, count: int) -> List[Dict]:
+        with self._lock:
+            session = self._get(session_id)
+            if session is None:
+                return []
+            messages = list(islice(session.messages, count))
+        return [msg.to_dict() for msg in messages]
+
+    def get_history_window(self, session_id: str, count: int) -> Dict:
+        """The last count messages together with the rolling summary state"""
+        with self._lock:
+            session = self._get(session_id)
+            if session is None:
+                return {"summary": "", "summarized": 0, "total": 0, "messages": []}
+            messages = list(islice(reversed(session.messages), count))
+            window = {"summary": session.summary, "summarized": session.summarized,
+                      "total": session.total}
+        window["messages"] = [msg.to_dict() for msg in reversed(messages)]
+        return window
+
+    def set_summary(self, session_id: str, summary: str, summarized: int):
+        """Store a rolling summary covering the first summarized messages"""
+        with self._lock:
+            session = self._get(session_id)
+            # Never let a slower, older compaction overwrite a newer one
+            if session is not None and session.summarized < summarized <= session.total:
+                session.summary = summary
+                session.summarized = summarized
+
+    def get_conversation_history(self, session_id: str, max_messages: Optional[int] = None) -> List[Dict]:
+        if max_messages:
+            return self.get_last_messages(session_id, max_messages)
+        with self._lock:
+            session = self._get(session_id)
+            messages = list(session.messages) if session is not None else []
+        return [msg.to_dict() for msg in messages]
+
+    def clear_session(self, session_id: str):
+        with self._lock:
+            session = self._get(session_id)
+            if session is not None:
+                session.messages.clear()
+                session.total = session.summarized = 0
+                session.summary = ""
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self.conversations.pop(session_id, None)
+
+    def get_session_info(self, session_id: str) -> Dict:
+        with self._lock:
+            session = self._get(session_id)
+            if session is None:
+                return {"error": "Session not found"}
+            first = session.messages[0] if session.messages else None
+            last = session.messages[-1] if session.messages else None
+            return {
+                "session_id": session_id,
+                "message_count": len(session.messages),
+                "created": _isoformat(first.timestamp) if first else None,
+                "last_updated": _isoformat(last.timestamp) if last else None
+            }
+
+    def list_sessions(self) -> List[str]:
+        self.evict_expired()
+        with self._lock:
+            return list(self.conversations)
+
+    def evict_expired(self) -> List[str]:
+        """Drop sessions idle for longer than the TTL; returns their ids"""
+        with self._lock:
+            return self._evict_locked(time.time() - self.session_ttl)
+
+    def _evict_locked(self, cutoff: float) -> List[str]:
+        evicted = []
+        while self.conversations:
+            session_id, session = next(iter(self.conversations.items()))
+            if session.last_active >= cutoff:
+                break
+            self.conversations.popitem(last=False)
+            evicted.append(session_id)
+        return evicted
+
+    def session_count(self) -> int:
+        with self._lock:
+            return len(self.conversations)
+
+
+class SQLiteConversationMemory(_MemoryBase):
+    """Conversation store in SQLite (WAL), so sessions survive restarts.
+
+    Applies the same per-session message cap and idle-session TTL as
+    ConversationMemory; history reads use the (session_id, id) index and
+    only touch the rows they return.
+    """
+
+    def __init__(self, db_path: str, max_messages: int = DEFAULT_MAX_MESSAGES,
+                 session_ttl: float = DEFAULT_SESSION_TTL,
+                 max_sessions: int = DEFAULT_MAX_SESSIONS):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self.session_ttl = session_ttl
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._last_eviction = 0.0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                created REAL NOT NULL,
+                last_active REAL NOT NULL,
+                message_total INTEGER NOT NULL DEFAULT 0,
+                summary TEXT NOT NULL DEFAULT '',
+                summarized INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS sessions_last_active ON sessions (last_active);
+            CREATE TABLE IF NOT EXISTS messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                session_id TEXT NOT NULL,
+                role TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS messages_session ON messages (session_id, id);
+        """)
+        self._db.commit()
+
+    @staticmethod
+    def _to_dicts(rows) -> List[Dict]:
+        return [{"role": role, "content": content, "timestamp": _isoformat(timestamp)}
+                for role, content, timestamp in rows]
+
+    def _is_live(self, session_id: str) -> bool:
+        row = self._db.execute(
+            "SELECT last_active FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        return row is not None and time.time() - row[0] <= self.session_ttl
+
+    def _touch(self, session_id: str, now: float):
+        self._db.execute(
+            "INSERT INTO sessions (session_id, created, last_active) VALUES (?, ?, ?) "
+            "ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active",
+            (session_id, now, now))
+
+    def _maybe_evict(self, now: float):
+        # Eviction scans the last_active index; once a minute is plenty
+        if now - self._last_eviction >= 60:
+            self._last_eviction = now
+            self._evict(now)
+
+    def _evict(self, now: float) -> List[str]:
+        expired = [row[0] for row in self._db.execute(
+            "SELECT session_id FROM sessions WHERE last_active < ?", (now - self.session_ttl,))]
+        overflow = self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] \
+            - len(expired) - self.max_sessions
+        if overflow > 0:
+            expired += [row[0] for row in self._db.execute(
+                "SELECT session_id FROM sessions WHERE last_active >= ? "
+                "ORDER BY last_active LIMIT ?", (now - self.session_ttl, overflow))]
+        self._delete(expired)
+        return expired
+
+    def _delete(self, session_ids: List[str]):
+        for i in range(0, len(session_ids), 500):
+            batch = session_ids[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            self._db.execute(f"DELETE FROM messages WHERE session_id IN ({placeholders})", batch)
+            self._db.execute(f"DELETE FROM sessions WHERE session_id IN ({placeholders})", batch)
+
+    def create_session(self) -> str:
+        session_id = str(uuid.uuid4())
+        now = time.time()
+        with self._lock:
+            self._touch(session_id, now)
+            self._maybe_evict(now)
+            self._db.commit()
+        return session_id
+
+    def add_message(self, session_id: str, role: str, content: str):
+        now = time.time()
+        with self._lock:
+            self._touch(session_id, now)
+            self._db.execute(
+                "INSERT INTO messages (session_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, role, content, now))
+            self._db.execute(
+                "UPDATE sessions SET message_total = message_total + 1 WHERE session_id = ?",
+                (session_id,))
+            # Enforce the cap: drop everything older than the newest max_messages
+            self._db.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id < ("
+                "SELECT MIN(id) FROM (SELECT id FROM messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?))",
+                (session_id, session_id, self.max_messages))
+            self._db.commit()
+
+    def get_last_messages(self, session_id: str, count: int) -> List[Dict]:
+        if count <= 0:
+            return []
+        with self._lock:
+            if not self._is_live(session_id):
+                return []
+            rows = self._db.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?", (session_id, count)).fetchall()
+        return self._to_dicts(reversed(rows))
+
+    def get_first_messages(self, session_id: str, count: int) -> List[Dict]:
+        with self._lock:
+            if not self._is_live(session_id):
+                return []
+            rows = self._db.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? "
+                "ORDER BY id LIMIT ?", (session_id, count)).fetchall()
+        return self._to_dicts(rows)
+
+    def get_history_window(self, session_id: str, count: int) -> Dict:
+        """The last count messages together with the rolling summary state"""
+        with self._lock:
+            if not self._is_live(session_id):
+                return {"summary": "", "summarized": 0, "total": 0, "messages": []}
+            total, summary, summarized = self._db.execute(
+                "SELECT message_total, summary, summarized FROM sessions WHERE session_id = ?",
+                (session_id,)).fetchone()
+            rows = self._db.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? "
+                "ORDER BY id DESC LIMIT ?", (session_id, count)).fetchall()
+        return {"summary": summary, "summarized": summarized, "total": total,
+                "messages": self._to_dicts(reversed(rows))}
+
+    def set_summary(self, session_id: str, summary: str, summarized: int):
+        """Store a rolling summary covering the first summarized messages"""
+        with self._lock:
+            self._db.execute(
+                "UPDATE sessions SET summary = ?, summarized = ? WHERE session_id = ? "
+                "AND summarized < ? AND ? <= message_total",
+                (summary, summarized, session_id, summarized, summarized))
+            self._db.commit()
+
+    def get_conversation_history(self, session_id: str, max_messages: Optional[int] = None) -> List[Dict]:
+        if max_messages:
+            return self.get_last_messages(session_id, max_messages)
+        with self._lock:
+            if not self._is_live(session_id):
+                return []
+            rows = self._db.execute(
+                "SELECT role, content, timestamp FROM messages WHERE session_id = ? "
+                "ORDER BY id", (session_id,)).fetchall()
+        return self._to_dicts(rows)
+
+    def clear_session(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            self._db.execute(
+                "UPDATE sessions SET message_total = 0, summary = '', summarized = 0 "
+                "WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def delete_session(self, session_id: str):
+        with self._lock:
+            self._delete([session_id])
+            self._db.commit()
+
+    def get_session_info(self, session_id: str) -> Dict:
+        with self._lock:
+            if not self._is_live(session_id):
+                return {"error": "Session not found"}
+            count, first, last = self._db.execute(
+                "SELECT COUNT(*), MIN(timestamp), MAX(timestamp) FROM messages "
+                "WHERE session_id = ?", (session_id,)).fetchone()
+        return {
+            "session_id": session_id,
+            "message_count": count,
+            "created": _isoformat(first) if first is not None else None,
+            "last_updated": _isoformat(last) if last is not None else None
+        }
+
+    def list_sessions(self) -> List[str]:
+        self.evict_expired()
+        with self._lock:
+            return [row[0] for row in self._db.execute(
+                "SELECT session_id FROM sessions ORDER BY last_active")]
+
+    def evict_expired(self) -> List[str]:
+        """Drop sessions idle for longer than the TTL; returns their ids"""
+        now = time.time()
+        with self._lock:
+            self._last_eviction = now
+            evicted = self._evict(now)
+            self._db.commit()
+        return evicted
+
+    def session_count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def create_memory(backend: Optional[str] = None, persist_directory: str = "chroma_db", **kwargs):
+    """Build the memory backend named by MEMORY_BACKEND ("memory" or "sqlite")"""
+    backend = (backend or os.getenv("MEMORY_BACKEND", "memory")).lower()
+    if backend == "memory":
+        return ConversationMemory(**kwargs)
+    elif backend == "sqlite":
+        db_path = os.getenv("MEMORY_DB_PATH") or os.path.join(persist_directory, "conversations.sqlite")
+        return SQLiteConversationMemory(db_path, **kwargs)
+    else:
+        raise ValueError(f"Unsupported memory backend: {backend}")
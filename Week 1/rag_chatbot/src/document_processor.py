@@ -1,7 +1,21 @@
 import docx
 import PyPDF2
+import hashlib
 import os
-from typing import List, Tuple
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Optional
+from .ingestion_job import IngestionProgress, IngestionQueue
+from .ingestion_manifest import IngestionManifest, hash_file
+from .text_chunker import (
+    DEFAULT_CHUNK_TOKENS,
+    DEFAULT_OVERLAP_TOKENS,
+    iter_chunks,
+    split_text
+)
+
+SUPPORTED_EXTENSIONS = ('.txt', '.md', '.pdf', '.docx')
 
 
 def read_text_file(file_path: str) -> str:
@@ -10,12 +24,7 @@ def read_text_file(file_path: str) -> str:
 
 
 def read_pdf_file(file_path: str) -> str:
-    text = ""
-    with open(file_path, 'rb') as file:
-        pdf_reader = PyPDF2.PdfReader(file)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
-    return text
+    return "".join(text for _, text in iter_pdf_pages(file_path))
 
 
 def read_docx_file(file_path: str) -> str:
@@ -27,7 +36,7 @@ def read_document(file_path: str) -> str:
     _, file_extension = os.path.splitext(file_path)
     file_extension = file_extension.lower()
 
-    if file_extension == '.txt':
+    if file_extension in ('.txt', '.md'):
         return read_text_file(file_path)
     elif file_extension == '.pdf':
         return read_pdf_file(file_path)
@@ -37,78 +46,549 @@ def read_document(file_path: str) -> str:
         raise ValueError(f"Unsupported file format: {file_extension}")
 
 
-def split_text(text: str, chunk_size: int = 500) -> List[str]:
-    sentences = text.replace('\n', ' ').split('. ')
-    chunks = []
-    current_chunk = []
-    current_size = 0
+def iter_text_pages(file_path: str, block_size: int = 1 << 16) -> Iterator[Tuple[Optional[int], str]]:
+    """Yield a text file in fixed-size blocks; plain text has no page numbers"""
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for block in iter(lambda: file.read(block_size), ''):
+            yield None, block
 
-    for sentence in sentences:
-        sentence = sentence.strip()
-        if not sentence:
-            continue
 
-        if not sentence.endswith('.'):
-            sentence += '.'
+def iter_pdf_pages(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    with open(file_path, 'rb') as file:
+        pdf_reader = PyPDF2.PdfReader(file)
+        for page_number, page in enumerate(pdf_reader.pages, 1):
+            yield page_number, page.extract_text() + "\n"
+
 
-        sentence_size = len(sentence)
+def _docx_paragraph_markdown(paragraph) -> str:
+    """Render headings and list items the way the chunker recognises them"""
+    style_name = paragraph.style.name if paragraph.style is not None else ""
+    if style_name == "Title":
+        return f"# {paragraph.text}"
+    if style_name.startswith("Heading"):
+        level = style_name.replace("Heading", "").strip()
+        level = int(level) if level.isdigit() else 1
+        return f"{'#' * min(level, 6)} {paragraph.text}"
+    if style_name.startswith("List"):
+        return f"- {paragraph.text}"
+    return paragraph.text
 
-        if current_size + sentence_size > chunk_size and current_chunk:
-            chunks.append(' '.join(current_chunk))
-            current_chunk = [sentence]
-            current_size = sentence_size
-        else:
-            current_chunk.append(sentence)
-            current_size += sentence_size
 
-    if current_chunk:
-        chunks.append(' '.join(current_chunk))
+def iter_docx_pages(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    """Yield docx text page by page, using the page breaks Word rendered last"""
+    doc = docx.Document(file_path)
+    page_number = 1
+    blocks = []
+    for paragraph in doc.paragraphs:
+        page_breaks = len(getattr(paragraph, "rendered_page_breaks", []))
+        if page_breaks and blocks:
+            yield page_number, "\n\n".join(blocks) + "\n\n"
+            blocks = []
+        page_number += page_breaks
+        if paragraph.text.strip():
+            blocks.append(_docx_paragraph_markdown(paragraph))
 
-    return chunks
+    if blocks:
+        yield page_number, "\n\n".join(blocks)
 
 
-def process_document(file_path: str) -> Tuple[List[str], List[str], List[dict]]:
-    try:
-        content = read_document(file_path)
+def iter_document_pages(file_path: str) -> Iterator[Tuple[Optional[int], str]]:
+    _, file_extension = os.path.splitext(file_path)
+    file_extension = file_extension.lower()
+
+    if file_extension in ('.txt', '.md'):
+        return iter_text_pages(file_path)
+    elif file_extension == '.pdf':
+        return iter_pdf_pages(file_path)
+    elif file_extension == '.docx':
+        return iter_docx_pages(file_path)
+    else:
+        raise ValueError(f"Unsupported file format: {file_extension}")
+
+
+def _chunk_id(file_name: str, path_digest: str, chunk: str, seen: dict) -> str:
+    chunk_digest = hashlib.sha1(chunk.encode('utf-8')).hexdigest()[:16]
+    # Identical chunks inside one file still need distinct ids
+    occurrence = seen.get(chunk_digest, 0)
+    seen[chunk_digest] = occurrence + 1
+    suffix = f"_{occurrence}" if occurrence else ""
+    return f"{file_name}_{path_digest}_{chunk_digest}{suffix}"
+
+
+def _path_digest(file_path: str) -> str:
+    return hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:8]
+
+
+def _legacy_chunk_ids(collection, file_name: str) -> List[str]:
+    """Ids of chunks stored under the old positional '{file_name}_chunk_{i}' scheme"""
+    pattern = re.compile(re.escape(file_name) + r"_chunk_\d+")
+    ids = collection.get_ids(where={"source": file_name})
+    return [id_ for id_ in ids if pattern.fullmatch(id_)]
+
+
+def document_metadata(file_path: str) -> dict:
+    """Filterable file-level metadata: document type and modification date (YYYYMMDD)"""
+    return {
+        "doc_type": os.path.splitext(file_path)[1].lower().lstrip('.'),
+        "date": int(time.strftime("%Y%m%d", time.localtime(os.path.getmtime(file_path))))
+    }
+
 
-        chunks = split_text(content)
+def _timed(iterator: Iterable, timings: Dict[str, float], stage: str,
+           exclude: Optional[str] = None) -> Iterator:
+    """Add the time spent producing each item to timings[stage], minus time already counted under exclude"""
+    iterator = iter(iterator)
+    while True:
+        start_time = time.perf_counter()
+        excluded = timings.get(exclude, 0.0)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start_time \
+                - (timings.get(exclude, 0.0) - excluded)
+        yield item
 
-        file_name = os.path.basename(file_path)
-        metadatas = [{"source": file_name, "chunk": i}
-                     for i in range(len(chunks))]
-        ids = [f"{file_name}_chunk_{i}" for i in range(len(chunks))]
 
-        return ids, chunks, metadatas
+def iter_document_chunks(file_path: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                         overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                         timings: Optional[Dict[str, float]] = None) -> Iterator[Tuple[str, str, dict]]:
+    """Stream (id, chunk, metadata) for a document without holding its full text.
+
+    With timings, seconds spent reading pages and chunking them are added
+    under "read" and "chunk".
+    """
+    file_name = os.path.basename(file_path)
+    path_digest = _path_digest(file_path)
+    file_metadata = document_metadata(file_path)
+    seen = {}
+
+    pages = iter_document_pages(file_path)
+    if timings is not None:
+        pages = _timed(pages, timings, "read")
+    chunks = iter_chunks(pages, chunk_tokens, overlap_tokens)
+    if timings is not None:
+        chunks = _timed(chunks, timings, "chunk", exclude="read")
+    for i, (chunk, first_page, last_page) in enumerate(chunks):
+        metadata = {"source": file_name, "chunk": i, **file_metadata}
+        if first_page is not None:
+            metadata["page"] = first_page
+            metadata["page_end"] = last_page
+        yield _chunk_id(file_name, path_digest, chunk, seen), chunk, metadata
+
+
+def process_document(file_path: str) -> Tuple[List[str], List[str], List[dict]]:
+    try:
+        items = list(iter_document_chunks(file_path))
     except Exception as e:
         print(f"Error processing {file_path}: {str(e)}")
         return [], [], []
 
+    ids = [id_ for id_, _, _ in items]
+    chunks = [chunk for _, chunk, _ in items]
+    metadatas = [metadata for _, _, metadata in items]
+    return ids, chunks, metadatas
+
 
-def add_to_collection(collection, ids: List[str], texts: List[str], metadatas: List[dict]):
+def add_to_collection(collection, ids: List[str], texts: List[str], metadatas: List[dict],
+                      batch_size: int = 100, embeddings: Optional[List[List[float]]] = None):
     if not texts:
         return
 
-    batch_size = 100
     for i in range(0, len(texts), batch_size):
         end_idx = min(i + batch_size, len(texts))
-        collection.add(
+        collection.upsert(
             documents=texts[i:end_idx],
             metadatas=metadatas[i:end_idx],
-            ids=ids[i:end_idx]
+            ids=ids[i:end_idx],
+            embeddings=embeddings[i:end_idx] if embeddings is not None else None
         )
 
 
-def process_and_add_documents(collection, folder_path: str):
+def delete_from_collection(collection, ids: List[str]):
+    if not ids:
+        return
+
+    batch_size = 100
+    for i in range(0, len(ids), batch_size):
+        collection.delete(ids=ids[i:i + batch_size])
+
+
+class _ChunkWriter:
+    """Single writer that batches chunk writes coming from one or many parsers"""
+
+    def __init__(self, collection, batch_size: int = 512, timings: Optional[Dict[str, float]] = None):
+        self.collection = collection
+        self.batch_size = batch_size
+        # Seconds spent embedding and writing, added under "embed" and "write"
+        self.timings = timings if timings is not None else {"embed": 0.0, "write": 0.0}
+        self.ids, self.texts, self.metadatas = [], [], []
+        self.update_ids, self.update_metadatas = [], []
+
+    def upsert(self, ids: List[str], texts: List[str], metadatas: List[dict]):
+        self.ids.extend(ids)
+        self.texts.extend(texts)
+        self.metadatas.extend(metadatas)
+        if len(self.ids) >= self.batch_size:
+            self.flush()
+
+    def update_metadata(self, ids: List[str], metadatas: List[dict]):
+        self.update_ids.extend(ids)
+        self.update_metadatas.extend(metadatas)
+        if len(self.update_ids) >= self.batch_size:
+            self.flush()
+
+    def delete(self, ids: List[str]):
+        start_time = time.perf_counter()
+        # New ids are content-addressed, so stale ids never collide with queued ones
+        delete_from_collection(self.collection, ids)
+        self.timings["write"] += time.perf_counter() - start_time
+
+    def flush(self):
+        start_time = time.perf_counter()
+        # One embedding call per flush lets the embedder batch the whole buffer at once
+        embeddings = self.collection.embedder.embed(self.texts) if self.texts else None
+        write_start = time.perf_counter()
+        self.timings["embed"] += write_start - start_time
+
+        add_to_collection(self.collection, self.ids, self.texts, self.metadatas,
+                          batch_size=self.batch_size, embeddings=embeddings)
+        if self.update_ids:
+            self.collection.update(ids=self.update_ids,
+                                   metadatas=self.update_metadatas)
+        self.timings["write"] += time.perf_counter() - write_start
+        self.ids, self.texts, self.metadatas = [], [], []
+        self.update_ids, self.update_metadatas = [], []
+
+
+class _ParseError(Exception):
+    """A file could not be read or chunked"""
+
+
+def _parse_document(file_path: str) -> Tuple[str, List[tuple], Optional[str], Dict[str, float]]:
+    """Process-pool entry point: read and chunk one file, never raising"""
+    timings = {"read": 0.0, "chunk": 0.0}
+    try:
+        return file_path, list(iter_document_chunks(file_path, timings=timings)), None, timings
+    except Exception as e:
+        return file_path, [], str(e), timings
+
+
+def _iter_parsed(file_paths: List[str], workers: int) -> Iterator[tuple]:
+    """Yield (file_path, chunks, error, timings); serial timings fill in as chunks are consumed"""
+    if workers <= 1 or len(file_paths) <= 1:
+        # Serially, chunks stream straight into the writer so memory stays
+        # bounded no matter how large a single document is
+        for file_path in file_paths:
+            timings = {"read": 0.0, "chunk": 0.0}
+            yield file_path, iter_document_chunks(file_path, timings=timings), None, timings
+        return
+
+    # Keep a bounded window in flight so parsed chunks never pile up faster
+    # than the writer can drain them
+    max_in_flight = workers * 4
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = set()
+        for file_path in file_paths:
+            in_flight.add(executor.submit(_parse_document, file_path))
+            if len(in_flight) < max_in_flight:
+                continue
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
+
+        for future in as_completed(in_flight):
+            yield future.result()
+
+
+def _write_parsed(writer: _ChunkWriter, manifest: Optional[IngestionManifest],
+                  file_path: str, items: Iterable[Tuple[str, str, dict]],
+                  extra_metadata: Optional[dict] = None) -> Tuple[List[str], int, int]:
+    """Queue the chunks of one file, replacing only stale ones. Returns (ids, added, deleted)."""
+    entry = manifest.get(file_path) if manifest is not None else None
+    old_ids = set(entry["chunk_ids"]) if entry else set()
+
+    ids = []
+    added_ids = []
+    items = iter(items)
+    while True:
+        try:
+            id_, text, metadata = next(items)
+        except StopIteration:
+            break
+        except Exception as e:
+            # Don't leave half a document behind when parsing fails midway
+            writer.flush()
+            writer.delete(added_ids)
+            raise _ParseError(str(e)) from e
+
+        if extra_metadata:
+            metadata = {**metadata, **extra_metadata}
+        ids.append(id_)
+        # Write errors (embedding, storage) are not the file's fault and propagate as-is
+        if id_ in old_ids:
+            # Chunk positions may have shifted; metadata updates do not re-embed
+            writer.update_metadata([id_], [metadata])
+        else:
+            added_ids.append(id_)
+            writer.upsert([id_], [text], [metadata])
+
+    stale_ids = list(old_ids.difference(ids))
+    writer.delete(stale_ids)
+    return ids, len(added_ids), len(stale_ids)
+
+
+def _empty_stats() -> dict:
+    return {
+        "files_added": 0,
+        "files_updated": 0,
+        "files_unchanged": 0,
+        "files_removed": 0,
+        "files_failed": 0,
+        "chunks_added": 0,
+        "chunks_deleted": 0,
+        "changed_sources": [],
+        "resumed": False,
+        "stage_seconds": {},
+        "elapsed_seconds": 0.0,
+        "files_per_sec": 0.0,
+        "chunks_per_sec": 0.0
+    }
+
+
+def _finish_stats(stats: dict, start_time: float, stage_seconds: Dict[str, float]) -> dict:
+    elapsed = time.perf_counter() - start_time
+    files_processed = stats["files_added"] + stats["files_updated"]
+    stats["stage_seconds"] = dict(stage_seconds)
+    stats["elapsed_seconds"] = elapsed
+    if elapsed > 0:
+        stats["files_per_sec"] = files_processed / elapsed
+        stats["chunks_per_sec"] = stats["chunks_added"] / elapsed
+    return stats
+
+
+def _resolve_department(department: Optional[str], folder_path: str) -> str:
+    """Department to tag chunks with: the folder's name when None, untagged when empty"""
+    if department is None:
+        department = os.path.basename(os.path.normpath(os.path.abspath(folder_path)))
+    return department.strip().lower()
+
+
+def _ingest_parsed(writer: _ChunkWriter, manifest: Optional[IngestionManifest], file_path: str,
+                   items: Iterable[Tuple[str, str, dict]], record: tuple, department: str,
+                   stats: dict, verbose: bool = True) -> Tuple[Optional[str], int]:
+    """Write one parsed file and record it in the manifest. Returns (error, chunks added)."""
+    is_update = manifest is not None and manifest.get(file_path) is not None
+    try:
+        ids, added, deleted = _write_parsed(
+            writer, manifest, file_path, items, {"department": department} if department else None)
+    except _ParseError as e:
+        return str(e), 0
+
+    if manifest is not None:
+        if not is_update:
+            # A knowledge base built before the manifest existed holds
+            # positional ids nothing else would ever purge
+            legacy_ids = _legacy_chunk_ids(writer.collection, os.path.basename(file_path))
+            writer.delete(legacy_ids)
+            deleted += len(legacy_ids)
+        mtime, size, content_hash = record
+        manifest.record(file_path, mtime, size, content_hash, ids)
+
+    stats["files_updated" if is_update else "files_added"] += 1
+    stats["changed_sources"].append(os.path.basename(file_path))
+    stats["chunks_added"] += added
+    stats["chunks_deleted"] += deleted
+    if verbose:
+        print(f"Processed {os.path.basename(file_path)}: "
+              f"added {added} chunks, removed {deleted} stale chunks")
+    return None, added
+
+
+def _remove_file(writer: _ChunkWriter, manifest: IngestionManifest, file_path: str, stats: dict):
+    stale_ids = manifest.remove(file_path)
+    writer.delete(stale_ids)
+    stats["files_removed"] += 1
+    stats["changed_sources"].append(os.path.basename(file_path))
+    stats["chunks_deleted"] += len(stale_ids)
+    print(f"Removed {len(stale_ids)} chunks from deleted file {os.path.basename(file_path)}")
+
+
+def _checkpoint(writer: _ChunkWriter, collection, manifest: Optional[IngestionManifest],
+                queue: Optional[IngestionQueue], job_id: Optional[int],
+                succeeded: List[str], failed: Dict[str, str]):
+    """Make everything written so far durable, then mark those files done"""
+    writer.flush()
+    collection.commit()
+    if manifest is not None:
+        manifest.save()
+    if queue is not None:
+        queue.checkpoint(job_id, collection.collection_name, succeeded, failed)
+    succeeded.clear()
+    failed.clear()
+
+
+def _scan_folder(files: List[str], manifest: Optional[IngestionManifest], stats: dict) -> Dict[str, tuple]:
+    """Files that need parsing, with the (mtime, size, sha256) the manifest will record"""
+    pending = {}
+    for file_path in files:
+        stat = os.stat(file_path)
+        if manifest is None:
+            pending[file_path] = (stat.st_mtime, stat.st_size, None)
+            continue
+
+        if manifest.is_unchanged(file_path, stat):
+            stats["files_unchanged"] += 1
+            continue
+
+        entry = manifest.get(file_path)
+        content_hash = hash_file(file_path)
+        if entry is not None and entry["sha256"] == content_hash:
+            manifest.touch(file_path, stat)
+            stats["files_unchanged"] += 1
+            continue
+
+        pending[file_path] = (stat.st_mtime, stat.st_size, content_hash)
+    return pending
+
+
+def process_and_add_documents(collection, folder_path: str,
+                              manifest: Optional[IngestionManifest] = None,
+                              purge_missing: bool = True,
+                              workers: int = 1,
+                              department: Optional[str] = None,
+                              queue: Optional[IngestionQueue] = None,
+                              resume: bool = False,
+                              progress_callback: Optional[Callable[[dict], None]] = None) -> dict:
+    """Sync a folder into the collection.
+
+    With a queue the run is a checkpointed job: every INGEST_CHECKPOINT_FILES
+    files or INGEST_CHECKPOINT_SECONDS seconds, buffered chunks are written,
+    the manifest saved and the finished files marked done. resume=True
+    continues an interrupted job for the folder from its last checkpoint
+    instead of scanning the folder again. Files that fail are recorded in the
+    queue's dead-letter list. progress_callback, if given, receives a
+    progress snapshot about once a second instead of per-file messages.
+    """
+    stats = _empty_stats()
+
     if not os.path.exists(folder_path):
         print(f"Folder {folder_path} does not exist")
-        return
+        return stats
 
+    start_time = time.perf_counter()
+    # Skip unsupported files before they are stat'ed and hashed
     files = [os.path.join(folder_path, file)
              for file in os.listdir(folder_path)
-             if os.path.isfile(os.path.join(folder_path, file))]
+             if os.path.isfile(os.path.join(folder_path, file))
+             and os.path.splitext(file)[1].lower() in SUPPORTED_EXTENSIONS]
 
-    for file_path in files:
-        print(f"Processing {os.path.basename(file_path)}...")
-        ids, texts, metadatas = process_document(file_path)
-        add_to_collection(collection, ids, texts, metadatas)
-        print(f"Added {len(texts)} chunks to collection")
+    job = queue.find_job(collection.collection_name, folder_path) if queue is not None and resume else None
+    if job is not None:
+        # The interrupted run already decided what to parse
+        job_id = job["job_id"]
+        department, purge_missing = job["department"], job["purge_missing"]
+        pending = {path: (mtime, size, sha256)
+                   for path, mtime, size, sha256 in queue.pending_files(job_id)}
+        files_done, files_total = queue.count_files(job_id)
+        stats["resumed"] = True
+        print(f"Resuming ingestion of {folder_path}: {files_done} of {files_total} files already done")
+    else:
+        if resume:
+            print(f"No interrupted ingestion of {folder_path} to resume; syncing the folder")
+        # Chunks are tagged with a department, by default the folder's name
+        department = _resolve_department(department, folder_path)
+        # Decide up front which files need parsing; only those go to the pool
+        pending = _scan_folder(files, manifest, stats)
+        job_id = None
+        if queue is not None:
+            job_id = queue.create_job(collection.collection_name, folder_path, department, purge_missing,
+                                      [(path, *record) for path, record in pending.items()])
+        files_done, files_total = 0, len(pending)
+
+    checkpoint_files = int(os.getenv("INGEST_CHECKPOINT_FILES", "200"))
+    checkpoint_seconds = float(os.getenv("INGEST_CHECKPOINT_SECONDS", "30"))
+    progress = IngestionProgress(files_total, files_done, progress_callback)
+    writer = _ChunkWriter(collection, timings=progress.stage_seconds)
+    succeeded, failed = [], {}
+    last_checkpoint = time.perf_counter()
+    try:
+        for file_path, items, error, timings in _iter_parsed(list(pending), workers):
+            added = 0
+            if error is None:
+                error, added = _ingest_parsed(writer, manifest, file_path, items, pending[file_path],
+                                              department, stats, verbose=progress_callback is None)
+            progress.add_stage_time(timings)
+
+            if error is not None:
+                print(f"Error processing {file_path}: {error}")
+                stats["files_failed"] += 1
+                failed[file_path] = error
+                progress.file_finished(0, failed=True)
+                continue
+
+            succeeded.append(file_path)
+            progress.file_finished(added)
+
+            if (len(succeeded) + len(failed) >= checkpoint_files
+                    or time.perf_counter() - last_checkpoint >= checkpoint_seconds):
+                _checkpoint(writer, collection, manifest, queue, job_id, succeeded, failed)
+                last_checkpoint = time.perf_counter()
+
+        if manifest is not None and purge_missing:
+            current = {os.path.abspath(file_path) for file_path in files}
+            for file_path in manifest.files_in_folder(folder_path):
+                if file_path in current:
+                    continue
+                _remove_file(writer, manifest, file_path, stats)
+    finally:
+        _checkpoint(writer, collection, manifest, queue, job_id, succeeded, failed)
+
+    if queue is not None:
+        queue.prune_dead_letters(collection.collection_name, folder_path, files)
+        queue.finish_job(job_id)
+    progress.report(force=True)
+    return _finish_stats(stats, start_time, progress.stage_seconds)
+
+
+def process_changed_files(collection, folder_path: str, file_paths: List[str],
+                          manifest: Optional[IngestionManifest] = None,
+                          department: Optional[str] = None) -> dict:
+    """Sync only the given files of a folder, e.g. the ones a watcher saw change.
+
+    Files that still exist are re-ingested if their content changed; files
+    that are gone have their chunks removed. Nothing else in the folder is
+    scanned.
+    """
+    stats = _empty_stats()
+    start_time = time.perf_counter()
+    department = _resolve_department(department, folder_path)
+    existing = sorted({file_path for file_path in file_paths
+                       if os.path.isfile(file_path)
+                       and os.path.splitext(file_path)[1].lower() in SUPPORTED_EXTENSIONS})
+    pending = _scan_folder(existing, manifest, stats)
+
+    writer = _ChunkWriter(collection)
+    try:
+        if manifest is not None:
+            for file_path in set(file_paths).difference(existing):
+                if manifest.get(file_path) is not None and not os.path.exists(file_path):
+                    _remove_file(writer, manifest, file_path, stats)
+
+        for file_path, items, error, timings in _iter_parsed(list(pending), 1):
+            if error is None:
+                error, _ = _ingest_parsed(writer, manifest, file_path, items, pending[file_path],
+                                          department, stats)
+            if error is not None:
+                print(f"Error processing {file_path}: {error}")
+                stats["files_failed"] += 1
+            writer.timings.update(
+                {stage: writer.timings.get(stage, 0.0) + seconds for stage, seconds in timings.items()})
+    finally:
+        writer.flush()
+        collection.commit()
+        if manifest is not None:
+            manifest.save()
+
+    return _finish_stats(stats, start_time, writer.timings)
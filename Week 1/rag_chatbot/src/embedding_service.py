@@ -0,0 +1,146 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+import numpy as np
+from typing import Dict, List, Optional
+
+
+class EmbeddingService:
+    """Batched sentence-transformer embeddings with a persistent cache.
+
+    Document vectors are cached in SQLite keyed by a hash of (model name,
+    text), so a chunk that appears in many documents is only ever embedded
+    once. Query vectors live in a bounded in-memory LRU instead, which keeps
+    disk writes off the query path.
+    """
+
+    def __init__(self, model_name: str = "all-MiniLM-L6-v2", cache_path: Optional[str] = None,
+                 batch_size: int = 256, num_threads: Optional[int] = None,
+                 device: Optional[str] = None, query_cache_size: int = 1024):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.device = device
+        self._model = None
+        self._lock = threading.Lock()
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "embedded": 0,
+                      "query_cache_hits": 0, "query_cache_misses": 0}
+        self.query_cache_size = query_cache_size
+        self._query_cache = OrderedDict()
+        self._query_lock = threading.Lock()
+
+        self._db = None
+        if cache_path:
+            directory = os.path.dirname(cache_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(cache_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+            self._db.commit()
+
+    @property
+    def model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+
+            if self.num_threads:
+                import torch
+                torch.set_num_threads(self.num_threads)
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+        return self._model
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).hexdigest()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        if self._db is None or not keys:
+            return {}
+
+        found = {}
+        # Stay well below SQLite's bound-parameter limit
+        for i in range(0, len(keys), 500):
+            batch = keys[i:i + 500]
+            placeholders = ",".join("?" * len(batch))
+            rows = self._db.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch)
+            for key, blob in rows:
+                found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def _store(self, keys: List[str], vectors: np.ndarray):
+        if self._db is None:
+            return
+
+        self._db.executemany(
+            "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+            [(key, vector.astype(np.float32).tobytes())
+             for key, vector in zip(keys, vectors)])
+        self._db.commit()
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+
+        keys = [self._key(text) for text in texts]
+        unique = dict(zip(keys, texts))
+
+        with self._lock:
+            vectors = self._lookup(list(unique))
+            missing = [key for key in unique if key not in vectors]
+            self.stats["cache_hits"] += len(unique) - len(missing)
+            self.stats["cache_misses"] += len(missing)
+
+            # Longest first, so each batch holds texts of similar length and
+            # the tokenizer pads as little as possible
+            missing.sort(key=lambda key: len(unique[key]), reverse=True)
+            for i in range(0, len(missing), self.batch_size):
+                batch_keys = missing[i:i + self.batch_size]
+                batch_vectors = self.model.encode(
+                    [unique[key] for key in batch_keys],
+                    batch_size=self.batch_size,
+                    convert_to_numpy=True
+                )
+                self._store(batch_keys, batch_vectors)
+                vectors.update(zip(batch_keys, batch_vectors))
+                self.stats["embedded"] += len(batch_keys)
+
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_queries([text])[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Embed many queries with one model call for all cache misses"""
+        keys = [self._key(text) for text in texts]
+        vectors = {}
+        with self._query_lock:
+            for key in keys:
+                vector = self._query_cache.get(key)
+                if vector is not None:
+                    self._query_cache.move_to_end(key)
+                    vectors[key] = vector
+            missing = {key: text for key, text in zip(keys, texts) if key not in vectors}
+            self.stats["query_cache_hits"] += len(keys) - len(missing)
+            self.stats["query_cache_misses"] += len(missing)
+
+        if missing:
+            # Queries skip the document lock and the SQLite store entirely
+            encoded = self.model.encode(
+                list(missing.values()), batch_size=self.batch_size, convert_to_numpy=True)
+            with self._query_lock:
+                for key, vector in zip(missing, encoded):
+                    vectors[key] = self._query_cache[key] = vector.tolist()
+                while len(self._query_cache) > self.query_cache_size:
+                    self._query_cache.popitem(last=False)
+        return [vectors[key] for key in keys]
+
+    def get_stats(self) -> dict:
+        total = self.stats["cache_hits"] + self.stats["cache_misses"]
+        return {
+            **self.stats,
+            "hit_rate": self.stats["cache_hits"] / total if total else 0.0
+        }
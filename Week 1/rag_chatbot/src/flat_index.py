@@ -0,0 +1,349 @@
+import json
+import os
+import re
+import shutil
+import sqlite3
+import threading
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+QUANTIZATIONS = ("int8", "binary")
+CollectionInfo = namedtuple("CollectionInfo", "name")
+
+_KEY_PATTERN = re.compile(r"\w+")
+_SQL_OPERATORS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+# Set bits of every byte value, for Hamming distances over packed sign bits
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Rows scored per block, so temporaries stay small however large the shard
+_BLOCK_ROWS = 16384
+
+
+def where_to_sql(where: Optional[dict]) -> Tuple[str, list]:
+    """Translate a Chroma where clause into SQL over the JSON metadata column"""
+    if not where:
+        return "1", []
+    clauses, params = [], []
+    for key, value in where.items():
+        if key in ("$and", "$or"):
+            parts = [where_to_sql(condition) for condition in value]
+            joiner = " AND " if key == "$and" else " OR "
+            clauses.append("(" + joiner.join(sql for sql, _ in parts) + ")")
+            params.extend(param for _, part_params in parts for param in part_params)
+            continue
+        if not _KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"Invalid metadata key: {key}")
+        column = f"json_extract(metadata, '$.{key}')"
+        conditions = value if isinstance(value, dict) else {"$eq": value}
+        for operator, operand in conditions.items():
+            if operator in ("$in", "$nin"):
+                placeholders = ", ".join("?" * len(operand))
+                negate = "NOT " if operator == "$nin" else ""
+                clauses.append(f"{column} {negate}IN ({placeholders})")
+                params.extend(operand)
+            elif operator in _SQL_OPERATORS:
+                clauses.append(f"{column} {_SQL_OPERATORS[operator]} ?")
+                params.append(operand)
+            else:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+    return " AND ".join(clauses), params
+
+
+class FlatCollection:
+    """Quantized embeddings in memory-mapped arrays with a SQLite sidecar.
+
+    Row i of the arrays belongs to the chunk stored with row = i in the
+    chunks table (id, document, metadata). Embeddings are stored as int8
+    codes with a per-row scale, or as packed sign bits ("binary"), and
+    searched by brute force in blocks. With rescore on, float16 copies of
+    the vectors are kept in a further memory-mapped file and only read for
+    the top candidates, which are then re-ranked by their float distance. Deleted
+    rows are reused by later inserts. Implements the part of the Chroma
+    collection API that VectorDatabase uses; distances are squared L2.
+    """
+
+    def __init__(self, path: str, name: str, quantization: Optional[str] = None,
+                 rescore: Optional[bool] = None, rescore_factor: Optional[int] = None):
+        self.path = path
+        self.name = name
+        os.makedirs(path, exist_ok=True)
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(path, "chunks.sqlite"), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS chunks (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+            "document TEXT, metadata TEXT)")
+
+        # The layout is fixed when the collection is created
+        settings = dict(self._db.execute("SELECT key, value FROM settings"))
+        if not settings:
+            settings = {
+                "quantization": (quantization or os.getenv("FLAT_QUANTIZATION", "int8")).lower(),
+                "rescore": str(rescore if rescore is not None else
+                               os.getenv("FLAT_RESCORE", "true").lower() in ("1", "true", "yes")),
+                "dim": "0"
+            }
+            if settings["quantization"] not in QUANTIZATIONS:
+                raise ValueError(f"Unknown quantization: {settings['quantization']}")
+            self._db.executemany("INSERT INTO settings VALUES (?, ?)", settings.items())
+            self._db.commit()
+        self.quantization = settings["quantization"]
+        self.rescore = settings["rescore"] == "True"
+        self.dim = int(settings["dim"])
+        self.rescore_factor = rescore_factor or int(os.getenv("FLAT_RESCORE_FACTOR", "4"))
+
+        rows = [row for (row,) in self._db.execute("SELECT row FROM chunks")]
+        self._rows_used = max(rows) + 1 if rows else 0
+        self._capacity = 0
+        self._arrays = {}
+        self._live = np.zeros(0, dtype=bool)
+        if self.dim:
+            self._open_arrays(self._rows_used)
+            self._live[rows] = True
+
+    def _array_specs(self) -> Dict[str, Tuple[Any, tuple]]:
+        if self.quantization == "int8":
+            specs = {"codes": (np.int8, (self.dim,)), "scales": (np.float32, ())}
+        else:
+            specs = {"codes": (np.uint8, ((self.dim + 7) // 8,))}
+        specs["norms"] = (np.float32, ())
+        if self.rescore:
+            specs["vectors"] = (np.float16, (self.dim,))
+        return specs
+
+    def _open_arrays(self, rows: int):
+        """(Re)map every array file with room for at least rows rows"""
+        capacity = max(self._capacity, 1024)
+        while capacity < rows:
+            capacity *= 2
+        for name, (dtype, shape) in self._array_specs().items():
+            file_path = os.path.join(self.path, f"{name}.bin")
+            size = capacity * int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+            with open(file_path, "ab") as file:
+                if file.tell() < size:
+                    file.truncate(size)
+            self._arrays[name] = np.memmap(file_path, dtype=dtype, mode="r+", shape=(capacity,) + shape)
+        live = np.zeros(capacity, dtype=bool)
+        live[:len(self._live)] = self._live
+        self._live = live
+        self._capacity = capacity
+
+    def _encode(self, vectors: np.ndarray) -> Dict[str, np.ndarray]:
+        encoded = {"norms": np.einsum("ij,ij->i", vectors, vectors)}
+        if self.quantization == "int8":
+            scales = np.abs(vectors).max(axis=1) / 127
+            scales[scales == 0] = 1
+            encoded["codes"] = np.round(vectors / scales[:, None]).astype(np.int8)
+            encoded["scales"] = scales.astype(np.float32)
+        else:
+            encoded["codes"] = np.packbits(vectors > 0, axis=1)
+        if self.rescore:
+            encoded["vectors"] = vectors
+        return encoded
+
+    def count(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[dict],
+               embeddings: List[List[float]]):
+        if not ids:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if not self.dim:
+                self.dim = vectors.shape[1]
+                self._db.execute("UPDATE settings SET value = ? WHERE key = 'dim'", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-d embeddings, got {vectors.shape[1]}-d")
+
+            existing = dict(self._db.execute(
+                f"SELECT id, row FROM chunks WHERE id IN ({', '.join('?' * len(ids))})", ids))
+            # New chunks fill rows freed by deletes before the arrays grow
+            needed = sum(id_ not in existing for id_ in set(ids))
+            free = np.flatnonzero(~self._live[:self._rows_used])[:needed].tolist()
+            rows = []
+            for id_ in ids:
+                if id_ not in existing:
+                    existing[id_] = free.pop(0) if free else self._rows_used
+                    if existing[id_] == self._rows_used:
+                        self._rows_used += 1
+                rows.append(existing[id_])
+            if self._rows_used > self._capacity or not self._arrays:
+                self._open_arrays(self._rows_used)
+
+            for name, values in self._encode(vectors).items():
+                self._arrays[name][rows] = values
+                self._arrays[name].flush()
+            self._db.executemany(
+                "INSERT OR REPLACE INTO chunks (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                [(row, id_, document, json.dumps(metadata))
+                 for row, id_, document, metadata in zip(rows, ids, documents, metadatas)])
+            self._db.commit()
+            self._live[rows] = True
+
+    def update(self, ids: List[str], metadatas: List[dict]):
+        with self._lock:
+            self._db.executemany("UPDATE chunks SET metadata = ? WHERE id = ?",
+                                 [(json.dumps(metadata), id_) for id_, metadata in zip(ids, metadatas)])
+            self._db.commit()
+
+    def delete(self, ids: List[str]):
+        if not ids:
+            return
+        with self._lock:
+            placeholders = ", ".join("?" * len(ids))
+            rows = [row for (row,) in self._db.execute(
+                f"SELECT row FROM chunks WHERE id IN ({placeholders})", ids)]
+            self._db.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", ids)
+            self._db.commit()
+            self._live[rows] = False
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None,
+            include: Optional[List[str]] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None) -> Dict[str, Any]:
+        include = ["documents", "metadatas"] if include is None else include
+        sql, params = where_to_sql(where)
+        if ids is not None:
+            sql += f" AND id IN ({', '.join('?' * len(ids))})"
+            params = params + list(ids)
+        sql = f"SELECT id, document, metadata FROM chunks WHERE {sql} ORDER BY row"
+        if limit is not None or offset:
+            sql += " LIMIT ? OFFSET ?"
+            params = params + [-1 if limit is None else limit, offset or 0]
+        with self._lock:
+            found = self._db.execute(sql, params).fetchall()
+
+        results = {"ids": [id_ for id_, _, _ in found]}
+        if "documents" in include:
+            results["documents"] = [document for _, document, _ in found]
+        if "metadatas" in include:
+            results["metadatas"] = [json.loads(metadata) for _, _, metadata in found]
+        return results
+
+    def _candidate_rows(self, where: Optional[dict]) -> Optional[np.ndarray]:
+        if not where:
+            return None
+        sql, params = where_to_sql(where)
+        return np.array([row for (row,) in self._db.execute(
+            f"SELECT row FROM chunks WHERE {sql}", params)], dtype=np.int64)
+
+    def _approximate_distances(self, arrays: Dict[str, np.ndarray], rows: np.ndarray,
+                               query: np.ndarray) -> np.ndarray:
+        """Squared L2 estimated from the quantized codes"""
+        norms = arrays["norms"][rows]
+        if self.quantization == "int8":
+            dots = (arrays["codes"][rows].astype(np.float32) @ query) * arrays["scales"][rows]
+        else:
+            # The angle between sign vectors tracks the angle between the vectors
+            hamming = _POPCOUNT[np.bitwise_xor(arrays["codes"][rows],
+                                               np.packbits(query > 0))].sum(axis=1)
+            dots = np.cos(np.pi * hamming / self.dim) * np.sqrt(norms * float(query @ query))
+        return float(query @ query) + norms - 2 * dots
+
+    def _top_rows(self, arrays: Dict[str, np.ndarray], live: np.ndarray,
+                  candidates: Optional[np.ndarray], query: np.ndarray, k: int) -> np.ndarray:
+        if candidates is None:
+            candidates = np.flatnonzero(live)
+        best_rows, best_distances = [], []
+        for start in range(0, len(candidates), _BLOCK_ROWS):
+            rows = candidates[start:start + _BLOCK_ROWS]
+            distances = self._approximate_distances(arrays, rows, query)
+            if len(rows) > k:
+                keep = np.argpartition(distances, k)[:k]
+                rows, distances = rows[keep], distances[keep]
+            best_rows.append(rows)
+            best_distances.append(distances)
+        if not best_rows:
+            return np.zeros(0, dtype=np.int64)
+        rows, distances = np.concatenate(best_rows), np.concatenate(best_distances)
+        order = np.argsort(distances, kind="stable")[:k]
+        return rows[order]
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[dict] = None, include: Optional[List[str]] = None) -> Dict[str, Any]:
+        with self._lock:
+            # Arrays are only ever grown by remapping, so these views stay valid
+            arrays, live = dict(self._arrays), self._live[:self._rows_used].copy()
+            candidates = self._candidate_rows(where)
+
+        results = {"ids": [], "documents": [], "metadatas": [], "distances": []}
+        for query in np.asarray(query_embeddings, dtype=np.float32):
+            if not arrays:
+                rows, distances = [], []
+            else:
+                k = n_results * self.rescore_factor if self.rescore else n_results
+                rows = self._top_rows(arrays, live, candidates, query, k)
+                if self.rescore and len(rows):
+                    differences = arrays["vectors"][rows].astype(np.float32) - query
+                    distances = np.einsum("ij,ij->i", differences, differences)
+                    order = np.argsort(distances, kind="stable")[:n_results]
+                    rows, distances = rows[order], distances[order]
+                else:
+                    distances = self._approximate_distances(arrays, rows, query)
+                rows, distances = rows.tolist(), distances.tolist()
+
+            found = {}
+            if rows:
+                with self._lock:
+                    found = {row: (id_, document, metadata) for row, id_, document, metadata in
+                             self._db.execute(
+                                 f"SELECT row, id, document, metadata FROM chunks "
+                                 f"WHERE row IN ({', '.join('?' * len(rows))})", rows)}
+            # A row deleted while the query ran is dropped
+            hits = [(found[row], distance) for row, distance in zip(rows, distances) if row in found]
+            results["ids"].append([id_ for (id_, _, _), _ in hits])
+            results["documents"].append([document for (_, document, _), _ in hits])
+            results["metadatas"].append([json.loads(metadata) for (_, _, metadata), _ in hits])
+            results["distances"].append([float(distance) for _, distance in hits])
+        return results
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Bytes scanned per query (resident when hot) and total bytes on disk"""
+        with self._lock:
+            rows = self._rows_used
+            scanned = sum(array[:rows].nbytes for name, array in self._arrays.items() if name != "vectors")
+        disk = sum(os.path.getsize(os.path.join(self.path, name)) for name in os.listdir(self.path))
+        return {"scanned_bytes": scanned, "disk_bytes": disk}
+
+    def close(self):
+        with self._lock:
+            for array in self._arrays.values():
+                array.flush()
+            self._arrays = {}
+            self._db.close()
+
+
+class FlatVectorClient:
+    """Stand-in for chromadb.PersistentClient that opens FlatCollections"""
+
+    def __init__(self, path: str, quantization: Optional[str] = None, rescore: Optional[bool] = None):
+        self.path = os.path.join(path, "flat_index")
+        self.quantization = quantization
+        self.rescore = rescore
+        self._collections = {}
+        self._lock = threading.Lock()
+
+    def get_or_create_collection(self, name: str, embedding_function=None) -> FlatCollection:
+        with self._lock:
+            collection = self._collections.get(name)
+            if collection is None:
+                collection = self._collections[name] = FlatCollection(
+                    os.path.join(self.path, name), name, self.quantization, self.rescore)
+            return collection
+
+    def list_collections(self) -> List[CollectionInfo]:
+        if not os.path.isdir(self.path):
+            return []
+        return [CollectionInfo(name) for name in sorted(os.listdir(self.path))]
+
+    def delete_collection(self, name: str):
+        with self._lock:
+            collection = self._collections.pop(name, None)
+            if collection is not None:
+                collection.close()
+            elif not os.path.isdir(os.path.join(self.path, name)):
+                raise ValueError(f"Collection {name} does not exist")
+            shutil.rmtree(os.path.join(self.path, name), ignore_errors=True)
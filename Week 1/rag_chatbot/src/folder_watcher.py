@@ -0,0 +1,101 @@
+import os
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+from .document_processor import SUPPORTED_EXTENSIONS
+
+
+def _supported_file(change, path: str) -> bool:
+    return os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+
+
+class FolderWatcher:
+    """Keep the knowledge base in sync with folders as their files change.
+
+    Starts with a normal folder sync to catch up on anything that changed
+    while nobody was watching, then waits for filesystem events. watchfiles
+    debounces each burst (an editor save, a copy of many files) into one
+    set of changed paths; those are grouped per folder and pushed through
+    RAGChatbot.sync_files in small batches, so only the files that changed
+    are read, chunked and embedded. Like /add, only the top level of each
+    folder is watched.
+    """
+
+    def __init__(self, chatbot, folders: List[str], tenant: Optional[str] = None,
+                 debounce_ms: Optional[int] = None, batch_size: Optional[int] = None,
+                 on_sync: Optional[Callable[[str, dict], None]] = None):
+        self.chatbot = chatbot
+        self.folders = [os.path.abspath(folder) for folder in folders]
+        self.tenant = tenant
+        self.debounce_ms = debounce_ms or int(os.getenv("WATCH_DEBOUNCE_MS", "1000"))
+        self.batch_size = batch_size or int(os.getenv("WATCH_BATCH_SIZE", "50"))
+        # Called with (folder, stats) after every batch
+        self.on_sync = on_sync
+        self.stats = {"events": 0, "batches": 0, "files_synced": 0, "errors": 0}
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Watch in a daemon thread"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run, name="folder-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def run(self):
+        """Catch up, then sync changes until stop() is called"""
+        from watchfiles import watch
+
+        folders = [folder for folder in self.folders if os.path.isdir(folder)]
+        for folder in set(self.folders).difference(folders):
+            print(f"Not watching {folder}: the folder does not exist")
+        if not folders:
+            return
+
+        for folder in folders:
+            self._sync(folder, lambda: self.chatbot.add_documents(folder, tenant=self.tenant))
+
+        print(f"Watching {', '.join(folders)} for changes")
+        for changes in watch(*folders, watch_filter=_supported_file, debounce=self.debounce_ms,
+                             stop_event=self._stop_event, recursive=False):
+            self.stats["events"] += len(changes)
+            for folder, paths in self._group_by_folder(changes).items():
+                for start in range(0, len(paths), self.batch_size):
+                    batch = paths[start:start + self.batch_size]
+                    self._sync(folder, lambda: self.chatbot.sync_files(folder, batch, tenant=self.tenant))
+
+    def _group_by_folder(self, changes) -> Dict[str, List[str]]:
+        grouped = defaultdict(set)
+        for _, path in changes:
+            folder = os.path.dirname(os.path.abspath(path))
+            if folder in self.folders:
+                grouped[folder].add(path)
+        return {folder: sorted(paths) for folder, paths in grouped.items()}
+
+    def _sync(self, folder: str, sync: Callable[[], dict]):
+        try:
+            stats = sync()
+        except Exception as e:
+            # A bad batch must not end the watch; the next change retries it
+            self.stats["errors"] += 1
+            print(f"Error syncing {folder}: {str(e)}")
+            return
+        self.stats["batches"] += 1
+        self.stats["files_synced"] += stats["files_added"] + stats["files_updated"] + stats["files_removed"]
+        if self.on_sync is not None:
+            self.on_sync(folder, stats)
+
+    def get_stats(self) -> dict:
+        return dict(self.stats, folders=list(self.folders), running=self.running)
@@ -0,0 +1,102 @@
+import os
+from typing import Dict, List, Optional
+
+from .tokenizer import count_tokens
+
+
+def format_messages(messages: List[Dict]) -> str:
+    return "\n\n".join(
+        f"{'Human' if msg['role'] == 'user' else 'Assistant'}: {msg['content']}"
+        for msg in messages)
+
+
+def _shorten(text: str, max_tokens: int) -> str:
+    """Keep roughly the first max_tokens tokens of text"""
+    tokens = count_tokens(text)
+    if tokens <= max_tokens:
+        return text
+    return text[:max(1, len(text) * max_tokens // tokens)].rstrip() + " ..."
+
+
+class HistoryManager:
+    """Pack conversation history into a token budget for the prompt.
+
+    The newest messages that fit in token_budget are included verbatim; older
+    messages are folded into a rolling summary stored with the session. The
+    summary is extended a few messages at a time (compact_batch), never
+    rebuilt from the start, so prompt size and summarization cost stay flat
+    however long the conversation gets. Messages that no longer fit but are
+    not summarized yet are still included, shortened to what is left of the
+    budget (at least a quarter of it), so no turn drops out of the prompt
+    while it waits for a full batch or after a failed summary call.
+    """
+
+    def __init__(self, memory, token_budget: int = None, max_messages: int = None,
+                 compact_batch: int = None):
+        self.memory = memory
+        self.token_budget = token_budget or int(os.getenv("HISTORY_TOKEN_BUDGET", "1000"))
+        # Upper bound on messages read per turn, whatever their size
+        self.max_messages = max_messages or int(os.getenv("HISTORY_MAX_MESSAGES", "20"))
+        self.compact_batch = compact_batch or int(os.getenv("HISTORY_COMPACT_BATCH", "4"))
+        if self.max_messages <= self.compact_batch:
+            raise ValueError("HISTORY_MAX_MESSAGES must be larger than HISTORY_COMPACT_BATCH")
+
+    def _pack(self, window: Dict) -> Dict:
+        """Split the window into summary, messages awaiting summary, and recent messages"""
+        messages = window["messages"]
+        # Sequence number (0-based, over the whole session) of messages[0]
+        first_seq = window["total"] - len(messages)
+
+        # Index of the first message the summary does not cover yet
+        lower = max(window["summarized"] - first_seq, 0)
+
+        budget = self.token_budget - count_tokens(window["summary"])
+        # Leave room in the window for a batch awaiting summary, so nothing
+        # ages out of the window before it has been summarized
+        oldest = max(len(messages) - (self.max_messages - self.compact_batch), lower)
+        start = len(messages)
+        while start > oldest:
+            # The newest message is always kept, even if it alone exceeds the budget
+            cost = count_tokens(messages[start - 1]["content"]) + 2
+            if cost > budget and start < len(messages):
+                break
+            budget -= cost
+            start -= 1
+
+        return {
+            "summary": window["summary"],
+            "recent": messages[start:],
+            "pending": messages[lower:start],
+            "pending_end": first_seq + start,
+            "budget_left": max(budget, 0)
+        }
+
+    def build(self, session_id: str) -> str:
+        """History text for the prompt: rolling summary plus recent messages"""
+        packed = self._pack(self.memory.get_history_window(session_id, self.max_messages))
+        pending = packed["pending"]
+        if pending:
+            allowance = max(packed["budget_left"], self.token_budget // 4)
+            share = max(allowance // len(pending) - 2, 1)
+            pending = [dict(msg, content=_shorten(msg["content"], share)) for msg in pending]
+        recent = format_messages(pending + packed["recent"])
+        if not packed["summary"]:
+            return recent
+        return f"Summary of earlier conversation: {packed['summary']}\n\n{recent}".strip()
+
+    def plan_compaction(self, session_id: str) -> Optional[Dict]:
+        """Messages to fold into the summary, or None until a full batch has aged out"""
+        packed = self._pack(self.memory.get_history_window(session_id, self.max_messages))
+        if len(packed["pending"]) < self.compact_batch:
+            return None
+        return {
+            "summary": packed["summary"],
+            "messages": format_messages(packed["pending"]),
+            "summarized": packed["pending_end"]
+        }
+
+    def apply_compaction(self, session_id: str, plan: Dict, summary: Optional[str]) -> bool:
+        if not summary:
+            return False
+        self.memory.set_summary(session_id, summary.strip(), plan["summarized"])
+        return True
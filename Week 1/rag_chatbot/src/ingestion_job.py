@@ -0,0 +1,246 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+STAGES = ("read", "chunk", "embed", "write")
+
+
+class IngestionQueue:
+    """Persistent queue of ingestion jobs, their files and a dead-letter list.
+
+    A job is one /add of a folder into one collection. Its files
+    are queued up front with the size, mtime and hash the manifest will
+    record, and marked done only after their chunks have been written and
+    the manifest saved, so an interrupted job can continue where it was
+    checkpointed. Files that fail to parse go to the dead-letter list with
+    their error until a later run ingests them.
+    """
+
+    def __init__(self, db_path: str):
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                collection TEXT NOT NULL,
+                folder TEXT NOT NULL,
+                department TEXT,
+                purge_missing INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status);
+            CREATE TABLE IF NOT EXISTS job_files (
+                job_id INTEGER NOT NULL,
+                path TEXT NOT NULL,
+                mtime REAL NOT NULL,
+                size INTEGER NOT NULL,
+                sha256 TEXT,
+                done INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (job_id, path)
+            );
+            CREATE TABLE IF NOT EXISTS dead_letter (
+                collection TEXT NOT NULL,
+                path TEXT NOT NULL,
+                error TEXT NOT NULL,
+                failed_at REAL NOT NULL,
+                PRIMARY KEY (collection, path)
+            );
+        """)
+        self._db.commit()
+
+    def create_job(self, collection: str, folder: str, department: str, purge_missing: bool,
+                   files: List[Tuple[str, float, int, Optional[str]]]) -> int:
+        """Queue (path, mtime, size, sha256) files; an older unfinished job for the folder is dropped"""
+        now = time.time()
+        folder = os.path.abspath(folder)
+        with self._lock:
+            for (job_id,) in self._db.execute(
+                    "SELECT job_id FROM jobs WHERE collection = ? AND folder = ? AND status = 'running'",
+                    (collection, folder)).fetchall():
+                self._finish_locked(job_id, "superseded")
+            job_id = self._db.execute(
+                "INSERT INTO jobs (collection, folder, department, purge_missing, status, created, updated) "
+                "VALUES (?, ?, ?, ?, 'running', ?, ?)",
+                (collection, folder, department, int(purge_missing), now, now)).lastrowid
+            self._db.executemany(
+                "INSERT OR REPLACE INTO job_files (job_id, path, mtime, size, sha256) VALUES (?, ?, ?, ?, ?)",
+                [(job_id, os.path.abspath(path), mtime, size, sha256)
+                 for path, mtime, size, sha256 in files])
+            self._db.commit()
+        return job_id
+
+    def find_job(self, collection: str, folder: str) -> Optional[dict]:
+        """The unfinished job for this folder, if a previous run was interrupted"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT job_id, collection, folder, department, purge_missing FROM jobs "
+                "WHERE collection = ? AND folder = ? AND status = 'running' ORDER BY job_id DESC LIMIT 1",
+                (collection, os.path.abspath(folder))).fetchone()
+        return self._job(row) if row else None
+
+    def unfinished_jobs(self) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT job_id, collection, folder, department, purge_missing FROM jobs "
+                "WHERE status = 'running' ORDER BY job_id").fetchall()
+        return [self._job(row) for row in rows]
+
+    @staticmethod
+    def _job(row) -> dict:
+        job_id, collection, folder, department, purge_missing = row
+        return {"job_id": job_id, "collection": collection, "folder": folder,
+                "department": department, "purge_missing": bool(purge_missing)}
+
+    def pending_files(self, job_id: int) -> List[Tuple[str, float, int, Optional[str]]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT path, mtime, size, sha256 FROM job_files WHERE job_id = ? AND done = 0 "
+                "ORDER BY path", (job_id,)).fetchall()
+
+    def count_files(self, job_id: int) -> Tuple[int, int]:
+        """(files done, files queued) for a job"""
+        with self._lock:
+            done, total = self._db.execute(
+                "SELECT COALESCE(SUM(done), 0), COUNT(*) FROM job_files WHERE job_id = ?",
+                (job_id,)).fetchone()
+        return done, total
+
+    def checkpoint(self, job_id: int, collection: str, succeeded: List[str],
+                   failed: Dict[str, str]):
+        """Mark files done once their chunks and manifest entries are durable"""
+        now = time.time()
+        paths = [os.path.abspath(path) for path in succeeded]
+        failed = {os.path.abspath(path): error for path, error in failed.items()}
+        with self._lock:
+            self._db.executemany("UPDATE job_files SET done = 1 WHERE job_id = ? AND path = ?",
+                                 [(job_id, path) for path in paths + list(failed)])
+            self._db.executemany("DELETE FROM dead_letter WHERE collection = ? AND path = ?",
+                                 [(collection, path) for path in paths])
+            self._db.executemany(
+                "INSERT OR REPLACE INTO dead_letter (collection, path, error, failed_at) VALUES (?, ?, ?, ?)",
+                [(collection, path, error, now) for path, error in failed.items()])
+            self._db.execute("UPDATE jobs SET updated = ? WHERE job_id = ?", (now, job_id))
+            self._db.commit()
+
+    def _finish_locked(self, job_id: int, status: str):
+        self._db.execute("UPDATE jobs SET status = ?, updated = ? WHERE job_id = ?",
+                         (status, time.time(), job_id))
+        # Finished jobs keep their summary row; the per-file queue is dropped
+        self._db.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+
+    def finish_job(self, job_id: int, status: str = "done"):
+        with self._lock:
+            self._finish_locked(job_id, status)
+            self._db.commit()
+
+    def dead_letters(self, collection: str) -> List[dict]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, error, failed_at FROM dead_letter WHERE collection = ? ORDER BY failed_at",
+                (collection,)).fetchall()
+        return [{"path": path, "error": error, "failed_at": failed_at} for path, error, failed_at in rows]
+
+    def prune_dead_letters(self, collection: str, folder: str, current_paths: List[str]):
+        """Drop dead letters for files that have since been removed from the folder"""
+        folder = os.path.abspath(folder)
+        current = {os.path.abspath(path) for path in current_paths}
+        with self._lock:
+            paths = [path for (path,) in self._db.execute(
+                "SELECT path FROM dead_letter WHERE collection = ?", (collection,))
+                if os.path.dirname(path) == folder and path not in current]
+            self._db.executemany("DELETE FROM dead_letter WHERE collection = ? AND path = ?",
+                                 [(collection, path) for path in paths])
+            self._db.commit()
+
+    def clear(self, collection: str):
+        """Forget the jobs and dead letters of one collection (used on reset)"""
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM job_files WHERE job_id IN (SELECT job_id FROM jobs WHERE collection = ?)",
+                (collection,))
+            self._db.execute("DELETE FROM jobs WHERE collection = ?", (collection,))
+            self._db.execute("DELETE FROM dead_letter WHERE collection = ?", (collection,))
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class IngestionProgress:
+    """Live counters for an ingestion run: files, chunks, ETA and time per stage.
+
+    read and chunk are measured where files are parsed; with a process pool
+    they are summed over workers, so they can add up to more than the
+    elapsed time.
+    """
+
+    def __init__(self, total_files: int, files_done: int = 0,
+                 callback: Optional[Callable[[dict], None]] = None, interval: float = 1.0):
+        self.total_files = total_files
+        self.files_done = files_done
+        self.files_failed = 0
+        self.chunks = 0
+        self.stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self.callback = callback
+        self.interval = interval
+        self.start_time = time.perf_counter()
+        self._start_done = files_done
+        self._last_report = 0.0
+        self._reported_files = None
+
+    def add_stage_time(self, timings: Dict[str, float]):
+        for stage, seconds in timings.items():
+            self.stage_seconds[stage] += seconds
+
+    def file_finished(self, chunks: int, failed: bool = False):
+        self.files_done += 1
+        self.files_failed += failed
+        self.chunks += chunks
+        self.report()
+
+    def snapshot(self) -> dict:
+        elapsed = time.perf_counter() - self.start_time
+        rate = (self.files_done - self._start_done) / elapsed if elapsed > 0 else 0.0
+        remaining = self.total_files - self.files_done
+        return {
+            "files_done": self.files_done,
+            "files_total": self.total_files,
+            "files_failed": self.files_failed,
+            "chunks": self.chunks,
+            "elapsed_seconds": elapsed,
+            "files_per_sec": rate,
+            "eta_seconds": remaining / rate if rate > 0 else None,
+            "stage_seconds": dict(self.stage_seconds)
+        }
+
+    def report(self, force: bool = False):
+        if self.callback is None:
+            return
+        now = time.perf_counter()
+        if force and self._reported_files == self.files_done:
+            return
+        if force or now - self._last_report >= self.interval:
+            self._last_report = now
+            self._reported_files = self.files_done
+            self.callback(self.snapshot())
+
+
+def format_progress(snapshot: dict) -> str:
+    """One-line progress summary for terminals"""
+    total = snapshot["files_total"]
+    percent = snapshot["files_done"] / total if total else 1.0
+    eta = snapshot["eta_seconds"]
+    eta_text = f"{int(eta // 60)}m{int(eta % 60):02d}s" if eta is not None else "--"
+    stages = " ".join(f"{stage} {seconds:.1f}s" for stage, seconds in snapshot["stage_seconds"].items())
+    return (f"{snapshot['files_done']}/{total} files ({percent:.0%}), "
+            f"{snapshot['files_failed']} failed, {snapshot['chunks']} chunks, "
+            f"{snapshot['files_per_sec']:.1f} files/s, ETA {eta_text} | {stages}")
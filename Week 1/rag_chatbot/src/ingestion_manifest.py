@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """Return the SHA-256 hex digest of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as file:
+        for block in iter(lambda: file.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestionManifest:
+    """Records which files have been ingested and which chunk ids they own.
+
+    Entries are keyed by absolute file path and store the file's mtime, size
+    and content hash, so a re-sync only has to touch files that changed.
+    """
+
+    def __init__(self, manifest_path: str):
+        self.manifest_path = manifest_path
+        self.entries: Dict[str, dict] = {}
+        self.load()
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            self.entries = {}
+            return
+
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                self.entries = json.load(file).get("files", {})
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not read ingestion manifest ({str(e)}). Starting fresh.")
+            self.entries = {}
+
+    def save(self):
+        directory = os.path.dirname(self.manifest_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write to a temp file first so a crash never leaves a truncated manifest
+        temp_path = self.manifest_path + ".tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            json.dump({"version": 1, "files": self.entries}, file)
+        os.replace(temp_path, self.manifest_path)
+
+    def get(self, file_path: str) -> Optional[dict]:
+        return self.entries.get(os.path.abspath(file_path))
+
+    def is_unchanged(self, file_path: str, stat: os.stat_result) -> bool:
+        """Cheap check: same mtime and size as the recorded entry"""
+        entry = self.get(file_path)
+        return (entry is not None
+                and entry["mtime"] == stat.st_mtime
+                and entry["size"] == stat.st_size)
+
+    def update(self, file_path: str, stat: os.stat_result, content_hash: str, chunk_ids: List[str]):
+        self.record(file_path, stat.st_mtime, stat.st_size, content_hash, chunk_ids)
+
+    def record(self, file_path: str, mtime: float, size: int, content_hash: str, chunk_ids: List[str]):
+        self.entries[os.path.abspath(file_path)] = {
+            "mtime": mtime,
+            "size": size,
+            "sha256": content_hash,
+            "chunk_ids": list(chunk_ids)
+        }
+
+    def touch(self, file_path: str, stat: os.stat_result):
+        """Refresh mtime/size for a file whose content hash did not change"""
+        entry = self.get(file_path)
+        if entry is not None:
+            entry["mtime"] = stat.st_mtime
+            entry["size"] = stat.st_size
+
+    def remove(self, file_path: str) -> List[str]:
+        """Drop a file from the manifest and return the chunk ids it owned"""
+        entry = self.entries.pop(os.path.abspath(file_path), None)
+        return entry["chunk_ids"] if entry else []
+
+    def files_in_folder(self, folder_path: str) -> List[str]:
+        folder_path = os.path.abspath(folder_path)
+        return [path for path in self.entries
+                if os.path.dirname(path) == folder_path]
+
+    def clear(self):
+        self.entries = {}
+        if os.path.exists(self.manifest_path):
+            os.remove(self.manifest_path)
@@ -0,0 +1,372 @@
+import json
+import math
+import os
+import re
+import shutil
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Identifiers such as "ERR-4012", "SKU_778.2" or "HR/POL/7" stay one token;
+# their alphanumeric parts are indexed as well
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[-_./:#][a-z0-9]+)*")
+_PART_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(text.lower()):
+        token = match.group()
+        tokens.append(token)
+        if not token.isalnum():
+            tokens.extend(_PART_PATTERN.findall(token))
+    return tokens
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: each list adds 1 / (k + rank) to an id's score"""
+    scores = {}
+    for ranking in rankings:
+        for rank, id_ in enumerate(ranking, start=1):
+            scores[id_] = scores.get(id_, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+def _load_array(path: str) -> np.ndarray:
+    try:
+        return np.load(path, mmap_mode='r')
+    except ValueError:
+        # numpy cannot memory-map an array with no elements
+        return np.load(path)
+
+
+def _blob(strings: List[bytes]) -> Tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(s) for s in strings])
+    return np.frombuffer(b"".join(strings), dtype=np.uint8), offsets
+
+
+def _write_segment(path: str, ids: List[str], lengths: np.ndarray, vocabulary: List[bytes],
+                   post_terms: np.ndarray, post_docs: np.ndarray, post_tfs: np.ndarray):
+    """Write one immutable segment; postings are grouped by term, then by doc"""
+    order = np.lexsort((post_docs, post_terms))
+    post_offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    post_offsets[1:] = np.cumsum(np.bincount(post_terms, minlength=len(vocabulary)))
+    terms, term_offsets = _blob(vocabulary)
+    id_blob, id_offsets = _blob([id_.encode('utf-8') for id_ in ids])
+
+    os.makedirs(path)
+    arrays = {
+        "terms": terms,
+        "term_offsets": term_offsets,
+        "post_offsets": post_offsets,
+        "post_docs": post_docs[order].astype(np.int32),
+        "post_tfs": np.minimum(post_tfs[order], np.iinfo(np.uint16).max).astype(np.uint16),
+        "lengths": np.asarray(lengths, dtype=np.int32),
+        "ids": id_blob,
+        "id_offsets": id_offsets
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+
+
+class _Segment:
+    """Memory-mapped, read-only postings for a set of chunks plus a tombstone mask"""
+
+    def __init__(self, path: str, deleted: Iterable[int] = ()):
+        self.name = os.path.basename(path)
+        self.path = path
+        for name in ("terms", "term_offsets", "post_offsets", "post_docs",
+                     "post_tfs", "lengths", "ids", "id_offsets"):
+            setattr(self, name, _load_array(os.path.join(path, f"{name}.npy")))
+        self.num_docs = len(self.lengths)
+        self.deleted = np.zeros(self.num_docs, dtype=bool)
+        self.deleted[list(deleted)] = True
+        self.live_length = int(self.lengths[~self.deleted].sum())
+
+    @property
+    def live_docs(self) -> int:
+        return self.num_docs - int(self.deleted.sum())
+
+    def _term(self, i: int) -> bytes:
+        return self.terms[self.term_offsets[i]:self.term_offsets[i + 1]].tobytes()
+
+    def vocabulary(self) -> List[bytes]:
+        return [self._term(i) for i in range(len(self.term_offsets) - 1)]
+
+    def postings(self, term: bytes) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        # Binary search over the sorted term blob, so loading needs no dict
+        lo, hi = 0, len(self.term_offsets) - 1
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._term(mid) < term:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo == len(self.term_offsets) - 1 or self._term(lo) != term:
+            return None
+        start, end = self.post_offsets[lo], self.post_offsets[lo + 1]
+        return self.post_docs[start:end], self.post_tfs[start:end]
+
+    def doc_id(self, doc: int) -> str:
+        return self.ids[self.id_offsets[doc]:self.id_offsets[doc + 1]].tobytes().decode('utf-8')
+
+    def doc_ids(self) -> List[str]:
+        return [self.doc_id(doc) for doc in range(self.num_docs)]
+
+    def delete(self, doc: int):
+        if not self.deleted[doc]:
+            self.deleted[doc] = True
+            self.live_length -= int(self.lengths[doc])
+
+
+class BM25Index:
+    """Persistent BM25 inverted index over chunk texts, kept next to the Chroma data.
+
+    Postings live in immutable, memory-mapped NumPy segments, so opening the
+    index reads only a small manifest. Writes are buffered in memory and
+    become a new segment on commit(); deletions are tombstones until the
+    segment is merged. Small segments are merged once there are more than
+    max_segments of them.
+    """
+
+    def __init__(self, index_dir: str, k1: float = 1.2, b: float = 0.75, max_segments: int = 8):
+        self.index_dir = index_dir
+        self.k1 = k1
+        self.b = b
+        self.max_segments = max_segments
+        self._lock = threading.RLock()
+        self._pending: List[Optional[Tuple[str, Counter, int]]] = []
+        self._pending_pos: Dict[str, int] = {}
+        # chunk id -> (segment, doc); only built once the index is modified
+        self._locations: Optional[Dict[str, Tuple[_Segment, int]]] = None
+        self._load()
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.index_dir, "manifest.json")
+
+    def _load(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        manifest = {"segments": [], "next_segment": 0}
+        if os.path.exists(self._manifest_path()):
+            try:
+                with open(self._manifest_path(), 'r', encoding='utf-8') as file:
+                    manifest = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read lexical index ({str(e)}). Starting fresh.")
+
+        try:
+            self._segments = [
+                _Segment(os.path.join(self.index_dir, entry["name"]), entry["deleted"])
+                for entry in manifest["segments"]]
+        except (OSError, ValueError) as e:
+            print(f"Warning: Could not open lexical index segments ({str(e)}). Starting fresh.")
+            manifest = {"segments": [], "next_segment": 0}
+            self._segments = []
+        self._next_segment = manifest["next_segment"]
+        self._remove_unreferenced()
+
+    def _remove_unreferenced(self):
+        # Segments left behind by a crash or a merge are not in the manifest
+        referenced = {segment.name for segment in self._segments}
+        for name in os.listdir(self.index_dir):
+            if name.startswith("seg_") and name not in referenced:
+                shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+
+    def count(self) -> int:
+        with self._lock:
+            return sum(segment.live_docs for segment in self._segments) + len(self._pending_pos)
+
+    def _get_locations(self) -> Dict[str, Tuple[_Segment, int]]:
+        if self._locations is None:
+            self._locations = {}
+            for segment in self._segments:
+                for doc, id_ in enumerate(segment.doc_ids()):
+                    if not segment.deleted[doc]:
+                        self._locations[id_] = (segment, doc)
+        return self._locations
+
+    def _delete(self, id_: str):
+        position = self._pending_pos.pop(id_, None)
+        if position is not None:
+            self._pending[position] = None
+        location = self._get_locations().pop(id_, None)
+        if location is not None:
+            segment, doc = location
+            segment.delete(doc)
+
+    def add(self, ids: List[str], texts: List[str]):
+        with self._lock:
+            for id_, text in zip(ids, texts):
+                self._delete(id_)
+                tokens = tokenize(text)
+                self._pending_pos[id_] = len(self._pending)
+                self._pending.append((id_, Counter(tokens), len(tokens)))
+
+    def delete(self, ids: List[str]):
+        with self._lock:
+            for id_ in ids:
+                self._delete(id_)
+
+    def search(self, query: str, n_results: int = 10) -> List[Tuple[str, float]]:
+        """Return up to n_results (chunk id, BM25 score) pairs, best first"""
+        terms = sorted(set(tokenize(query)))
+        if not terms:
+            return []
+
+        with self._lock:
+            pending = [doc for doc in self._pending if doc is not None]
+            num_docs = sum(segment.live_docs for segment in self._segments) + len(pending)
+            if num_docs == 0:
+                return []
+            total_length = sum(segment.live_length for segment in self._segments) \
+                + sum(length for _, _, length in pending)
+            avg_length = max(total_length / num_docs, 1.0)
+
+            encoded = [term.encode('utf-8') for term in terms]
+            postings = [[segment.postings(term) for term in encoded] for segment in self._segments]
+            document_frequency = [
+                sum(len(seg_postings[i][0]) for seg_postings in postings if seg_postings[i] is not None)
+                + sum(1 for _, counts, _ in pending if term in counts)
+                for i, term in enumerate(terms)]
+            idf = [math.log(1 + (num_docs - df + 0.5) / (df + 0.5)) for df in document_frequency]
+
+            candidates = []
+            for segment, seg_postings in zip(self._segments, postings):
+                docs, contributions = [], []
+                for i, term_postings in enumerate(seg_postings):
+                    if term_postings is None:
+                        continue
+                    term_docs, tfs = term_postings
+                    tfs = tfs.astype(np.float32)
+                    norm = self.k1 * (1 - self.b + self.b * segment.lengths[term_docs] / avg_length)
+                    docs.append(term_docs)
+                    contributions.append(idf[i] * tfs * (self.k1 + 1) / (tfs + norm))
+                if not docs:
+                    continue
+                # Sparse accumulation: only documents containing a query term
+                unique_docs, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+                scores = np.bincount(inverse, weights=np.concatenate(contributions))
+                live = ~segment.deleted[unique_docs]
+                unique_docs, scores = unique_docs[live], scores[live]
+                if len(scores) > n_results:
+                    top = np.argpartition(-scores, n_results)[:n_results]
+                    unique_docs, scores = unique_docs[top], scores[top]
+                candidates.extend((segment.doc_id(int(doc)), float(score))
+                                  for doc, score in zip(unique_docs, scores))
+
+            for id_, counts, length in pending:
+                norm = self.k1 * (1 - self.b + self.b * length / avg_length)
+                score = sum(idf[i] * counts[term] * (self.k1 + 1) / (counts[term] + norm)
+                            for i, term in enumerate(terms) if term in counts)
+                if score > 0:
+                    candidates.append((id_, score))
+
+        candidates.sort(key=lambda item: item[1], reverse=True)
+        return candidates[:n_results]
+
+    def _new_segment_path(self) -> str:
+        path = os.path.join(self.index_dir, f"seg_{self._next_segment:06d}")
+        self._next_segment += 1
+        return path
+
+    def _flush_pending(self) -> Optional[_Segment]:
+        docs = [doc for doc in self._pending if doc is not None]
+        self._pending, self._pending_pos = [], {}
+        if not docs:
+            return None
+
+        vocabulary = sorted({term.encode('utf-8') for _, counts, _ in docs for term in counts})
+        term_index = {term: i for i, term in enumerate(vocabulary)}
+        post_terms, post_docs, post_tfs = [], [], []
+        for doc, (_, counts, _) in enumerate(docs):
+            for term, tf in counts.items():
+                post_terms.append(term_index[term.encode('utf-8')])
+                post_docs.append(doc)
+                post_tfs.append(tf)
+
+        path = self._new_segment_path()
+        _write_segment(path, [id_ for id_, _, _ in docs],
+                       np.array([length for _, _, length in docs]), vocabulary,
+                       np.array(post_terms, dtype=np.int64), np.array(post_docs, dtype=np.int64),
+                       np.array(post_tfs, dtype=np.int64))
+        segment = _Segment(path)
+        if self._locations is not None:
+            for doc, (id_, _, _) in enumerate(docs):
+                self._locations[id_] = (segment, doc)
+        return segment
+
+    def _merge(self, segments: List[_Segment]) -> _Segment:
+        """Rewrite several segments as one, dropping deleted documents"""
+        vocabularies = [segment.vocabulary() for segment in segments]
+        merged_vocabulary = sorted(set().union(*vocabularies))
+        term_index = {term: i for i, term in enumerate(merged_vocabulary)}
+
+        ids, lengths, post_terms, post_docs, post_tfs = [], [], [], [], []
+        base = 0
+        for segment, vocabulary in zip(segments, vocabularies):
+            live = ~segment.deleted
+            renumber = np.cumsum(live) - 1 + base
+            term_map = np.array([term_index[term] for term in vocabulary], dtype=np.int64)
+            terms = np.repeat(np.arange(len(vocabulary)), np.diff(segment.post_offsets))
+            keep = live[segment.post_docs]
+            post_terms.append(term_map[terms[keep]])
+            post_docs.append(renumber[segment.post_docs[keep]])
+            post_tfs.append(np.asarray(segment.post_tfs)[keep])
+            ids.extend(id_ for doc, id_ in enumerate(segment.doc_ids()) if live[doc])
+            lengths.append(np.asarray(segment.lengths)[live])
+            base += int(live.sum())
+
+        path = self._new_segment_path()
+        _write_segment(path, ids, np.concatenate(lengths), merged_vocabulary,
+                       np.concatenate(post_terms), np.concatenate(post_docs),
+                       np.concatenate(post_tfs))
+        return _Segment(path)
+
+    def commit(self):
+        """Persist buffered writes and tombstones; merge segments when there are too many"""
+        with self._lock:
+            segment = self._flush_pending()
+            if segment is not None:
+                self._segments.append(segment)
+            self._segments = [segment for segment in self._segments if segment.live_docs > 0]
+
+            if len(self._segments) > self.max_segments:
+                by_size = sorted(self._segments, key=lambda segment: segment.live_docs)
+                to_merge = by_size[:len(self._segments) - self.max_segments + 1]
+                merged = self._merge(to_merge)
+                self._segments = [segment for segment in self._segments
+                                  if segment not in to_merge] + [merged]
+                self._locations = None
+
+            manifest = {
+                "segments": [{"name": segment.name,
+                              "deleted": np.flatnonzero(segment.deleted).tolist()}
+                             for segment in self._segments],
+                "next_segment": self._next_segment
+            }
+            temp_path = self._manifest_path() + ".tmp"
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(manifest, file)
+            os.replace(temp_path, self._manifest_path())
+            self._remove_unreferenced()
+
+    def clear(self):
+        with self._lock:
+            self._segments, self._pending, self._pending_pos = [], [], {}
+            self._locations = None
+            self.commit()
+
+    def rebuild(self, items: Iterable[Tuple[str, str]], commit_every: int = 50000):
+        """Re-index from scratch from (chunk id, text) pairs"""
+        with self._lock:
+            self.clear()
+            # Start with an empty id map; every id is new
+            self._locations = {}
+            for i, (id_, text) in enumerate(items, start=1):
+                self.add([id_], [text])
+                if i % commit_every == 0:
+                    self.commit()
+            self.commit()
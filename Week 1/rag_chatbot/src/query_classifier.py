@@ -0,0 +1,59 @@
+import re
+
+# Words that usually point back at something said earlier in the conversation
+_REFERENCE_WORDS = re.compile(
+    r"\b(it|its|it's|they|them|their|theirs|those|these|this|he|she|him|her|his|"
+    r"former|latter|above|aforementioned|same|one|ones)\b", re.IGNORECASE)
+# "that" is also a relative pronoun ("the policy that covers travel"), so it
+# only counts when it stands on its own
+_STANDALONE_THAT = re.compile(
+    r"\bthat\b\s*(?:[?.!,]|$|\b(?:is|was|does|do|one|mean|means|work|works|apply|applies)\b)|"
+    r"\b(?:is|was|does|do|did|about|explain|for|with|on|of|in|to|like|by)\s+that\b",
+    re.IGNORECASE)
+_FOLLOW_UP_OPENERS = re.compile(
+    r"^\s*(?:and|but|also|so|or|then|what about|how about|same for|what if|"
+    r"why not|ok|okay|and if|why|how come)\b", re.IGNORECASE)
+_CONTINUATION_WORDS = re.compile(
+    r"\b(?:else|instead|too|either|as well|more|other|another|again|previous|earlier)\b",
+    re.IGNORECASE)
+_WORD = re.compile(r"[A-Za-z0-9][\w'-]*")
+
+# Feature weights of the scoring classifier; a total at or above the
+# threshold means the question probably depends on earlier turns
+_WEIGHTS = {
+    "reference": 2.0,
+    "bare_that": 2.0,
+    "follow_up_opener": 2.0,
+    "continuation": 1.0,
+    "very_short": 1.5,
+    "short": 0.5
+}
+_THRESHOLD = 2.0
+
+
+def score_follow_up(question: str) -> float:
+    """Score how likely a question refers back to previous turns"""
+    words = _WORD.findall(question)
+    score = 0.0
+    if _REFERENCE_WORDS.search(question):
+        score += _WEIGHTS["reference"]
+    if _STANDALONE_THAT.search(question):
+        score += _WEIGHTS["bare_that"]
+    if _FOLLOW_UP_OPENERS.search(question):
+        score += _WEIGHTS["follow_up_opener"]
+    if _CONTINUATION_WORDS.search(question):
+        score += _WEIGHTS["continuation"]
+    if len(words) <= 3:
+        score += _WEIGHTS["very_short"]
+    elif len(words) <= 5:
+        score += _WEIGHTS["short"]
+    return score
+
+
+def needs_contextualization(question: str) -> bool:
+    """Cheap, model-free check for whether a question needs the chat history.
+
+    Errs on the side of rewriting: a false positive costs one LLM call, a
+    false negative sends an ambiguous query to retrieval.
+    """
+    return score_follow_up(question) >= _THRESHOLD
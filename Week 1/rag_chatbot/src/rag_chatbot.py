@@ -1,85 +1,511 @@
-from typing import Tuple, List
-from .vector_database import VectorDatabase
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Iterator, Tuple, List, Optional
+from .vector_database import TENANT_PREFIX, VectorDatabase, tenant_collection_name
 from .azure_openai_client import AzureOpenAIClient
-from .conversation_memory import ConversationMemory
-from .document_processor import process_and_add_documents
+from .conversation_memory import create_memory
+from .history_manager import HistoryManager
+from .document_processor import process_and_add_documents, process_changed_files
+from .ingestion_job import IngestionQueue
+from .ingestion_manifest import IngestionManifest
+from .reranker import create_reranker
+from .response_cache import SemanticResponseCache
+from .telemetry import Trace, create_tracer, maybe_span
+from .tokenizer import count_tokens
 
 
 class RAGChatbot:
-    def __init__(self, persist_directory: str = "chroma_db"):
-        self.vector_db = VectorDatabase(persist_directory)
-        self.openai_client = AzureOpenAIClient()
-        self.memory = ConversationMemory()
+    openai_client_class = AzureOpenAIClient
 
+    def __init__(self, persist_directory: str = "chroma_db", ingest_workers: int = None):
+        start_time = time.perf_counter()
+        self.persist_directory = persist_directory
+        # The vector database and the LLM client are opened on first use, and the
+        # embedding model loads on the first embedding, so construction is cheap
+        self._vector_db = None
+        self._openai_client = None
+        self._init_lock = threading.Lock()
+        self.startup_timings = {}
+        # None until the health check has run
+        self.connection_ok = None
+        # Per-tenant collections and manifests, opened on first use
+        self._tenant_dbs = {}
+        self._tenant_manifests = {}
+        self.memory = create_memory(persist_directory=persist_directory)
+        self.history = HistoryManager(self.memory)
+        self.manifest = IngestionManifest(
+            os.path.join(persist_directory, "ingestion_manifest.json"))
+        # Checkpointed ingestion jobs and files that failed to parse
+        self.ingestion_queue = IngestionQueue(os.path.join(persist_directory, "ingestion_jobs.sqlite"))
+        # Folder syncs and watcher batches share one manifest, so they run one at a time
+        self._ingest_lock = threading.Lock()
+        self.ingest_workers = ingest_workers or int(
+            os.getenv("INGEST_WORKERS", os.cpu_count() or 1))
+        # Metrics of the most recent turn, per session, bounded like the memory
+        self.turn_metrics = OrderedDict()
+        self.response_cache = SemanticResponseCache(
+            similarity_threshold=float(os.getenv("RESPONSE_CACHE_THRESHOLD", "0.95")),
+            ttl_seconds=float(os.getenv("RESPONSE_CACHE_TTL", "3600")),
+            max_entries=int(os.getenv("RESPONSE_CACHE_SIZE", "1000"))
+        )
+
+        # Optional cross-encoder stage: over-fetch candidates, keep the best n_chunks
+        self.reranker = create_reranker()
+        self.rerank_overfetch = int(os.getenv("RERANK_OVERFETCH", "4"))
+
+        # Per-stage spans of every query, rolling percentiles and exporters (TRACE_EXPORTERS)
+        self.tracer = create_tracer(persist_directory)
+
+        self.startup_timings["init_seconds"] = time.perf_counter() - start_time
         print("RAG Chatbot initialized successfully!")
+        self._check_connection()
+
+    @property
+    def vector_db(self) -> VectorDatabase:
+        if self._vector_db is None:
+            with self._init_lock:
+                if self._vector_db is None:
+                    start_time = time.perf_counter()
+                    self._vector_db = VectorDatabase(self.persist_directory)
+                    self.startup_timings["vector_db_seconds"] = time.perf_counter() - start_time
+        return self._vector_db
+
+    @property
+    def openai_client(self) -> AzureOpenAIClient:
+        if self._openai_client is None:
+            with self._init_lock:
+                if self._openai_client is None:
+                    start_time = time.perf_counter()
+                    self._openai_client = self.openai_client_class()
+                    self.startup_timings["openai_client_seconds"] = time.perf_counter() - start_time
+        return self._openai_client
+
+    def _check_connection(self):
+        """Probe Azure OpenAI on a background thread (HEALTH_CHECK=off skips it)"""
+        if os.getenv("HEALTH_CHECK", "background").lower() == "off":
+            return
+        threading.Thread(target=self._run_health_check, name="health-check", daemon=True).start()
 
-        if self.openai_client.test_connection():
+    def _run_health_check(self):
+        try:
+            self.connection_ok = self.openai_client.check_health()
+        except Exception as e:
+            print(f"Health check failed: {str(e)}")
+            self.connection_ok = False
+        if self.connection_ok:
             print("✓ Azure OpenAI connection successful")
         else:
             print("✗ Azure OpenAI connection failed - check your configuration")
 
-    def add_documents(self, folder_path: str):
-        collection = self.vector_db.get_collection()
-        process_and_add_documents(collection, folder_path)
+    def warmup(self, background: bool = False) -> Optional[threading.Thread]:
+        """Open the vector database and load the embedding model ahead of the first query"""
+        if background:
+            thread = threading.Thread(target=self.warmup, name="warmup", daemon=True)
+            thread.start()
+            return thread
+        embedder = self.vector_db.embedder
+        start_time = time.perf_counter()
+        embedder.model  # loads the model
+        self.startup_timings["embedding_model_seconds"] = time.perf_counter() - start_time
+        return None
+
+    def get_startup_metrics(self) -> dict:
+        """Construction time and the time each lazily opened component took to load"""
+        return dict(self.startup_timings, connection_ok=self.connection_ok)
+
+    def get_vector_db(self, tenant: Optional[str] = None) -> VectorDatabase:
+        if not tenant:
+            return self.vector_db
+        vector_db = self._tenant_dbs.get(tenant)
+        if vector_db is None:
+            vector_db = self._tenant_dbs[tenant] = self.vector_db.for_tenant(tenant)
+        return vector_db
+
+    def get_manifest(self, tenant: Optional[str] = None) -> IngestionManifest:
+        if not tenant:
+            return self.manifest
+        manifest = self._tenant_manifests.get(tenant)
+        if manifest is None:
+            manifest = self._tenant_manifests[tenant] = IngestionManifest(
+                os.path.join(self.persist_directory, f"ingestion_manifest_{tenant}.json"))
+        return manifest
+
+    def list_tenants(self) -> List[str]:
+        return self.vector_db.list_tenants()
 
-        info = self.vector_db.get_collection_info()
+    def add_documents(self, folder_path: str, purge_missing: bool = True,
+                      tenant: Optional[str] = None, department: Optional[str] = None,
+                      resume: bool = False,
+                      progress_callback: Optional[Callable[[dict], None]] = None) -> dict:
+        """Sync a folder as a checkpointed job; resume=True continues an interrupted one"""
+        vector_db = self.get_vector_db(tenant)
+        # The vector database embeds through its cached embedding service
+        with self._ingest_lock:
+            stats = process_and_add_documents(
+                vector_db, folder_path, self.get_manifest(tenant), purge_missing,
+                workers=self.ingest_workers, department=department, queue=self.ingestion_queue,
+                resume=resume, progress_callback=progress_callback)
+        self.response_cache.invalidate_sources(stats["changed_sources"])
+
+        info = vector_db.get_collection_info()
         print(
             f"Knowledge base now contains {info.get('total_documents', 0)} document chunks")
+        return stats
+
+    def sync_files(self, folder_path: str, file_paths: List[str], tenant: Optional[str] = None,
+                   department: Optional[str] = None) -> dict:
+        """Re-ingest or remove only the given files of a folder, e.g. after a watcher event"""
+        vector_db = self.get_vector_db(tenant)
+        with self._ingest_lock:
+            stats = process_changed_files(vector_db, folder_path, file_paths,
+                                          self.get_manifest(tenant), department)
+        self.response_cache.invalidate_sources(stats["changed_sources"])
+        return stats
+
+    def resume_ingestion(self, progress_callback: Optional[Callable[[dict], None]] = None) -> List[dict]:
+        """Finish every ingestion job that was interrupted; returns their stats"""
+        results = []
+        for job in self.ingestion_queue.unfinished_jobs():
+            if not os.path.isdir(job["folder"]):
+                print(f"Skipping interrupted ingestion of {job['folder']}: the folder no longer exists")
+                self.ingestion_queue.finish_job(job["job_id"], "abandoned")
+                continue
+            collection = job["collection"]
+            tenant = None
+            if collection != tenant_collection_name() and collection.startswith(TENANT_PREFIX):
+                tenant = collection[len(TENANT_PREFIX):]
+            results.append(self.add_documents(job["folder"], tenant=tenant, resume=True,
+                                              progress_callback=progress_callback))
+        return results
+
+    def get_failed_files(self, tenant: Optional[str] = None) -> List[dict]:
+        """Dead-letter list: files that could not be ingested, with their errors"""
+        return self.ingestion_queue.dead_letters(tenant_collection_name(tenant))
 
     def create_session(self) -> str:
         return self.memory.create_session()
 
-    def query(self, question: str, session_id: str, n_chunks: int = 3) -> Tuple[str, List[str]]:
-        try:
-            conversation_history = self.memory.format_history_for_prompt(
-                session_id)
+    def _prepare_turn(self, question: str, session_id: str, n_chunks: int, trace: Trace,
+                      tenant: Optional[str] = None, where: Optional[dict] = None) -> dict:
+        """Contextualize and retrieve: everything a turn needs before generation"""
+        conversation_history = self.history.build(session_id)
 
-            contextualized_query = self.openai_client.contextualize_query(
-                question, conversation_history
+        with trace.span("contextualize") as span:
+            usage = {}
+            contextualized_query, rewrite_path = self.openai_client.contextualize(
+                question, conversation_history, usage
             )
+            span["attributes"].update(usage, rewrite=rewrite_path)
+            trace.add_usage(usage)
+        turn_metrics = {
+            "rewrite": rewrite_path,
+            "rewrite_llm_call": rewrite_path == "llm",
+            "history_tokens": count_tokens(conversation_history)
+        }
+        self._set_turn_metrics(session_id, turn_metrics)
 
-            search_results = self.vector_db.semantic_search(
-                contextualized_query, n_chunks)
-            context, sources = self.vector_db.get_context_with_sources(
-                search_results)
+        with trace.span("embed_query"):
+            query_embedding = self.vector_db.embedder.embed_query(
+                contextualized_query)
+        with trace.span("search", n_results=self._candidate_count(n_chunks)):
+            search_results = self.get_vector_db(tenant).search(
+                contextualized_query, self._candidate_count(n_chunks), query_embedding, where)
+        search_results = self._rerank(contextualized_query, search_results, n_chunks, trace)
+        return self._lookup_turn(conversation_history, contextualized_query,
+                                 query_embedding, search_results, turn_metrics, trace)
 
-            response = self.openai_client.generate_response(
-                contextualized_query, context, conversation_history
-            )
+    def _candidate_count(self, n_chunks: int) -> int:
+        return n_chunks * self.rerank_overfetch if self.reranker is not None else n_chunks
 
-            self.memory.add_message(session_id, "user", question)
-            self.memory.add_message(session_id, "assistant", response)
+    def _rerank(self, query: str, search_results: dict, n_chunks: int,
+                trace: Optional[Trace] = None) -> dict:
+        if self.reranker is None:
+            return search_results
+        start_time = time.perf_counter()
+        with maybe_span(trace, "rerank") as span:
+            reranked = self.reranker.rerank(query, search_results, n_chunks)
+            span["attributes"]["outcome"] = reranked["rerank"]
+        reranked["rerank_seconds"] = time.perf_counter() - start_time
+        return reranked
 
-            return response, sources
+    def _set_turn_metrics(self, session_id: str, turn_metrics: dict):
+        self.turn_metrics[session_id] = turn_metrics
+        self.turn_metrics.move_to_end(session_id)
+        while len(self.turn_metrics) > self.memory.max_sessions:
+            self.turn_metrics.popitem(last=False)
 
-        except Exception as e:
-            error_response = f"I apologize, but I encountered an error while processing your question: {str(e)}"
-            self.memory.add_message(session_id, "user", question)
-            self.memory.add_message(session_id, "assistant", error_response)
-            return error_response, []
+    def _lookup_turn(self, conversation_history: str, contextualized_query: str,
+                     query_embedding: List[float], search_results: dict,
+                     turn_metrics: dict, trace: Trace) -> dict:
+        chunk_ids = search_results['ids'][0]
+        with trace.span("response_cache") as span:
+            cached = self.response_cache.lookup(query_embedding, chunk_ids)
+            span["attributes"]["hit"] = cached is not None
+        turn_metrics["response_cache"] = "hit" if cached is not None else "miss"
+        if "rerank" in search_results:
+            turn_metrics["rerank"] = search_results["rerank"]
+            turn_metrics["rerank_seconds"] = search_results["rerank_seconds"]
+        return {
+            "history": conversation_history,
+            "query": contextualized_query,
+            "embedding": query_embedding,
+            "results": search_results,
+            "cached": cached,
+            "metrics": turn_metrics
+        }
+
+    def _finish_turn(self, session_id: str, question: str, turn: dict, response: str,
+                     sources: List[str], start_time: float, first_token_time: float, trace: Trace):
+        if turn["cached"] is None:
+            self._store_response(turn["embedding"], turn["results"], response, sources)
+
+        self.memory.add_message(session_id, "user", question)
+        self.memory.add_message(session_id, "assistant", response)
+
+        turn["metrics"]["ttft_seconds"] = first_token_time - start_time
+        turn["metrics"]["total_seconds"] = time.perf_counter() - start_time
+        turn["metrics"]["trace_id"] = trace.trace_id
+
+    def _store_response(self, query_embedding: List[float], search_results: dict,
+                        response: str, sources: List[str]):
+        source_files = [meta['source'] for meta in search_results['metadatas'][0]]
+        self.response_cache.store(
+            query_embedding, search_results['ids'][0], source_files, response, sources)
+
+    def _compact_history(self, session_id: str, turn: dict, trace: Trace):
+        """Fold aged-out messages into the session summary once a batch is ready"""
+        plan = self.history.plan_compaction(session_id)
+        if plan is not None:
+            with trace.span("compact_history") as span:
+                usage = {}
+                summary = self.openai_client.summarize_history(plan["summary"], plan["messages"], usage)
+                span["attributes"].update(usage)
+                trace.add_usage(usage)
+            turn["metrics"]["history_compacted"] = self.history.apply_compaction(
+                session_id, plan, summary)
+        turn["metrics"].update(trace.tokens)
+        turn["metrics"]["stages"] = trace.stage_seconds()
 
-    def simple_query(self, question: str, n_chunks: int = 3) -> Tuple[str, List[str]]:
+    def _record_failure(self, session_id: str, trace: Trace, error: Exception):
+        """Keep the failed stage and error type in the turn metrics; the caller re-raises.
+
+        Nothing is added to the conversation, so a retry starts from the same history.
+        """
+        trace.fail(error)
+        metrics = self.turn_metrics.get(session_id, {})
+        metrics["error"] = {key: trace.error[key] for key in ("stage", "type", "message")}
+        metrics["stages"] = trace.stage_seconds()
+        metrics["trace_id"] = trace.trace_id
+        self._set_turn_metrics(session_id, metrics)
+
+    def query(self, question: str, session_id: str, n_chunks: int = 3,
+              tenant: Optional[str] = None, where: Optional[dict] = None) -> Tuple[str, List[str]]:
+        """Answer a question; tenant selects the collection and where filters chunk metadata.
+
+        Errors from retrieval or Azure OpenAI propagate with their original
+        type; get_turn_metrics() then names the stage that failed.
+        """
+        start_time = time.perf_counter()
+        with self.tracer.trace("query", tenant=tenant or "") as trace:
+            try:
+                turn = self._prepare_turn(question, session_id, n_chunks, trace, tenant, where)
+
+                if turn["cached"] is not None:
+                    response, sources = turn["cached"]
+                else:
+                    context, sources = self.vector_db.get_context_with_sources(
+                        turn["results"])
+
+                    with trace.span("generate") as span:
+                        response, usage = self.openai_client.generate_response_with_usage(
+                            turn["query"], context, turn["history"]
+                        )
+                        span["attributes"].update(usage)
+                        trace.add_usage(usage)
+
+                # Without streaming the first token arrives with the whole answer
+                self._finish_turn(session_id, question, turn, response, sources,
+                                  start_time, time.perf_counter(), trace)
+                self._compact_history(session_id, turn, trace)
+                return response, sources
+
+            except Exception as e:
+                self._record_failure(session_id, trace, e)
+                raise
+
+    def query_stream(self, question: str, session_id: str, n_chunks: int = 3,
+                     tenant: Optional[str] = None, where: Optional[dict] = None) -> Iterator[Tuple[str, Any]]:
+        """Yield ("token", text) pieces as the answer is generated, then ("sources", sources)"""
+        start_time = time.perf_counter()
+        with self.tracer.trace("query_stream", tenant=tenant or "") as trace:
+            try:
+                turn = self._prepare_turn(question, session_id, n_chunks, trace, tenant, where)
+
+                if turn["cached"] is not None:
+                    response, sources = turn["cached"]
+                    first_token_time = time.perf_counter()
+                    yield "token", response
+                else:
+                    context, sources = self.vector_db.get_context_with_sources(
+                        turn["results"])
+
+                    pieces = []
+                    first_token_time = None
+                    with trace.span("generate", stream=True) as span:
+                        usage = {}
+                        for piece in self.openai_client.generate_response_stream(
+                                turn["query"], context, turn["history"], usage):
+                            if first_token_time is None:
+                                first_token_time = time.perf_counter()
+                            pieces.append(piece)
+                            yield "token", piece
+                        span["attributes"].update(usage)
+                        trace.add_usage(usage)
+                    response = "".join(pieces)
+                    if first_token_time is None:
+                        first_token_time = time.perf_counter()
+
+                self._finish_turn(session_id, question, turn, response, sources,
+                                  start_time, first_token_time, trace)
+                self._compact_history(session_id, turn, trace)
+                yield "sources", sources
+
+            except Exception as e:
+                self._record_failure(session_id, trace, e)
+                raise
+
+    def simple_query(self, question: str, n_chunks: int = 3,
+                     tenant: Optional[str] = None, where: Optional[dict] = None) -> Tuple[str, List[str]]:
         temp_session = self.create_session()
-        return self.query(question, temp_session, n_chunks)
+        try:
+            return self.query(question, temp_session, n_chunks, tenant, where)
+        finally:
+            self._discard_session(temp_session)
+
+    def _discard_session(self, session_id: str):
+        self.memory.delete_session(session_id)
+        self.turn_metrics.pop(session_id, None)
+
+    def retrieve_batch(self, questions: List[str], n_chunks: int = 3, tenant: Optional[str] = None,
+                       where: Optional[dict] = None,
+                       trace: Optional[Trace] = None) -> Tuple[List[List[float]], List[dict]]:
+        """Embed all questions in one batch and retrieve for them with one vector query"""
+        if trace is None:
+            with self.tracer.trace("retrieve_batch", questions=len(questions)) as trace:
+                return self.retrieve_batch(questions, n_chunks, tenant, where, trace)
+        with trace.span("embed_query", questions=len(questions)):
+            query_embeddings = self.vector_db.embedder.embed_queries(questions)
+        with trace.span("search", questions=len(questions), n_results=self._candidate_count(n_chunks)):
+            results = self.get_vector_db(tenant).search_batch(
+                questions, self._candidate_count(n_chunks), query_embeddings, where)
+        return query_embeddings, [self._rerank(question, search_results, n_chunks, trace)
+                                  for question, search_results in zip(questions, results)]
+
+    def _answer_retrieved(self, question: str, query_embedding: List[float],
+                          search_results: dict, trace: Trace) -> dict:
+        start_time = time.perf_counter()
+        with trace.span("response_cache") as span:
+            cached = self.response_cache.lookup(query_embedding, search_results['ids'][0])
+            span["attributes"]["hit"] = cached is not None
+        error = None
+        if cached is not None:
+            (response, sources), usage = cached, {}
+        else:
+            context, sources = self.vector_db.get_context_with_sources(search_results)
+            try:
+                with trace.span("generate") as span:
+                    response, usage = self.openai_client.generate_response_with_usage(question, context)
+                    span["attributes"].update(usage)
+                    trace.add_usage(usage)
+                self._store_response(query_embedding, search_results, response, sources)
+            except Exception as e:
+                # One failed question must not lose the rest of the batch
+                response, sources, usage = "", [], {}
+                error = {"type": type(e).__name__, "message": str(e)}
+        return self._batch_answer(question, search_results, response, sources, usage,
+                                  cached is not None, time.perf_counter() - start_time, error)
+
+    @staticmethod
+    def _batch_answer(question: str, search_results: dict, response: str, sources: List[str],
+                      usage: dict, cached: bool, generation_seconds: float,
+                      error: Optional[dict] = None) -> dict:
+        return {
+            "question": question,
+            "answer": response,
+            "sources": sources,
+            "chunk_ids": search_results['ids'][0],
+            "chunk_sources": [meta['source'] for meta in search_results['metadatas'][0]],
+            "response_cache": "hit" if cached else "miss",
+            "prompt_tokens": usage.get("prompt_tokens", 0),
+            "completion_tokens": usage.get("completion_tokens", 0),
+            "generation_seconds": generation_seconds,
+            "error": error
+        }
+
+    def batch_query(self, questions: List[str], n_chunks: int = 3, max_concurrency: int = None,
+                    tenant: Optional[str] = None, where: Optional[dict] = None) -> List[dict]:
+        """Answer independent questions without creating sessions.
+
+        All questions are embedded in one batch and retrieved with one
+        vector query; at most max_concurrency LLM calls run at a time.
+        Returns one dict per question, in order, with the answer, sources,
+        retrieved chunk ids, token usage and timings. A question whose LLM
+        call failed has an empty answer and "error" set to its type and message.
+        """
+        start_time = time.perf_counter()
+        with self.tracer.trace("batch_query", questions=len(questions)) as trace:
+            query_embeddings, results = self.retrieve_batch(questions, n_chunks, tenant, where, trace)
+            retrieval_seconds = time.perf_counter() - start_time
+
+            max_concurrency = max_concurrency or int(os.getenv("BATCH_CONCURRENCY", "8"))
+            with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+                answers = list(executor.map(self._answer_retrieved, questions, query_embeddings,
+                                            results, [trace] * len(questions)))
+        for answer in answers:
+            answer["retrieval_seconds"] = retrieval_seconds
+        return answers
 
     def get_conversation_history(self, session_id: str) -> List[dict]:
         return self.memory.get_conversation_history(session_id)
 
     def clear_conversation(self, session_id: str):
         self.memory.clear_session(session_id)
+        self.turn_metrics.pop(session_id, None)
+
+    def get_turn_metrics(self, session_id: str) -> dict:
+        """Metrics of the last answered question in a session"""
+        return dict(self.turn_metrics.get(session_id, {}))
+
+    def get_trace_stats(self) -> dict:
+        """Rolling p50/p95 latency per pipeline stage, error counts and token totals"""
+        return self.tracer.get_stats()
 
-    def get_knowledge_base_info(self) -> dict:
-        return self.vector_db.get_collection_info()
+    def get_knowledge_base_info(self, tenant: Optional[str] = None) -> dict:
+        info = self.get_vector_db(tenant).get_collection_info()
+        info["response_cache"] = self.response_cache.get_stats()
+        info["query_rewrites"] = self.openai_client.get_rewrite_stats()
+        if self.reranker is not None:
+            info["reranker"] = self.reranker.get_stats()
+        return info
 
-    def reset_knowledge_base(self):
-        self.vector_db.reset_collection()
+    def reset_knowledge_base(self, tenant: Optional[str] = None):
+        with self._ingest_lock:
+            self.get_vector_db(tenant).reset_collection()
+            self.get_manifest(tenant).clear()
+            self.ingestion_queue.clear(tenant_collection_name(tenant))
+        self.response_cache.clear()
         print("Knowledge base has been reset")
 
-    def search_documents(self, query: str, n_results: int = 5) -> dict:
-        return self.vector_db.semantic_search(query, n_results)
+    def search_documents(self, query: str, n_results: int = 5, tenant: Optional[str] = None,
+                         where: Optional[dict] = None) -> dict:
+        return self.get_vector_db(tenant).search(query, n_results, where=where)
 
-    def print_search_results(self, query: str, n_results: int = 5):
-        results = self.search_documents(query, n_results)
+    def print_search_results(self, query: str, n_results: int = 5, tenant: Optional[str] = None,
+                             where: Optional[dict] = None):
+        results = self.search_documents(query, n_results, tenant, where)
         self.vector_db.print_search_results(results)
 
     def get_session_info(self, session_id: str) -> dict:
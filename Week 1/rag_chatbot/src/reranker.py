@@ -0,0 +1,136 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
+
+_RESULT_KEYS = ("ids", "documents", "metadatas", "distances", "scores")
+
+
+def reorder_results(results: Dict[str, Any], order: List[int]) -> Dict[str, Any]:
+    """Chroma-shaped results restricted to, and sorted by, the given positions"""
+    return {
+        key: [[results[key][0][i] for i in order]]
+        for key in _RESULT_KEYS if results.get(key) is not None
+    }
+
+
+class CrossEncoderReranker:
+    """Re-score retrieved chunks with a local cross-encoder.
+
+    Candidates are scored in batches on a small thread pool. Scores are
+    cached per (query, chunk id); chunk ids are content-addressed, so a
+    cached score stays valid until the chunk changes. If scoring does not
+    finish within the latency budget the vector order is kept, and the
+    batches still running fill the cache for the next time.
+    """
+
+    def __init__(self, model_name: Optional[str] = None, batch_size: Optional[int] = None,
+                 num_threads: Optional[int] = None, cache_size: Optional[int] = None,
+                 latency_budget: Optional[float] = None, device: Optional[str] = None):
+        self.model_name = model_name or os.getenv(
+            "RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+        self.batch_size = batch_size or int(os.getenv("RERANK_BATCH_SIZE", "16"))
+        self.cache_size = cache_size or int(os.getenv("RERANK_CACHE_SIZE", "10000"))
+        self.latency_budget = latency_budget or float(os.getenv("RERANK_BUDGET_MS", "300")) / 1000
+        self.device = device or "cpu"
+        self.executor = ThreadPoolExecutor(
+            max_workers=num_threads or int(os.getenv("RERANK_THREADS", "2")),
+            thread_name_prefix="rerank")
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"reranked": 0, "fallback": 0, "cache_hits": 0, "cache_misses": 0}
+
+    @property
+    def model(self):
+        with self._model_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name, device=self.device)
+        return self._model
+
+    @staticmethod
+    def _query_key(query: str) -> str:
+        return " ".join(query.lower().split())
+
+    def _score_batch(self, query: str, ids: List[str], texts: List[str]) -> List[float]:
+        scores = [float(score) for score in self.model.predict(
+            [(query, text) for text in texts], batch_size=len(texts), show_progress_bar=False)]
+        query_key = self._query_key(query)
+        with self._lock:
+            for id_, score in zip(ids, scores):
+                self._scores[(query_key, id_)] = score
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+        return scores
+
+    def score(self, query: str, ids: List[str], texts: List[str]) -> Optional[List[float]]:
+        """Scores aligned with ids, or None if the latency budget ran out"""
+        deadline = time.perf_counter() + self.latency_budget
+        query_key = self._query_key(query)
+        scores = {}
+        with self._lock:
+            for id_ in ids:
+                score = self._scores.get((query_key, id_))
+                if score is not None:
+                    self._scores.move_to_end((query_key, id_))
+                    scores[id_] = score
+        missing = [i for i, id_ in enumerate(ids) if id_ not in scores]
+        with self._lock:
+            self.stats["cache_hits"] += len(ids) - len(missing)
+            self.stats["cache_misses"] += len(missing)
+
+        futures = {}
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            batch_ids = [ids[i] for i in batch]
+            futures[self.executor.submit(
+                self._score_batch, query, batch_ids, [texts[i] for i in batch])] = batch_ids
+        if futures:
+            done, not_done = wait(futures, timeout=max(deadline - time.perf_counter(), 0))
+            if not_done:
+                return None
+            errors = [future.exception() for future in done if future.exception() is not None]
+            if errors:
+                print(f"Warning: Re-ranking failed ({str(errors[0])}). Using vector order.")
+                return None
+            for future in done:
+                scores.update(zip(futures[future], future.result()))
+        return [scores[id_] for id_ in ids]
+
+    def rerank(self, query: str, results: Dict[str, Any], n_results: int) -> Dict[str, Any]:
+        """Keep the n_results best candidates; results["rerank"] says how they were ordered"""
+        ids = results['ids'][0]
+        scores = self.score(query, ids, results['documents'][0]) if ids else []
+        if scores is None:
+            with self._lock:
+                self.stats["fallback"] += 1
+            reranked = reorder_results(results, list(range(min(n_results, len(ids)))))
+            reranked["rerank"] = "fallback"
+            return reranked
+
+        order = sorted(range(len(ids)), key=lambda i: scores[i], reverse=True)[:n_results]
+        with self._lock:
+            self.stats["reranked"] += 1
+        reranked = reorder_results(results, order)
+        reranked["rerank_scores"] = [[scores[i] for i in order]]
+        reranked["rerank"] = "reranked"
+        return reranked
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+
+def create_reranker() -> Optional[CrossEncoderReranker]:
+    """A reranker when RERANK_ENABLED is set, else None"""
+    if os.getenv("RERANK_ENABLED", "false").lower() in ("1", "true", "yes"):
+        return CrossEncoderReranker()
+    return None
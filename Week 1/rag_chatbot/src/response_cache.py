@@ -0,0 +1,125 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+import numpy as np
+
+
+class SemanticResponseCache:
+    """LRU + TTL cache of answers keyed by query embedding and retrieved chunks.
+
+    A lookup hits when the same set of chunk ids was retrieved and the cached
+    query embedding is within the cosine similarity threshold, so paraphrases
+    of a question answered from the same context share one LLM completion.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.95, ttl_seconds: float = 3600,
+                 max_entries: int = 1000):
+        self.similarity_threshold = similarity_threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._by_chunks = {}
+        self._by_source = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, key: int):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        keys = self._by_chunks.get(entry["chunk_ids"])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_chunks[entry["chunk_ids"]]
+        for source in entry["source_files"]:
+            keys = self._by_source.get(source)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_source[source]
+
+    def lookup(self, query_embedding, chunk_ids: Iterable[str]) -> Optional[Tuple[str, List[str]]]:
+        """Return (response, sources) for a similar cached query, or None"""
+        chunk_key = frozenset(chunk_ids)
+        vector = self._normalize(query_embedding)
+        now = time.monotonic()
+
+        with self._lock:
+            best_key, best_score = None, self.similarity_threshold
+            for key in list(self._by_chunks.get(chunk_key, ())):
+                entry = self._entries[key]
+                if now - entry["created"] > self.ttl_seconds:
+                    self._remove(key)
+                    continue
+                score = float(np.dot(vector, entry["embedding"]))
+                if score >= best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None:
+                self.stats["misses"] += 1
+                return None
+
+            self._entries.move_to_end(best_key)
+            self.stats["hits"] += 1
+            entry = self._entries[best_key]
+            return entry["response"], list(entry["sources"])
+
+    def store(self, query_embedding, chunk_ids: Iterable[str], source_files: Iterable[str],
+              response: str, sources: List[str]):
+        chunk_key = frozenset(chunk_ids)
+        source_files = frozenset(source_files)
+
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._entries[key] = {
+                "embedding": self._normalize(query_embedding),
+                "chunk_ids": chunk_key,
+                "source_files": source_files,
+                "response": response,
+                "sources": list(sources),
+                "created": time.monotonic()
+            }
+            self._by_chunks.setdefault(chunk_key, set()).add(key)
+            for source in source_files:
+                self._by_source.setdefault(source, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.stats["evictions"] += 1
+
+    def invalidate_sources(self, source_files: Iterable[str]) -> int:
+        """Drop every answer built from chunks of the given source files"""
+        with self._lock:
+            keys = set()
+            for source in source_files:
+                keys.update(self._by_source.get(source, ()))
+            for key in keys:
+                self._remove(key)
+            self.stats["invalidations"] += len(keys)
+            return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_chunks.clear()
+            self._by_source.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "entries": len(self._entries),
+                "hit_rate": self.stats["hits"] / lookups if lookups else 0.0
+            }
@@ -0,0 +1,364 @@
+import atexit
+import json
+import os
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, Optional
+
+import numpy as np
+
+# Upper bounds of the Prometheus latency histogram, in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Trace:
+    """Timed spans of one request, e.g. contextualize, search and generate for a query.
+
+    Spans are opened explicitly on the trace rather than through an ambient
+    context, so the same trace can be carried through generators, threads
+    and async tasks. Token usage reported by the LLM calls is summed per trace.
+    """
+
+    def __init__(self, name: str, attributes: Optional[dict] = None):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration = None
+        self.status = "ok"
+        self.error = None
+        self.spans = []
+        self.tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+
+    @contextmanager
+    def span(self, name: str, **attributes) -> Iterator[dict]:
+        """Time a stage; exceptions are recorded on the span and re-raised"""
+        span = {"name": name, "start_offset": time.perf_counter() - self._start,
+                "duration": None, "status": "ok", "attributes": attributes}
+        try:
+            yield span
+        except (GeneratorExit, KeyboardInterrupt):
+            # The caller went away (an abandoned stream, Ctrl+C); not a failure of the stage
+            span["status"] = "cancelled"
+            raise
+        except BaseException as e:
+            if type(e).__name__ == "CancelledError":
+                span["status"] = "cancelled"
+            else:
+                span["status"] = "error"
+                span["error"] = {"type": type(e).__name__, "message": str(e)}
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - self._start - span["start_offset"]
+            self.spans.append(span)
+
+    def add_usage(self, usage: dict):
+        for key in self.tokens:
+            self.tokens[key] += usage.get(key, 0)
+
+    def fail(self, error: BaseException):
+        """Mark the trace failed; the stage is the last span that raised"""
+        failed = [span for span in self.spans if span["status"] == "error"]
+        self.status = "error"
+        self.error = {
+            "stage": failed[-1]["name"] if failed else None,
+            "type": type(error).__name__,
+            "message": str(error),
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__))
+        }
+
+    def stage_seconds(self) -> Dict[str, float]:
+        seconds = {}
+        for span in self.spans:
+            seconds[span["name"]] = seconds.get(span["name"], 0.0) + span["duration"]
+        return seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration": self.duration,
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "tokens": dict(self.tokens),
+            "spans": list(self.spans)
+        }
+
+
+def maybe_span(trace: Optional[Trace], name: str, **attributes):
+    """trace.span(...) when there is a trace, else a no-op context"""
+    return trace.span(name, **attributes) if trace is not None else nullcontext({"attributes": {}})
+
+
+class Tracer:
+    """Collects finished traces: rolling per-stage latencies plus pluggable exporters.
+
+    The last `window` durations of every stage are kept for p50/p95; counts,
+    errors and token totals are cumulative. Each finished trace is handed to
+    every exporter; an exporter that fails is reported and skipped.
+    """
+
+    def __init__(self, exporters: Optional[list] = None, window: Optional[int] = None):
+        self.exporters = list(exporters or [])
+        self.window = window or int(os.getenv("TRACE_WINDOW", "1000"))
+        self._durations = {}
+        self._counts = {}
+        self._errors = {}
+        self._error_types = {}
+        self._tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        self._lock = threading.Lock()
+
+    def start_trace(self, name: str, **attributes) -> Trace:
+        return Trace(name, attributes)
+
+    def finish(self, trace: Trace):
+        trace.duration = time.perf_counter() - trace._start
+        with self._lock:
+            for span in trace.spans:
+                if span["status"] != "cancelled":
+                    self._record(span["name"], span["duration"], span["status"] == "error")
+            if trace.status != "cancelled":
+                self._record(trace.name, trace.duration, trace.status == "error")
+            if trace.error is not None:
+                key = (trace.error["stage"], trace.error["type"])
+                self._error_types[key] = self._error_types.get(key, 0) + 1
+            for key, value in trace.tokens.items():
+                self._tokens[key] += value
+
+        record = trace.to_dict()
+        for exporter in self.exporters:
+            try:
+                exporter.export(record)
+            except Exception as e:
+                print(f"Warning: {type(exporter).__name__} failed to export a trace ({str(e)})")
+
+    @contextmanager
+    def trace(self, name: str, **attributes) -> Iterator[Trace]:
+        """Start a trace, mark it failed if the block raises, and finish it"""
+        trace = self.start_trace(name, **attributes)
+        try:
+            yield trace
+        except Exception as e:
+            trace.fail(e)
+            raise
+        except BaseException:
+            # An abandoned stream, a cancelled task or Ctrl+C is not a failure of the pipeline
+            trace.status = "cancelled"
+            raise
+        finally:
+            self.finish(trace)
+
+    def _record(self, stage: str, duration: float, failed: bool):
+        durations = self._durations.get(stage)
+        if durations is None:
+            durations = self._durations[stage] = deque(maxlen=self.window)
+        durations.append(duration)
+        self._counts[stage] = self._counts.get(stage, 0) + 1
+        self._errors[stage] = self._errors.get(stage, 0) + failed
+
+    def get_stats(self) -> dict:
+        """Rolling p50/p95 per stage, cumulative counts, errors and token usage"""
+        with self._lock:
+            stages = {}
+            for stage, durations in self._durations.items():
+                p50, p95 = np.percentile(list(durations), [50, 95]) * 1000
+                stages[stage] = {
+                    "count": self._counts[stage],
+                    "errors": self._errors[stage],
+                    "p50_ms": float(p50),
+                    "p95_ms": float(p95),
+                    "mean_ms": float(np.mean(durations) * 1000)
+                }
+            return {
+                "stages": stages,
+                "errors": [{"stage": stage, "type": error_type, "count": count}
+                           for (stage, error_type), count in self._error_types.items()],
+                "tokens": dict(self._tokens)
+            }
+
+    def reset(self):
+        with self._lock:
+            self._durations.clear()
+            self._counts.clear()
+            self._errors.clear()
+            self._error_types.clear()
+            self._tokens = dict.fromkeys(self._tokens, 0)
+
+    def close(self):
+        for exporter in self.exporters:
+            exporter.close()
+
+
+class JSONLogExporter:
+    """Appends every finished trace to a JSON-lines file"""
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def export(self, trace: dict):
+        line = json.dumps(trace, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class PrometheusTextExporter:
+    """Writes latency histograms, error and token counters in the Prometheus text format.
+
+    The file is meant for node_exporter's textfile collector. It is rewritten
+    atomically at most every `interval` seconds, and on close.
+    """
+
+    def __init__(self, path: str, interval: Optional[float] = None, prefix: str = "rag"):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.interval = interval if interval is not None else float(
+            os.getenv("PROMETHEUS_WRITE_INTERVAL", "15"))
+        self.prefix = prefix
+        self._buckets = {}
+        self._sums = {}
+        self._errors = {}
+        self._tokens = {"prompt_tokens": 0, "completion_tokens": 0}
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+        # Counters gathered since the last periodic write still reach the file
+        atexit.register(self.close)
+
+    def _observe(self, stage: str, duration: float, failed: bool):
+        buckets = self._buckets.get(stage)
+        if buckets is None:
+            buckets = self._buckets[stage] = [0] * (len(LATENCY_BUCKETS) + 1)
+            self._sums[stage] = 0.0
+            self._errors[stage] = 0
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if duration <= bound:
+                buckets[i] += 1
+        buckets[-1] += 1
+        self._sums[stage] += duration
+        self._errors[stage] += failed
+
+    def export(self, trace: dict):
+        with self._lock:
+            for span in trace["spans"]:
+                if span["status"] != "cancelled":
+                    self._observe(span["name"], span["duration"], span["status"] == "error")
+            if trace["status"] != "cancelled":
+                self._observe(trace["name"], trace["duration"], trace["status"] == "error")
+            for key, value in trace["tokens"].items():
+                self._tokens[key] += value
+            if time.monotonic() - self._last_write >= self.interval:
+                self._write()
+
+    def render(self) -> str:
+        name = f"{self.prefix}_stage_duration_seconds"
+        lines = [f"# HELP {name} Time spent per pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, buckets in sorted(self._buckets.items()):
+            for bound, count in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {buckets[-1]}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {self._sums[stage]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {buckets[-1]}')
+
+        name = f"{self.prefix}_stage_errors_total"
+        lines += [f"# HELP {name} Stages that raised.", f"# TYPE {name} counter"]
+        lines += [f'{name}{{stage="{stage}"}} {count}' for stage, count in sorted(self._errors.items())]
+
+        name = f"{self.prefix}_llm_tokens_total"
+        lines += [f"# HELP {name} Tokens reported by Azure OpenAI.", f"# TYPE {name} counter"]
+        lines += [f'{name}{{type="{key[:-len("_tokens")]}"}} {value}' for key, value in self._tokens.items()]
+        return "\n".join(lines) + "\n"
+
+    def _write(self):
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            file.write(self.render())
+        os.replace(temp_path, self.path)
+        self._last_write = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._write()
+
+
+class OpenTelemetryExporter:
+    """Re-emits each trace as OpenTelemetry spans with their recorded start and end times.
+
+    Spans go to whatever TracerProvider the application configured (OTLP,
+    console, ...); without one the OpenTelemetry API drops them.
+    """
+
+    def __init__(self, service_name: str = "rag_chatbot"):
+        from opentelemetry import trace as otel_trace
+        from opentelemetry.trace import Status, StatusCode
+
+        self._otel_trace = otel_trace
+        self._status = Status
+        self._status_code = StatusCode
+        self.tracer = otel_trace.get_tracer(service_name)
+
+    @staticmethod
+    def _attributes(values: dict) -> dict:
+        # OpenTelemetry attributes must be primitives
+        return {key: value for key, value in values.items()
+                if isinstance(value, (str, bool, int, float))}
+
+    def _set_error(self, span, error: Optional[dict]):
+        if error:
+            span.set_status(self._status(self._status_code.ERROR, f"{error['type']}: {error['message']}"))
+
+    def export(self, trace: dict):
+        start_ns = int(trace["start_time"] * 1e9)
+        attributes = self._attributes(trace["attributes"])
+        attributes.update({f"llm.{key}": value for key, value in trace["tokens"].items()})
+        root = self.tracer.start_span(trace["name"], start_time=start_ns, attributes=attributes)
+        self._set_error(root, trace["error"])
+        context = self._otel_trace.set_span_in_context(root)
+        for span in trace["spans"]:
+            span_start = start_ns + int(span["start_offset"] * 1e9)
+            child = self.tracer.start_span(span["name"], context=context, start_time=span_start,
+                                           attributes=self._attributes(span["attributes"]))
+            self._set_error(child, span.get("error"))
+            child.end(end_time=span_start + int(span["duration"] * 1e9))
+        root.end(end_time=start_ns + int(trace["duration"] * 1e9))
+
+    def close(self):
+        pass
+
+
+def create_tracer(persist_directory: str = "chroma_db") -> Tracer:
+    """A Tracer with the exporters named in TRACE_EXPORTERS (json, prometheus, otel)"""
+    exporters = []
+    names = [name.strip().lower() for name in os.getenv("TRACE_EXPORTERS", "").split(",") if name.strip()]
+    for name in names:
+        if name == "json":
+            exporters.append(JSONLogExporter(
+                os.getenv("TRACE_LOG_PATH", os.path.join(persist_directory, "traces.jsonl"))))
+        elif name == "prometheus":
+            exporters.append(PrometheusTextExporter(
+                os.getenv("PROMETHEUS_TEXTFILE_PATH", os.path.join(persist_directory, "metrics.prom"))))
+        elif name == "otel":
+            try:
+                exporters.append(OpenTelemetryExporter())
+            except ImportError:
+                print("Warning: opentelemetry-api is not installed. OpenTelemetry export disabled.")
+        else:
+            print(f"Warning: Unknown trace exporter '{name}' ignored")
+    return Tracer(exporters)
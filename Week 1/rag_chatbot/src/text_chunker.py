@@ -0,0 +1,321 @@
+import os
+import re
+from bisect import bisect_right
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from .tokenizer import count_tokens
+
+DEFAULT_CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "200"))
+DEFAULT_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "30"))
+
+# Candidate sentence ends: terminal punctuation, optional closing quotes or
+# brackets, then whitespace. Abbreviations are filtered out afterwards.
+_SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*\s+")
+_HEADING = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+_LIST_ITEM = re.compile(r"^\s*(?:[-*+•]|\d{1,3}[.)])\s+\S")
+
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "sr", "jr", "st", "vs", "etc", "e.g",
+    "i.e", "inc", "ltd", "co", "corp", "no", "nos", "fig", "figs", "approx",
+    "dept", "est", "jan", "feb", "mar", "apr", "jun", "jul", "aug", "sep",
+    "sept", "oct", "nov", "dec", "u.s", "a.m", "p.m"
+}
+
+# Paragraph text above this size is segmented eagerly, so a document with no
+# blank lines never has to be held in full
+_MAX_PARAGRAPH_CHARS = 32 * 1024
+
+
+def _sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """(start, end) offsets of the stripped sentences, found in one left-to-right pass"""
+    spans = []
+
+    def add(begin, end):
+        piece = text[begin:end]
+        stripped = piece.strip()
+        if stripped:
+            begin += len(piece) - len(piece.lstrip())
+            spans.append((begin, begin + len(stripped)))
+
+    start = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+        # Look back a bounded distance for the word before the punctuation,
+        # which keeps the scan linear even in long runs of abbreviations
+        lookback = text[max(start, match.start() - 24):match.start()].split()
+        last_word = lookback[-1].lower() if lookback else ""
+        # "Dr. Smith", "e.g. VPN", "J. Doe" are not sentence ends
+        if last_word in ABBREVIATIONS or (len(last_word) == 1 and last_word.isalpha()):
+            continue
+        add(start, end)
+        start = end
+
+    add(start, len(text))
+    return spans
+
+
+def split_sentences(text: str) -> List[str]:
+    """Split text into sentences in a single left-to-right pass"""
+    return [text[begin:end] for begin, end in _sentence_spans(text)]
+
+
+class _Unit:
+    """A sentence (or heading) with its token count and page span"""
+
+    __slots__ = ("text", "tokens", "first_page", "last_page", "separator", "is_heading")
+
+    def __init__(self, text, tokens, first_page, last_page, separator, is_heading=False):
+        self.text = text
+        self.tokens = tokens
+        self.first_page = first_page
+        self.last_page = last_page
+        self.separator = separator
+        self.is_heading = is_heading
+
+
+def _iter_blocks(pages: Iterable[Tuple[Optional[int], str]]) -> Iterator[Tuple[str, List[Tuple[str, Optional[int]]], bool]]:
+    """Group a page stream into (kind, lines, complete) blocks.
+
+    kind is "heading", "paragraph" or "list_item" and lines is a list of
+    (line, page) pairs, so every line keeps the page it came from. A
+    paragraph is incomplete when it was cut early because it grew past
+    _MAX_PARAGRAPH_CHARS; the next paragraph block is then its continuation.
+    """
+    paragraph = []
+    paragraph_kind = "paragraph"
+    paragraph_chars = 0
+    was_cut = False
+
+    def end_paragraph():
+        nonlocal paragraph, paragraph_chars, was_cut
+        if paragraph or was_cut:
+            yield paragraph_kind, paragraph, True
+            paragraph, paragraph_chars = [], 0
+            was_cut = False
+
+    def handle_line(line, line_page, continues_previous):
+        nonlocal paragraph_kind, paragraph_chars, was_cut, paragraph
+        stripped = line.strip()
+        if not continues_previous:
+            is_heading = bool(_HEADING.match(line))
+            is_list_item = bool(_LIST_ITEM.match(line))
+            if not stripped or is_heading or is_list_item:
+                yield from end_paragraph()
+            if not stripped:
+                return
+            if is_heading:
+                yield "heading", [(stripped, line_page)], True
+                return
+            if not paragraph and not was_cut:
+                paragraph_kind = "list_item" if is_list_item else "paragraph"
+        elif not stripped:
+            return
+
+        paragraph.append((stripped, line_page))
+        paragraph_chars += len(stripped)
+
+        if paragraph_chars > _MAX_PARAGRAPH_CHARS:
+            yield paragraph_kind, paragraph, False
+            paragraph, paragraph_chars = [], 0
+            was_cut = True
+
+    partial_line = ""
+    partial_page = None
+    partial_continues = False
+    for page_number, text in pages:
+        lines = (partial_line + text).split("\n")
+        line_pages = [partial_page if partial_line else page_number] + \
+            [page_number] * (len(lines) - 1)
+        first_continues = partial_continues
+        partial_line, partial_page = lines.pop(), line_pages.pop()
+
+        if len(lines) > 0:
+            partial_continues = False
+        cut = -1
+        if len(partial_line) > _MAX_PARAGRAPH_CHARS:
+            # A very long line: hand over everything up to its last space now.
+            # Without a usable space, hand over all of it; the next piece then
+            # continues the same word after a space, which keeps memory bounded.
+            cut = partial_line.rfind(" ")
+            if cut <= 0 or len(partial_line) - cut > _MAX_PARAGRAPH_CHARS:
+                cut = len(partial_line)
+            lines.append(partial_line[:cut])
+            line_pages.append(partial_page)
+            partial_line = partial_line[cut + 1:]
+
+        for index, line in enumerate(lines):
+            yield from handle_line(line, line_pages[index], index == 0 and first_continues)
+        if cut >= 0:
+            partial_continues = True
+
+    if partial_line:
+        yield from handle_line(partial_line, partial_page, partial_continues)
+    yield from end_paragraph()
+
+
+def _split_long_word(word: str, max_tokens: int, counter: Callable[[str], int]) -> Iterator[str]:
+    """Cut a single word that is over the budget into character windows"""
+    tokens = counter(word)
+    if tokens <= max_tokens:
+        yield word
+        return
+    # Size windows by the word's own characters-per-token ratio, with margin
+    window_chars = max(1, int(len(word) * max_tokens / tokens * 0.9))
+    for begin in range(0, len(word), window_chars):
+        yield word[begin:begin + window_chars]
+
+
+def _split_long_unit(unit: _Unit, max_tokens: int, counter: Callable[[str], int]) -> Iterator[_Unit]:
+    """Break a sentence longer than the budget into word windows"""
+    window = []
+    window_tokens = 0
+    separator = unit.separator
+    for word in unit.text.split():
+        for piece in _split_long_word(word, max_tokens, counter):
+            piece_tokens = counter(" " + piece)
+            if window and window_tokens + piece_tokens > max_tokens:
+                yield _Unit(" ".join(window), window_tokens, unit.first_page,
+                            unit.last_page, separator)
+                separator = " "
+                window, window_tokens = [], 0
+            window.append(piece)
+            window_tokens += piece_tokens
+    if window:
+        yield _Unit(" ".join(window), window_tokens, unit.first_page,
+                    unit.last_page, separator)
+
+
+def _join_lines(lines: List[Tuple[str, Optional[int]]]) -> Tuple[str, List[int], List[Optional[int]]]:
+    """Join block lines with spaces, remembering where each line starts and its page"""
+    starts, line_pages = [], []
+    offset = 0
+    for line, page in lines:
+        starts.append(offset)
+        line_pages.append(page)
+        offset += len(line) + 1
+    return " ".join(line for line, _ in lines), starts, line_pages
+
+
+def _page_at(starts: List[int], line_pages: List[Optional[int]], offset: int) -> Optional[int]:
+    if not starts:
+        return None
+    return line_pages[max(bisect_right(starts, offset) - 1, 0)]
+
+
+def _iter_units(pages: Iterable[Tuple[Optional[int], str]],
+                counter: Callable[[str], int]) -> Iterator[Tuple[List[_Unit], int]]:
+    """Yield each paragraph as a list of sentence units plus its token total"""
+    carry = []
+    continuing = False
+    for kind, lines, complete in _iter_blocks(pages):
+        if kind == "heading":
+            text, page = lines[0]
+            yield [_Unit(text, counter(text), page, page, "\n\n", True)], 0
+            continue
+
+        if carry:
+            lines = carry + lines
+            carry = []
+
+        text, starts, line_pages = _join_lines(lines)
+        spans = _sentence_spans(text)
+        if not complete and spans and spans[-1][1] - spans[-1][0] <= _MAX_PARAGRAPH_CHARS:
+            # The paragraph continues; its last sentence may be unfinished.
+            # Carry it as (line piece, page) pairs so its pages survive.
+            begin, end = spans.pop()
+            for index, line_start in enumerate(starts):
+                line_end = line_start + len(lines[index][0])
+                if line_end > begin and line_start < end:
+                    carry.append((text[max(line_start, begin):min(line_end, end)],
+                                  line_pages[index]))
+
+        units = []
+        for i, (begin, end) in enumerate(spans):
+            if i > 0 or continuing:
+                separator = " "
+            else:
+                separator = "\n" if kind == "list_item" else "\n\n"
+            sentence = text[begin:end]
+            units.append(_Unit(sentence, counter(sentence),
+                               _page_at(starts, line_pages, begin),
+                               _page_at(starts, line_pages, end - 1), separator))
+        continuing = not complete
+        if units:
+            yield units, sum(unit.tokens for unit in units)
+
+
+def _join_units(units: List[_Unit]) -> str:
+    parts = [units[0].text]
+    for unit in units[1:]:
+        parts.append(unit.separator)
+        parts.append(unit.text)
+    return "".join(parts)
+
+
+def iter_chunks(pages: Iterable[Tuple[Optional[int], str]],
+                chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+                overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+                token_counter: Callable[[str], int] = count_tokens) -> Iterator[Tuple[str, Optional[int], Optional[int]]]:
+    """Yield (chunk, first_page, last_page) sized by token count.
+
+    Headings always start a new chunk, paragraphs are kept whole when they
+    fit, and consecutive chunks share up to overlap_tokens of trailing
+    sentences. Every sentence is tokenized exactly once, so the cost is
+    linear in the input size.
+    """
+    overlap_tokens = min(overlap_tokens, chunk_tokens // 2)
+    current: List[_Unit] = []
+    current_tokens = 0
+    has_new_content = False
+
+    def emit():
+        pages_seen = [unit.first_page for unit in current if unit.first_page is not None]
+        last_pages = [unit.last_page for unit in current if unit.last_page is not None]
+        return (_join_units(current),
+                min(pages_seen) if pages_seen else None,
+                max(last_pages) if last_pages else None)
+
+    def overlap_tail() -> List[_Unit]:
+        tail, tail_tokens = [], 0
+        for unit in reversed(current):
+            if unit.is_heading or tail_tokens + unit.tokens > overlap_tokens:
+                break
+            tail.insert(0, unit)
+            tail_tokens += unit.tokens
+        return tail
+
+    for paragraph, paragraph_tokens in _iter_units(pages, token_counter):
+        if paragraph[0].is_heading:
+            if current and has_new_content:
+                yield emit()
+            current, current_tokens, has_new_content = [], 0, False
+        elif (has_new_content and current_tokens + paragraph_tokens > chunk_tokens
+              and current_tokens >= chunk_tokens // 2):
+            # Start the paragraph in a fresh chunk rather than splitting it
+            yield emit()
+            current = overlap_tail()
+            current_tokens = sum(unit.tokens for unit in current)
+            has_new_content = False
+
+        for unit in paragraph:
+            pieces = [unit] if unit.tokens <= chunk_tokens else \
+                _split_long_unit(unit, chunk_tokens, token_counter)
+            for piece in pieces:
+                if current and current_tokens + piece.tokens > chunk_tokens:
+                    if has_new_content:
+                        yield emit()
+                    current = overlap_tail()
+                    current_tokens = sum(unit.tokens for unit in current)
+                    if current_tokens + piece.tokens > chunk_tokens:
+                        current, current_tokens = [], 0
+                    has_new_content = False
+                current.append(piece)
+                current_tokens += piece.tokens
+                has_new_content = True
+
+    if current and has_new_content:
+        yield emit()
+
+
+def split_text(text: str, chunk_tokens: int = DEFAULT_CHUNK_TOKENS,
+               overlap_tokens: int = DEFAULT_OVERLAP_TOKENS) -> List[str]:
+    return [chunk for chunk, _, _ in iter_chunks([(None, text)], chunk_tokens, overlap_tokens)]
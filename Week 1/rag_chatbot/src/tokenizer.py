@@ -0,0 +1,38 @@
+import os
+import re
+from functools import lru_cache
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Rough stand-in when tiktoken is unavailable: words and punctuation marks,
+# with long words counted per 8 characters so a run with no spaces still
+# grows with its length
+_APPROX_TOKEN_PATTERN = re.compile(r"\w{1,8}|[^\w\s]")
+
+
+@lru_cache(maxsize=None)
+def _get_encoding(encoding_name: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding(encoding_name)
+    except Exception as e:
+        # tiktoken downloads its BPE files on first use; stay usable offline
+        print(f"Warning: Could not load tokenizer {encoding_name} ({str(e)}). Using approximate counts.")
+        return None
+
+
+def count_tokens(text: str, encoding_name: str = None) -> int:
+    """Count tokens the way the chat model will see them"""
+    if not text:
+        return 0
+
+    encoding = _get_encoding(
+        encoding_name or os.getenv("TOKENIZER_ENCODING", "cl100k_base"))
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+
+    return len(_APPROX_TOKEN_PATTERN.findall(text))
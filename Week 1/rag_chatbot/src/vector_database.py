@@ -1,31 +1,244 @@
+import asyncio
+import os
+import re
 import chromadb
-from chromadb.utils import embedding_functions
-from typing import List, Tuple, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple, Dict, Any, Optional
+from .embedding_service import EmbeddingService
+from .flat_index import FlatCollection, FlatVectorClient
+from .lexical_index import BM25Index, reciprocal_rank_fusion
+
+DEFAULT_COLLECTION = "documents_collection"
+TENANT_PREFIX = "tenant_"
+_TENANT_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_-]{0,62}")
+_FILTER_PATTERN = re.compile(r"(\w+)(>=|<=|!=|>|<|=)(.+)")
+_FILTER_OPERATORS = {"=": "$eq", "!=": "$ne", ">": "$gt", ">=": "$gte", "<": "$lt", "<=": "$lte"}
+# Values ingestion stores lower-cased
+_LOWERCASE_FIELDS = ("department", "doc_type")
+
+
+def tenant_collection_name(tenant: Optional[str] = None) -> str:
+    if not tenant:
+        return os.getenv("COLLECTION_NAME", DEFAULT_COLLECTION)
+    if not _TENANT_PATTERN.fullmatch(tenant):
+        raise ValueError(f"Invalid tenant name: {tenant}")
+    return TENANT_PREFIX + tenant
+
+
+def create_vector_client(persist_directory: str):
+    """Storage client for VECTOR_BACKEND: "chroma" (HNSW, float32) or "flat" (quantized, memory-mapped)"""
+    backend = os.getenv("VECTOR_BACKEND", "chroma").lower()
+    if backend == "flat":
+        return FlatVectorClient(persist_directory)
+    if backend != "chroma":
+        raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+    return chromadb.PersistentClient(path=persist_directory)
+
+
+def parse_filters(expressions: List[str]) -> Optional[dict]:
+    """Build a Chroma where clause from expressions such as "department=it",
+    "doc_type=pdf", "date>=20240101" or "page<=3"."""
+    conditions = []
+    for expression in expressions:
+        match = _FILTER_PATTERN.fullmatch(expression.strip())
+        if not match:
+            raise ValueError(f"Invalid filter: {expression}")
+        key, operator, value = match.groups()
+        if value.lstrip('-').isdigit():
+            value = int(value)
+        elif key in _LOWERCASE_FIELDS:
+            value = value.lower()
+        conditions.append({key: {_FILTER_OPERATORS[operator]: value}})
+
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
 
 
 class VectorDatabase:
-    def __init__(self, persist_directory: str = "chroma_db"):
-        self.client = chromadb.PersistentClient(path=persist_directory)
+    def __init__(self, persist_directory: str = "chroma_db",
+                 embedding_service: Optional[EmbeddingService] = None,
+                 collection_name: Optional[str] = None, client=None):
+        self.persist_directory = persist_directory
+        self.client = client or create_vector_client(persist_directory)
+        self.collection_name = collection_name or tenant_collection_name()
 
-        self.sentence_transformer_ef = embedding_functions.SentenceTransformerEmbeddingFunction(
-            model_name="all-MiniLM-L6-v2"
+        # Embeddings are computed by the service and handed to Chroma
+        # precomputed, so the collection itself has no embedding function
+        self.embedder = embedding_service or EmbeddingService(
+            model_name="all-MiniLM-L6-v2",
+            cache_path=os.path.join(persist_directory, "embedding_cache.sqlite"),
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", "256")),
+            num_threads=int(os.getenv("EMBEDDING_THREADS", "0")) or None
         )
 
         self.collection = self.client.get_or_create_collection(
-            name="documents_collection",
-            embedding_function=self.sentence_transformer_ef
+            name=self.collection_name,
+            embedding_function=None
         )
 
+        # "hybrid" fuses dense and BM25 rankings; "dense" is vector search only
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hybrid").lower()
+        self.hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", "20"))
+        self.rrf_k = int(os.getenv("RRF_K", "60"))
+        self.lexical_index = BM25Index(
+            os.path.join(persist_directory, "bm25_index", self.collection_name))
+        self._sync_lexical_index()
+
+    def for_tenant(self, tenant: str) -> "VectorDatabase":
+        """A database over the tenant's own collection, sharing the client and embedder"""
+        return VectorDatabase(self.persist_directory, self.embedder,
+                              tenant_collection_name(tenant), self.client)
+
+    def list_tenants(self) -> List[str]:
+        names = [collection.name for collection in self.client.list_collections()]
+        return sorted(name[len(TENANT_PREFIX):] for name in names if name.startswith(TENANT_PREFIX))
+
+    def _sync_lexical_index(self):
+        """Rebuild the BM25 index if it does not match the collection (new index or a crash)"""
+        total = self.collection.count()
+        if self.lexical_index.count() == total:
+            return
+
+        print(f"Building lexical index for {total} chunks...")
+        self.lexical_index.rebuild(self._iter_documents())
+
+    def _iter_documents(self, page_size: int = 5000):
+        offset = 0
+        while True:
+            page = self.collection.get(include=["documents"], limit=page_size, offset=offset)
+            if not page['ids']:
+                return
+            yield from zip(page['ids'], page['documents'])
+            offset += len(page['ids'])
+
     def get_collection(self):
         return self.collection
 
-    def semantic_search(self, query: str, n_results: int = 3) -> Dict[str, Any]:
+    def upsert(self, ids: List[str], documents: List[str], metadatas: List[dict],
+               embeddings: Optional[List[List[float]]] = None):
+        if embeddings is None:
+            embeddings = self.embedder.embed(documents)
+        self.collection.upsert(
+            ids=ids,
+            documents=documents,
+            metadatas=metadatas,
+            embeddings=embeddings
+        )
+        self.lexical_index.add(ids, documents)
+
+    def update(self, ids: List[str], metadatas: List[dict]):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids: List[str]):
+        self.collection.delete(ids=ids)
+        self.lexical_index.delete(ids)
+
+    def commit(self):
+        """Persist index state that is buffered between writes"""
+        self.lexical_index.commit()
+
+    def get_ids(self, where: Optional[dict] = None) -> List[str]:
+        return self.collection.get(where=where, include=[])['ids']
+
+    def semantic_search(self, query: str, n_results: int = 3,
+                        query_embedding: Optional[List[float]] = None,
+                        where: Optional[dict] = None) -> Dict[str, Any]:
+        if query_embedding is None:
+            query_embedding = self.embedder.embed_query(query)
         results = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where
         )
         return results
 
+    def search(self, query: str, n_results: int = 3,
+               query_embedding: Optional[List[float]] = None,
+               where: Optional[dict] = None) -> Dict[str, Any]:
+        """Retrieve with the configured RETRIEVAL_MODE, optionally filtered by metadata"""
+        if self.retrieval_mode == "hybrid":
+            return self.hybrid_search(query, n_results, query_embedding, where)
+        return self.semantic_search(query, n_results, query_embedding, where)
+
+    def lexical_search(self, query: str, n_results: int = 3,
+                       where: Optional[dict] = None) -> List[Tuple[str, float]]:
+        if where is None:
+            return self.lexical_index.search(query, n_results)
+
+        # The BM25 index holds no metadata: over-fetch, then keep matching chunks
+        hits = self.lexical_index.search(query, n_results * 4)
+        if not hits:
+            return []
+        allowed = set(self.collection.get(
+            ids=[id_ for id_, _ in hits], where=where, include=[])['ids'])
+        return [(id_, score) for id_, score in hits if id_ in allowed][:n_results]
+
+    def hybrid_search(self, query: str, n_results: int = 3,
+                      query_embedding: Optional[List[float]] = None,
+                      where: Optional[dict] = None) -> Dict[str, Any]:
+        """Fuse dense and BM25 rankings with reciprocal-rank fusion.
+
+        Returns the same shape as semantic_search, plus "scores" (fused
+        scores); distances are None for chunks only the lexical side found.
+        """
+        candidates = max(self.hybrid_candidates, n_results)
+        dense = self.semantic_search(query, candidates, query_embedding, where)
+        return self._fuse(query, dense, n_results, where)
+
+    def _fuse(self, query: str, dense: Dict[str, Any], n_results: int,
+              where: Optional[dict] = None) -> Dict[str, Any]:
+        candidates = max(self.hybrid_candidates, n_results)
+        lexical = self.lexical_search(query, candidates, where)
+        fused = reciprocal_rank_fusion(
+            [dense['ids'][0], [id_ for id_, _ in lexical]], self.rrf_k)[:n_results]
+
+        found = {
+            id_: (document, metadata, distance)
+            for id_, document, metadata, distance in zip(
+                dense['ids'][0], dense['documents'][0],
+                dense['metadatas'][0], dense['distances'][0])
+        }
+        missing = [id_ for id_, _ in fused if id_ not in found]
+        if missing:
+            extra = self.collection.get(ids=missing, include=["documents", "metadatas"])
+            for id_, document, metadata in zip(extra['ids'], extra['documents'], extra['metadatas']):
+                found[id_] = (document, metadata, None)
+
+        # A chunk deleted from Chroma but still buffered in the index is skipped
+        fused = [(id_, score) for id_, score in fused if id_ in found]
+        return {
+            "ids": [[id_ for id_, _ in fused]],
+            "documents": [[found[id_][0] for id_, _ in fused]],
+            "metadatas": [[found[id_][1] for id_, _ in fused]],
+            "distances": [[found[id_][2] for id_, _ in fused]],
+            "scores": [[score for _, score in fused]]
+        }
+
+    def search_batch(self, queries: List[str], n_results: int = 3,
+                     query_embeddings: Optional[List[List[float]]] = None,
+                     where: Optional[dict] = None) -> List[Dict[str, Any]]:
+        """Retrieve for many queries with a single dense query; one search()-shaped result per query"""
+        if not queries:
+            return []
+        if query_embeddings is None:
+            query_embeddings = self.embedder.embed_queries(queries)
+
+        hybrid = self.retrieval_mode == "hybrid"
+        dense = self.collection.query(
+            query_embeddings=query_embeddings,
+            n_results=max(self.hybrid_candidates, n_results) if hybrid else n_results,
+            where=where
+        )
+        per_query = [
+            {key: [dense[key][i]] for key in ("ids", "documents", "metadatas", "distances")}
+            for i in range(len(queries))
+        ]
+        if not hybrid:
+            return per_query
+        return [self._fuse(query, results, n_results, where)
+                for query, results in zip(queries, per_query)]
+
     def get_context_with_sources(self, results: Dict[str, Any]) -> Tuple[str, List[str]]:
         context = "\n\n".join(results['documents'][0])
 
@@ -47,21 +260,31 @@ class VectorDatabase:
             print(f"\nResult {i + 1}")
             print(f"Source: {meta['source']}, Chunk {meta['chunk']}")
             print(f"Distance: {distance}")
+            if 'scores' in results:
+                print(f"Fused score: {results['scores'][0][i]:.4f}")
             print(f"Content: {doc}\n")
 
     def get_collection_info(self) -> Dict[str, Any]:
         try:
             count = self.collection.count()
-            return {
+            info = {
                 "total_documents": count,
-                "collection_name": self.collection.name
+                "collection_name": self.collection.name,
+                "retrieval_mode": self.retrieval_mode,
+                "lexical_index_documents": self.lexical_index.count(),
+                "embedding_cache": self.embedder.get_stats()
             }
+            if isinstance(self.collection, FlatCollection):
+                info["flat_index"] = dict(self.collection.memory_usage(),
+                                          quantization=self.collection.quantization,
+                                          rescore=self.collection.rescore)
+            return info
         except Exception as e:
             return {"error": str(e)}
 
     def delete_collection(self):
         try:
-            self.client.delete_collection(name="documents_collection")
+            self.client.delete_collection(name=self.collection_name)
             print("Collection deleted successfully")
         except Exception as e:
             print(f"Error deleting collection: {str(e)}")
@@ -70,9 +293,53 @@ class VectorDatabase:
         try:
             self.delete_collection()
             self.collection = self.client.get_or_create_collection(
-                name="documents_collection",
-                embedding_function=self.sentence_transformer_ef
+                name=self.collection_name,
+                embedding_function=None
             )
+            self.lexical_index.clear()
             print("Collection reset successfully")
         except Exception as e:
             print(f"Error resetting collection: {str(e)}")
+
+
+class AsyncVectorDatabase:
+    """Awaitable query side of a VectorDatabase.
+
+    Chroma and the embedding model are blocking, so calls run on a bounded
+    thread pool; the event loop stays free to drive LLM calls meanwhile.
+    """
+
+    def __init__(self, vector_db: VectorDatabase, max_workers: Optional[int] = None,
+                 executor: Optional[ThreadPoolExecutor] = None):
+        self.vector_db = vector_db
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=max_workers or int(os.getenv("SEARCH_THREADS", "8")),
+            thread_name_prefix="vector-search")
+
+    def for_database(self, vector_db: VectorDatabase) -> "AsyncVectorDatabase":
+        """Wrap another database (e.g. a tenant's) on the same thread pool"""
+        return AsyncVectorDatabase(vector_db, executor=self.executor)
+
+    async def _run(self, func, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, func, *args)
+
+    async def embed_query(self, query: str) -> List[float]:
+        return await self._run(self.vector_db.embedder.embed_query, query)
+
+    async def semantic_search(self, query: str, n_results: int = 3,
+                              query_embedding: Optional[List[float]] = None,
+                              where: Optional[dict] = None) -> Dict[str, Any]:
+        return await self._run(self.vector_db.semantic_search, query, n_results,
+                               query_embedding, where)
+
+    async def search(self, query: str, n_results: int = 3,
+                     query_embedding: Optional[List[float]] = None,
+                     where: Optional[dict] = None) -> Dict[str, Any]:
+        return await self._run(self.vector_db.search, query, n_results, query_embedding, where)
+
+    def get_context_with_sources(self, results: Dict[str, Any]) -> Tuple[str, List[str]]:
+        return self.vector_db.get_context_with_sources(results)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
@@ -1,6 +1,7 @@
 import streamlit as st
 import os
 import time
+from src.ingestion_job import format_progress
 from src.rag_chatbot import RAGChatbot
 from dotenv import load_dotenv
 
@@ -22,44 +23,73 @@ if 'messages' not in st.session_state:
 if 'initialized' not in st.session_state:
     st.session_state.initialized = False
 
+@st.cache_resource(show_spinner=False)
+def get_chatbot():
+    """One chatbot per server process, shared by every browser session"""
+    chatbot = RAGChatbot()
+    # Load the embedding model while the first user is still reading the page
+    chatbot.warmup(background=True)
+    return chatbot
+
 def initialize_chatbot():
     try:
-        progress_container = st.container()
-        with progress_container:
-            st.info("🚀 Initializing your AI Knowledge Assistant...")
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            steps = [
-                (20, "📶 Connecting to Azure OpenAI..."),
-                (40, "📚 Loading vector database..."),
-                (60, "🧠 Initializing AI models..."),
-                (80, "⚡ Setting up conversation memory..."),
-                (100, "✨ Finalizing setup...")
-            ]
-            
-            for progress, message in steps:
-                progress_bar.progress(progress)
-                status_text.text(message)
-                time.sleep(0.3)
-            
-            chatbot = RAGChatbot()
+        start_time = time.perf_counter()
+        with st.spinner("🚀 Initializing your AI Knowledge Assistant..."):
+            chatbot = get_chatbot()
             session_id = chatbot.create_session()
-            st.session_state.chatbot = chatbot
-            st.session_state.session_id = session_id
-            st.session_state.initialized = True
-            
-            progress_container.empty()
-            
-            st.success("🎉 AI Knowledge Assistant is ready to help you!")
-            st.balloons()
-            return True
-            
+        st.session_state.chatbot = chatbot
+        st.session_state.session_id = session_id
+        st.session_state.init_seconds = time.perf_counter() - start_time
+        st.session_state.initialized = True
+
+        st.success("🎉 AI Knowledge Assistant is ready to help you!")
+        st.balloons()
+        return True
+
     except Exception as e:
         st.error(f"❌ Failed to initialize: {str(e)}")
         st.error("Please check your Azure OpenAI configuration in the .env file")
         return False
 
+def display_startup_metrics():
+    startup = st.session_state.chatbot.get_startup_metrics()
+    st.markdown("### Startup")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.metric("🧊 Cold start", f"{startup['init_seconds']:.2f}s")
+    with col2:
+        st.metric("👤 This session", f"{st.session_state.init_seconds:.2f}s")
+    loaded = [
+        (label, startup[key]) for label, key in (
+            ("Vector database", "vector_db_seconds"),
+            ("Embedding model", "embedding_model_seconds"),
+            ("Azure OpenAI client", "openai_client_seconds"))
+        if key in startup
+    ]
+    for label, seconds in loaded:
+        st.caption(f"{label} loaded in {seconds:.2f}s")
+    if startup["connection_ok"] is None:
+        st.caption("Azure OpenAI health check pending")
+    elif not startup["connection_ok"]:
+        st.warning("Azure OpenAI health check failed - check your configuration")
+
+def display_latency_panel():
+    stats = st.session_state.chatbot.get_trace_stats()
+    st.markdown("### Latency")
+    if not stats["stages"]:
+        st.caption("No queries yet")
+        return
+    # The chatbot is shared, so these cover every session of this server
+    st.dataframe(
+        [{"Stage": stage, "Count": row["count"], "Errors": row["errors"],
+          "p50 ms": round(row["p50_ms"], 1), "p95 ms": round(row["p95_ms"], 1)}
+         for stage, row in stats["stages"].items()],
+        hide_index=True, use_container_width=True)
+    tokens = stats["tokens"]
+    st.caption(f"Tokens: {tokens['prompt_tokens']} prompt · {tokens['completion_tokens']} completion")
+    for error in stats["errors"]:
+        st.caption(f"❌ {error['count']}× {error['type']} in {error['stage'] or 'n/a'}")
+
 def display_welcome_header():
     st.markdown("# 🧠 AI Knowledge Assistant")
     st.markdown("### Your intelligent document companion powered by Azure OpenAI")
@@ -116,6 +146,8 @@ def display_sidebar():
             else:
                 st.success("✅ **Assistant Ready**")
                 st.write("Your AI assistant is active and ready")
+                display_startup_metrics()
+                display_latency_panel()
         
         with tab2:
             if st.session_state.initialized:
@@ -138,11 +170,17 @@ def display_sidebar():
                 st.markdown("### Upload Documents")
                 uploaded_files = st.file_uploader(
                     "Choose files to add to knowledge base",
-                    type=['pdf', 'docx', 'txt'],
+                    type=['pdf', 'docx', 'txt', 'md'],
                     accept_multiple_files=True,
-                    help="Supported formats: PDF, DOCX, TXT"
+                    help="Supported formats: PDF, DOCX, TXT, MD"
                 )
                 
+                # Uploads go through a scratch folder, so its name is not a department
+                upload_department = st.text_input(
+                    "Department (optional)",
+                    help="Tag uploaded documents for department=... filters; leave empty for no tag"
+                )
+
                 if uploaded_files:
                     st.info(f"📁 {len(uploaded_files)} file(s) selected")
                     
@@ -159,15 +197,36 @@ def display_sidebar():
                             
                             # Add documents to knowledge base
                             try:
-                                st.session_state.chatbot.add_documents(temp_dir)
-                                st.success(f"✅ Added {len(uploaded_files)} documents!")
-                                st.rerun()
+                                progress_bar = st.progress(0.0)
+
+                                def show_progress(snapshot):
+                                    total = snapshot["files_total"] or 1
+                                    progress_bar.progress(min(snapshot["files_done"] / total, 1.0),
+                                                          text=format_progress(snapshot))
+
+                                # Uploads are one-off batches; keep earlier uploads in the index
+                                stats = st.session_state.chatbot.add_documents(
+                                    temp_dir, purge_missing=False, department=upload_department,
+                                    progress_callback=show_progress)
+                                st.session_state.last_ingest_stats = stats
                                 
                                 # Clean up temp files
                                 import shutil
                                 shutil.rmtree(temp_dir)
+                                
+                                st.success(f"✅ Added {len(uploaded_files)} documents!")
+                                st.rerun()
                             except Exception as e:
                                 st.error(f"❌ Error: {str(e)}")
+                
+                # Throughput of the most recent upload
+                stats = st.session_state.get("last_ingest_stats")
+                if stats:
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        st.metric("📥 Files/sec", f"{stats['files_per_sec']:.1f}")
+                    with col2:
+                        st.metric("🧩 Chunks/sec", f"{stats['chunks_per_sec']:.1f}")
             else:
                 st.info("Initialize the assistant first to manage documents")
         
@@ -215,6 +274,18 @@ def display_sidebar():
         
         return True
 
+def format_turn_metrics(metrics):
+    rewrite = metrics.get("rewrite", "n/a")
+    if not metrics.get("rewrite_llm_call"):
+        rewrite += ", LLM call avoided"
+    timing = ""
+    if "ttft_seconds" in metrics:
+        timing = f"First token {metrics['ttft_seconds']:.2f}s · Total {metrics['total_seconds']:.2f}s · "
+    history = f" · History: {metrics['history_tokens']} tokens" if "history_tokens" in metrics else ""
+    if "rerank" in metrics:
+        history += f" · Rerank: {metrics['rerank']}"
+    return f"⏱️ {timing}Query rewrite: {rewrite} · Response cache: {metrics.get('response_cache', 'n/a')}{history}"
+
 def display_chat_interface():
     """Display the main chat interface"""
     if not st.session_state.initialized:
@@ -245,6 +316,9 @@ def display_chat_interface():
                     with st.expander("📚 **View Sources**", expanded=False):
                         for j, source in enumerate(message["sources"], 1):
                             st.markdown(f"**{j}.** `{source}`")
+                
+                if message.get("metrics"):
+                    st.caption(format_turn_metrics(message["metrics"]))
     
     # Chat input
     if prompt := st.chat_input("📄 Ask me anything about your documents...", key="chat_input"):
@@ -257,36 +331,51 @@ def display_chat_interface():
         
         # Generate and display assistant response
         with st.chat_message("assistant"):
-            with st.spinner("🤔 Thinking..."):
-                try:
-                    response, sources = st.session_state.chatbot.query(
+            try:
+                sources = []
+                
+                def stream_tokens():
+                    nonlocal sources
+                    events = st.session_state.chatbot.query_stream(
                         prompt, 
                         st.session_state.session_id
                     )
-                    
-                    # Display the response
-                    st.markdown(response)
-                    
-                    # Display sources if available
-                    if sources:
-                        with st.expander("📚 **View Sources**", expanded=False):
-                            for j, source in enumerate(sources, 1):
-                                st.markdown(f"**{j}.** `{source}`")
-                    
-                    # Add assistant response to chat history
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": response,
-                        "sources": sources
-                    })
-                    
-                except Exception as e:
-                    error_msg = f"❌ I encountered an error: {str(e)}"
-                    st.error(error_msg)
-                    st.session_state.messages.append({
-                        "role": "assistant", 
-                        "content": error_msg
-                    })
+                    for kind, value in events:
+                        if kind == "token":
+                            yield value
+                        else:
+                            sources = value
+                
+                # Render the response as it is generated
+                response = st.write_stream(stream_tokens())
+                
+                # Display sources if available
+                if sources:
+                    with st.expander("📚 **View Sources**", expanded=False):
+                        for j, source in enumerate(sources, 1):
+                            st.markdown(f"**{j}.** `{source}`")
+                
+                metrics = st.session_state.chatbot.get_turn_metrics(st.session_state.session_id)
+                if metrics:
+                    st.caption(format_turn_metrics(metrics))
+                
+                # Add assistant response to chat history
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": response,
+                    "sources": sources,
+                    "metrics": metrics
+                })
+                
+            except Exception as e:
+                error = st.session_state.chatbot.get_turn_metrics(st.session_state.session_id).get("error")
+                stage = f" during {error['stage']}" if error and error["stage"] else ""
+                error_msg = f"❌ I encountered an error{stage}: {type(e).__name__}: {str(e)}"
+                st.error(error_msg)
+                st.session_state.messages.append({
+                    "role": "assistant", 
+                    "content": error_msg
+                })
 
 def main():
     """Main application function"""
@@ -1,6 +1,8 @@
 import streamlit as st
 from datetime import datetime
 from main import create_support_system, run_query
+from config import Config
+from tools.summary_cache import get_summary_cache
 import os
 from dotenv import load_dotenv
 
@@ -106,6 +108,15 @@ def display_sidebar_stats():
             help="Internal documentation files"
         )
 
+    if Config.READ_FILE_SUMMARIZE and get_summary_cache() is not None:
+        cache_stats = get_summary_cache().get_stats()
+        st.sidebar.metric(
+            label="🗂️ Summary Cache Hits",
+            value=f"{cache_stats['hit_rate']:.0%}",
+            help=f"{cache_stats['llm_calls_saved']} LLM calls saved over {cache_stats['lookups']} lookups, "
+                 f"{cache_stats['entries']} summaries cached"
+        )
+
     if st.session_state.get('system_initialized', False):
         st.sidebar.success("🟢 **System Online**")
     else:
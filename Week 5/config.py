@@ -1,6 +1,7 @@
 import os
+from typing import Optional
 from dotenv import load_dotenv
-from langchain_openai import AzureChatOpenAI
+from langchain_openai import AzureChatOpenAI, AzureOpenAIEmbeddings
 
 load_dotenv()
 
@@ -20,6 +21,31 @@ class Config:
     MAX_FILE_SIZE_MB = 10
     SUPPORTED_FILE_TYPES = ['.txt', '.md', '.pdf']
 
+    # Web search results and their LLM analysis are cached in memory
+    WEB_SEARCH_CACHE_TTL_SECONDS = float(os.getenv("WEB_SEARCH_CACHE_TTL_SECONDS", "900"))
+    WEB_ANALYSIS_CACHE_TTL_SECONDS = float(os.getenv("WEB_ANALYSIS_CACHE_TTL_SECONDS", "3600"))
+    WEB_SEARCH_CACHE_MAX_ENTRIES = 256
+
+    # Document index used by the read_file tools
+    INDEX_REFRESH_SECONDS = float(os.getenv("INDEX_REFRESH_SECONDS", "5"))
+    INDEX_SECTION_WORDS = 200
+
+    # read_file returns the best-matching sections verbatim within this budget
+    READ_FILE_TOKEN_BUDGET = int(os.getenv("READ_FILE_TOKEN_BUDGET", "1200"))
+    READ_FILE_MAX_SECTIONS = 8
+    # Optionally condense the selected sections with one LLM call per file
+    READ_FILE_SUMMARIZE = os.getenv("READ_FILE_SUMMARIZE", "false").lower() in ("1", "true", "yes")
+    # Files are summarized concurrently; slower summaries are replaced by the raw sections
+    READ_FILE_SUMMARY_WORKERS = 4
+    READ_FILE_SUMMARY_TIMEOUT = float(os.getenv("READ_FILE_SUMMARY_TIMEOUT", "20"))
+
+    # Summaries are cached per (file content, query); empty path disables the cache
+    SUMMARY_CACHE_PATH = os.getenv("SUMMARY_CACHE_PATH", ".cache/summaries.db")
+    SUMMARY_CACHE_MAX_ENTRIES = int(os.getenv("SUMMARY_CACHE_MAX_ENTRIES", "1000"))
+    # Without an embedding deployment a summary is only reused for the same in-file query terms
+    SUMMARY_CACHE_EMBEDDING_SIMILARITY = 0.9
+    AZURE_OPENAI_EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT")
+
 
 def get_azure_model(temperature: float = 0.1) -> AzureChatOpenAI:
     """Create an Azure OpenAI model instance"""
@@ -34,3 +60,16 @@ def get_azure_model(temperature: float = 0.1) -> AzureChatOpenAI:
         azure_deployment=Config.AZURE_OPENAI_DEPLOYMENT_NAME,
         temperature=temperature
     )
+
+
+def get_azure_embeddings() -> Optional[AzureOpenAIEmbeddings]:
+    """Embedding model for comparing queries, or None if no deployment is configured"""
+    if not Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT:
+        return None
+
+    return AzureOpenAIEmbeddings(
+        azure_endpoint=Config.AZURE_OPENAI_ENDPOINT,
+        api_key=Config.AZURE_OPENAI_API_KEY,
+        api_version=Config.AZURE_OPENAI_API_VERSION,
+        azure_deployment=Config.AZURE_OPENAI_EMBEDDING_DEPLOYMENT
+    )
@@ -0,0 +1,263 @@
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from config import Config
+
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.+?)\s*#*\s*$")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "does", "for", "from",
+    "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "the", "to",
+    "what", "when", "where", "which", "who", "with", "you", "your"
+}
+
+# BM25 parameters
+K1 = 1.5
+B = 0.75
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords"""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough LLM token count (about four characters per token for English)"""
+    return max(1, len(text) // 4)
+
+
+class Section:
+    """A heading-delimited part of a document"""
+
+    def __init__(self, file_path: Path, title: str, text: str, position: int):
+        self.file_path = file_path
+        self.title = title
+        self.text = text
+        self.position = position
+        self.term_counts = Counter(tokenize(f"{title}\n{text}"))
+        self.length = sum(self.term_counts.values())
+
+    def truncated(self, max_tokens: int) -> "Section":
+        return Section(self.file_path, self.title, self.text[:max_tokens * 4].rstrip() + " ...",
+                       self.position)
+
+
+def pack_sections(sections: List[Section], token_budget: int) -> List[Section]:
+    """Keep sections in order while they fit the budget.
+
+    A section that does not fit is skipped so a smaller one after it can
+    still be used; if not even the first fits, it is cut to the budget.
+    """
+    packed, used = [], 0
+    for section in sections:
+        tokens = estimate_tokens(section.text)
+        if used + tokens > token_budget:
+            if not packed:
+                packed.append(section.truncated(token_budget))
+                used = token_budget
+            continue
+        packed.append(section)
+        used += tokens
+    return packed
+
+
+class IndexedFile:
+    """Parsed text and sections of one file, with the stat they were parsed at"""
+
+    def __init__(self, path: Path, mtime: float, size: int, text: str, sections: List[Section],
+                 error: Optional[str] = None):
+        self.path = path
+        self.mtime = mtime
+        self.size = size
+        self.text = text
+        self.sections = sections
+        self.error = error
+        self.content_hash = hashlib.sha256(text.encode("utf-8", "replace")).hexdigest()
+
+    @property
+    def vocabulary(self):
+        return {term for section in self.sections for term in section.term_counts}
+
+
+def split_sections(file_path: Path, text: str) -> List[Section]:
+    """Split Markdown at headings, keeping the heading path as the section title.
+
+    Text without headings (plain text, PDFs) is split at blank lines into
+    sections of about Config.INDEX_SECTION_WORDS words.
+    """
+    lines = text.splitlines()
+    if not any(HEADING_PATTERN.match(line) for line in lines):
+        return _split_paragraphs(file_path, text)
+
+    sections = []
+    headings = []
+    body = []
+
+    def flush():
+        content = "\n".join(body).strip()
+        if content:
+            title = " > ".join(heading for _, heading in headings) or file_path.stem
+            sections.append(Section(file_path, title, content, len(sections)))
+
+    for line in lines:
+        match = HEADING_PATTERN.match(line)
+        if match:
+            flush()
+            body = []
+            level = len(match.group(1))
+            headings = [(lvl, heading) for lvl, heading in headings if lvl < level]
+            headings.append((level, match.group(2)))
+        else:
+            body.append(line)
+    flush()
+    return sections
+
+
+def _split_paragraphs(file_path: Path, text: str) -> List[Section]:
+    sections = []
+    paragraphs = [paragraph.strip() for paragraph in re.split(r"\n\s*\n", text) if paragraph.strip()]
+    current, words = [], 0
+    for paragraph in paragraphs:
+        current.append(paragraph)
+        words += len(paragraph.split())
+        if words >= Config.INDEX_SECTION_WORDS:
+            sections.append(Section(file_path, file_path.stem, "\n\n".join(current), len(sections)))
+            current, words = [], 0
+    if current:
+        sections.append(Section(file_path, file_path.stem, "\n\n".join(current), len(sections)))
+    return sections
+
+
+class DocumentIndex:
+    """In-memory index of the documentation files under one folder.
+
+    Every supported file is parsed once and split into sections, which are
+    scored with BM25 over their headings and content. The folder is
+    rescanned at most every Config.INDEX_REFRESH_SECONDS; only files whose
+    mtime or size changed are parsed again, and removed files are dropped.
+    Between rescans a lookup does no filesystem work at all.
+    """
+
+    def __init__(self, base_path: Path, read_file: Callable[[Path], Tuple[str, Optional[str]]],
+                 refresh_seconds: Optional[float] = None):
+        self.base_path = Path(base_path)
+        self.read_file = read_file
+        self.refresh_seconds = Config.INDEX_REFRESH_SECONDS if refresh_seconds is None else refresh_seconds
+        self.files: Dict[Path, IndexedFile] = {}
+        self.sections: List[Section] = []
+        self._postings: Dict[str, List[Tuple[int, int]]] = {}
+        self._average_length = 0.0
+        self._last_refresh = None
+        self._lock = threading.Lock()
+        self.stats = {"refreshes": 0, "files_parsed": 0, "files_removed": 0}
+
+    def _scan(self) -> Dict[Path, os.stat_result]:
+        found = {}
+        for root, _, names in os.walk(self.base_path):
+            for name in names:
+                path = Path(root) / name
+                if path.suffix.lower() in Config.SUPPORTED_FILE_TYPES:
+                    found[path] = path.stat()
+        return found
+
+    def refresh(self, force: bool = False) -> bool:
+        """Re-parse changed files; returns True if the index changed"""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None \
+                    and now - self._last_refresh < self.refresh_seconds:
+                return False
+            self._last_refresh = now
+            self.stats["refreshes"] += 1
+
+            current = self._scan()
+            changed = False
+            for path in set(self.files).difference(current):
+                del self.files[path]
+                self.stats["files_removed"] += 1
+                changed = True
+            for path, stat in current.items():
+                indexed = self.files.get(path)
+                if indexed is not None and indexed.mtime == stat.st_mtime and indexed.size == stat.st_size:
+                    continue
+                text, error = self.read_file(path)
+                sections = split_sections(path, text) if error is None else []
+                self.files[path] = IndexedFile(path, stat.st_mtime, stat.st_size, text, sections, error)
+                self.stats["files_parsed"] += 1
+                changed = True
+            if changed:
+                self._build()
+            return changed
+
+    def _build(self):
+        self.sections = [section for path in sorted(self.files) for section in self.files[path].sections]
+        postings = {}
+        for i, section in enumerate(self.sections):
+            for term, count in section.term_counts.items():
+                postings.setdefault(term, []).append((i, count))
+        self._postings = postings
+        self._average_length = (sum(section.length for section in self.sections) / len(self.sections)
+                                if self.sections else 0.0)
+
+    def _score(self, query: str) -> Dict[int, float]:
+        scores = {}
+        total = len(self.sections)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for i, count in postings:
+                length_norm = 1 - B + B * self.sections[i].length / self._average_length
+                scores[i] = scores.get(i, 0.0) + idf * count * (K1 + 1) / (count + K1 * length_norm)
+        return scores
+
+    def search_sections(self, query: str, k: int = 5,
+                        file_path: Optional[Path] = None) -> List[Tuple[Section, float]]:
+        """The k sections that best match the query, best first, optionally from one file"""
+        self.refresh()
+        with self._lock:
+            scores = self._score(query)
+            if file_path is not None:
+                scores = {i: score for i, score in scores.items()
+                          if self.sections[i].file_path == Path(file_path)}
+            ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [(self.sections[i], score) for i, score in ranked]
+
+    def search_files(self, query: str, max_files: int = 5) -> List[Path]:
+        """Files ranked by their best-matching section.
+
+        If nothing in the content matches, all readable files are returned
+        in name order, up to max_files, so the caller still has something to read.
+        """
+        self.refresh()
+        with self._lock:
+            best = {}
+            for i, score in self._score(query).items():
+                path = self.sections[i].file_path
+                best[path] = max(best.get(path, 0.0), score)
+            ranked = sorted(best, key=lambda path: best[path], reverse=True)
+            if not ranked:
+                ranked = sorted(path for path, indexed in self.files.items() if indexed.error is None)
+            return ranked[:max_files]
+
+    def list_files(self) -> List[IndexedFile]:
+        """Readable files, in name order"""
+        self.refresh()
+        with self._lock:
+            return [self.files[path] for path in sorted(self.files) if self.files[path].error is None]
+
+    def get(self, path: Path) -> Optional[IndexedFile]:
+        self.refresh()
+        with self._lock:
+            return self.files.get(Path(path))
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, files=len(self.files), sections=len(self.sections))
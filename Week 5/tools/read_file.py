@@ -1,9 +1,12 @@
-import glob
-from typing import List, Optional
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import List, Optional, Tuple
 from pathlib import Path
 import PyPDF2
 from langchain_core.tools import tool
 from config import get_azure_model, Config
+from tools.document_index import DocumentIndex, Section, pack_sections, split_sections
+from tools.summary_cache import get_summary_cache
 
 
 class ReadFileTool:
@@ -12,6 +15,15 @@ class ReadFileTool:
     def __init__(self, base_path: str):
         self.base_path = Path(base_path)
         self.llm = get_azure_model()
+        # Parsed once at startup; later calls only re-parse files that changed on disk
+        self.index = DocumentIndex(self.base_path, self._parse_file)
+        self.index.refresh(force=True)
+        # Summaries of different files run side by side when READ_FILE_SUMMARIZE is on
+        self.executor = ThreadPoolExecutor(max_workers=Config.READ_FILE_SUMMARY_WORKERS,
+                                           thread_name_prefix="read-file-summary")
+        self.stats = {"summaries": 0, "summary_timeouts": 0}
+        # Shared by all read_file tools and persisted across runs
+        self.summary_cache = get_summary_cache() if Config.READ_FILE_SUMMARIZE else None
 
     def _read_text_file(self, file_path: Path) -> str:
         """Read a text file"""
@@ -25,56 +37,129 @@ class ReadFileTool:
 
     def _read_pdf_file(self, file_path: Path) -> str:
         """Read a PDF file"""
-        try:
-            with open(file_path, 'rb') as f:
-                pdf_reader = PyPDF2.PdfReader(f)
-                text = ""
-                for page in pdf_reader.pages:
-                    text += page.extract_text() + "\n"
-                return text
-        except Exception as e:
-            return f"Error reading PDF file: {str(e)}"
-
-    def _read_file_content(self, file_path: Path) -> str:
-        """Read file content based on file type"""
+        with open(file_path, 'rb') as f:
+            pdf_reader = PyPDF2.PdfReader(f)
+            text = ""
+            for page in pdf_reader.pages:
+                text += page.extract_text() + "\n"
+            return text
+
+    def _parse_file(self, file_path: Path) -> Tuple[str, Optional[str]]:
+        """Return (text, error); error is None when the file was read"""
         if not file_path.exists():
-            return f"File not found: {file_path}"
+            return "", f"File not found: {file_path}"
 
         file_size_mb = file_path.stat().st_size / (1024 * 1024)
         if file_size_mb > Config.MAX_FILE_SIZE_MB:
-            return f"File too large: {file_size_mb:.1f}MB (max: {Config.MAX_FILE_SIZE_MB}MB)"
+            return "", f"File too large: {file_size_mb:.1f}MB (max: {Config.MAX_FILE_SIZE_MB}MB)"
 
         file_extension = file_path.suffix.lower()
 
-        if file_extension == '.pdf':
-            return self._read_pdf_file(file_path)
-        elif file_extension in ['.txt', '.md']:
-            return self._read_text_file(file_path)
-        else:
-            return f"Unsupported file type: {file_extension}"
-
-    def _find_relevant_files(self, query: str, max_files: int = 5) -> List[Path]:
-        """Find files that might be relevant to the query"""
-        all_files = []
-
-        for ext in Config.SUPPORTED_FILE_TYPES:
-            pattern = str(self.base_path / f"**/*{ext}")
-            files = glob.glob(pattern, recursive=True)
-            all_files.extend([Path(f) for f in files])
-
-        if not all_files:
-            return []
-
-        query_words = query.lower().split()
-        scored_files = []
+        try:
+            if file_extension == '.pdf':
+                return self._read_pdf_file(file_path), None
+            elif file_extension in ['.txt', '.md']:
+                return self._read_text_file(file_path), None
+        except Exception as e:
+            return "", f"Error reading {file_extension.lstrip('.').upper()} file: {str(e)}"
+        return "", f"Unsupported file type: {file_extension}"
 
-        for file_path in all_files:
-            filename = file_path.name.lower()
-            score = sum(1 for word in query_words if word in filename)
-            scored_files.append((score, file_path))
+    def _get_text(self, file_path: Path) -> Tuple[str, Optional[str]]:
+        """(text, error) for a file, from the index when the file is in it"""
+        indexed = self.index.get(file_path)
+        if indexed is not None:
+            return indexed.text, indexed.error
+        return self._parse_file(file_path)
 
-        scored_files.sort(key=lambda x: x[0], reverse=True)
-        return [file_path for _, file_path in scored_files[:max_files]]
+    def _find_relevant_files(self, query: str, max_files: int = 5) -> List[Path]:
+        """Find files whose content best matches the query (BM25 over sections)"""
+        return self.index.search_files(query, max_files)
+
+    def _select_sections(self, query: str, file_path: Optional[Path] = None) -> List[Section]:
+        """Best-matching sections, optionally of one file, that fit the token budget"""
+        ranked = self.index.search_sections(query, Config.READ_FILE_MAX_SECTIONS, file_path)
+        return pack_sections([section for section, _ in ranked], Config.READ_FILE_TOKEN_BUDGET)
+
+    def _read_specific_file(self, file_path: Path, query: str) -> Tuple[List[Section], Optional[str]]:
+        """Matching sections of one file, or its opening sections if none match"""
+        text, error = self._get_text(file_path)
+        if error:
+            return [], error
+        sections = self._select_sections(query, file_path)
+        if not sections:
+            indexed = self.index.get(file_path)
+            leading = indexed.sections if indexed is not None else split_sections(file_path, text)
+            sections = pack_sections(leading, Config.READ_FILE_TOKEN_BUDGET)
+        return sections, None
+
+    @staticmethod
+    def _format_sections(sections: List[Section]) -> str:
+        return "\n\n---\n\n".join(
+            f"From {section.file_path.name} ({section.title}):\n{section.text}" for section in sections)
+
+    def _summarize_sections(self, sections: List[Section], query: str) -> str:
+        """One LLM pass per file over just its selected sections, all files at once.
+
+        Waits at most Config.READ_FILE_SUMMARY_TIMEOUT seconds in total. A file
+        whose summary is not back by then is answered with its sections
+        verbatim, so a slow call costs detail rather than the whole answer.
+        """
+        by_file = {}
+        for section in sections:
+            by_file.setdefault(section.file_path, []).append(section)
+
+        futures = {}
+        for file_path, file_sections in by_file.items():
+            content = "\n\n".join(f"{section.title}\n{section.text}" for section in file_sections)
+            futures[file_path] = self.executor.submit(self._summarize_file, file_path, content, query)
+
+        done, _ = wait(futures.values(), timeout=Config.READ_FILE_SUMMARY_TIMEOUT)
+        results, timed_out = [], []
+        for file_path, future in futures.items():
+            if future in done:
+                self.stats["summaries"] += 1
+                results.append(f"From {file_path.name}:\n{future.result()}")
+            else:
+                # Not started yet: drop it; already running: its result is ignored
+                future.cancel()
+                self.stats["summary_timeouts"] += 1
+                timed_out.append(file_path.name)
+                results.append(self._format_sections(by_file[file_path]))
+        if timed_out:
+            print(f"Summaries of {', '.join(timed_out)} missed the "
+                  f"{Config.READ_FILE_SUMMARY_TIMEOUT:g}s deadline; returning their sections verbatim")
+        return "\n\n---\n\n".join(results)
+
+    def _answer(self, sections: List[Section], query: str) -> str:
+        if Config.READ_FILE_SUMMARIZE:
+            return self._summarize_sections(sections, query)
+        return self._format_sections(sections)
+
+    def _describe_files(self) -> str:
+        """File names and top-level headings, to help pick a specific_file or better terms"""
+        lines = []
+        for indexed in self.index.list_files():
+            titles = list(dict.fromkeys(section.title.split(" > ")[:2][-1] for section in indexed.sections))
+            lines.append(f"- {indexed.path.name}: {', '.join(titles[:8])}")
+        return "\n".join(lines)
+
+    def _summarize_file(self, file_path: Path, content: str, query: str) -> str:
+        """Summary of an excerpt of one file, reused for the same or a similar query"""
+        indexed = self.index.get(file_path)
+        if self.summary_cache is None or indexed is None or len(content) < 500:
+            return self._summarize_content(content, query)
+
+        # Different queries can select different sections of the same file
+        excerpt_hash = hashlib.sha256(content.encode("utf-8", "replace")).hexdigest()
+        summary = self.summary_cache.get(file_path, indexed.content_hash, excerpt_hash, query,
+                                         indexed.vocabulary)
+        if summary is None:
+            try:
+                summary = self._extract_relevant(content, query)
+            except Exception as e:
+                return self._summary_error(content, e)
+            self.summary_cache.put(file_path, indexed.content_hash, excerpt_hash, query, summary)
+        return summary
 
     def _summarize_content(self, content: str, query: str) -> str:
         """Use LLM to summarize relevant content"""
@@ -82,19 +167,26 @@ class ReadFileTool:
             return content
 
         try:
-            response = self.llm.invoke([
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that extracts relevant information from documents. Focus on information that directly answers or relates to the user's query. If no relevant information is found, say so clearly."
-                },
-                {
-                    "role": "user",
-                    "content": f"Query: {query}\n\nDocument Content:\n{content[:4000]}...\n\nPlease extract and summarize the information most relevant to the query."
-                }
-            ])
-            return response.content
+            return self._extract_relevant(content, query)
         except Exception as e:
-            return f"Error processing content: {str(e)}\n\nOriginal content (truncated):\n{content[:1000]}..."
+            return self._summary_error(content, e)
+
+    @staticmethod
+    def _summary_error(content: str, error: Exception) -> str:
+        return f"Error processing content: {str(error)}\n\nOriginal content (truncated):\n{content[:1000]}..."
+
+    def _extract_relevant(self, content: str, query: str) -> str:
+        response = self.llm.invoke([
+            {
+                "role": "system",
+                "content": "You are a helpful assistant that extracts relevant information from documents. Focus on information that directly answers or relates to the user's query. If no relevant information is found, say so clearly."
+            },
+            {
+                "role": "user",
+                "content": f"Query: {query}\n\nDocument Content:\n{content[:4000]}...\n\nPlease extract and summarize the information most relevant to the query."
+            }
+        ])
+        return response.content
 
 
 def create_read_file_tool(base_path: str, tool_name: str = "read_file"):
@@ -107,6 +199,8 @@ def create_read_file_tool(base_path: str, tool_name: str = "read_file"):
         """
         Read and search internal documentation files.
 
+        Returns the documentation sections that best match the query, verbatim.
+
         Args:
             query: The question or topic you're looking for information about
             specific_file: Optional specific filename to read (if you know the exact file)
@@ -116,28 +210,21 @@ def create_read_file_tool(base_path: str, tool_name: str = "read_file"):
         """
         try:
             if specific_file:
-                file_path = reader.base_path / specific_file
-                content = reader._read_file_content(file_path)
-                if "Error" in content or "not found" in content:
-                    return content
-                return reader._summarize_content(content, query)
+                sections, error = reader._read_specific_file(reader.base_path / specific_file, query)
+                if error:
+                    return error
+                return reader._answer(sections, query)
             else:
-                relevant_files = reader._find_relevant_files(query)
-
-                if not relevant_files:
-                    return f"No relevant documentation files found for query: '{query}' in {reader.base_path}"
-
-                results = []
-                for file_path in relevant_files:
-                    content = reader._read_file_content(file_path)
-                    if "Error" not in content and "not found" not in content:
-                        summary = reader._summarize_content(content, query)
-                        results.append(f"From {file_path.name}:\n{summary}")
+                sections = reader._select_sections(query)
 
-                if not results:
-                    return f"Found {len(relevant_files)} files but couldn't extract relevant information for: '{query}'"
+                if not sections:
+                    files = reader._describe_files()
+                    if not files:
+                        return f"No relevant documentation files found for query: '{query}' in {reader.base_path}"
+                    return (f"No documentation sections matched '{query}'. Available files and their topics:\n"
+                            f"{files}\n\nTry other keywords or pass specific_file.")
 
-                return "\n\n---\n\n".join(results)
+                return reader._answer(sections, query)
 
         except Exception as e:
             return f"Error accessing documentation: {str(e)}"
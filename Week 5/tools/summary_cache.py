@@ -0,0 +1,224 @@
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, List, Optional, Set
+from config import Config, get_azure_embeddings
+from tools.document_index import tokenize
+
+COUNTERS = ("lookups", "exact_hits", "similar_hits", "misses", "stores", "evictions", "invalidations")
+
+
+def normalize_query(query: str) -> str:
+    """Order- and stopword-insensitive form of a query"""
+    return " ".join(sorted(set(tokenize(query))))
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class SummaryCache:
+    """Persistent cache of LLM summaries keyed by (file content hash, excerpt hash, query).
+
+    The excerpt hash identifies the sections that were summarized, so a
+    summary is only reused for the same part of the same file content. A
+    lookup first tries the exact normalized query, then another query cached
+    for that excerpt: with an embedding deployment configured, one whose
+    embedding clears the cosine threshold; otherwise only one that uses
+    exactly the same terms found in the file, since near-identical wording
+    ("domestic" vs "international") can ask for different facts. An entry is
+    dropped as soon as its file is seen with a different hash, and the
+    least recently used entries are evicted beyond max_entries. Counters
+    are kept in the database so hit rates survive restarts.
+    """
+
+    def __init__(self, db_path: str, max_entries: Optional[int] = None,
+                 threshold: Optional[float] = None,
+                 embed: Optional[Callable[[str], List[float]]] = None):
+        # threshold is the minimum cosine similarity of query embeddings
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.max_entries = max_entries or Config.SUMMARY_CACHE_MAX_ENTRIES
+        self.embed = embed
+        self.threshold = Config.SUMMARY_CACHE_EMBEDDING_SIMILARITY if threshold is None else threshold
+        # Query embeddings, least recently used first; guarded by _embed_lock
+        self._embeddings: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._embed_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        columns = [row[1] for row in self._db.execute("PRAGMA table_info(summaries)")]
+        if columns and "excerpt_hash" not in columns:
+            # Written before entries were keyed by excerpt; it is only a cache
+            self._db.execute("DROP TABLE summaries")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS summaries (
+                file_path TEXT NOT NULL,
+                file_hash TEXT NOT NULL,
+                excerpt_hash TEXT NOT NULL,
+                query_key TEXT NOT NULL,
+                embedding TEXT,
+                summary TEXT NOT NULL,
+                created REAL NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (file_hash, excerpt_hash, query_key)
+            );
+            CREATE INDEX IF NOT EXISTS idx_summaries_path ON summaries(file_path);
+            CREATE INDEX IF NOT EXISTS idx_summaries_used ON summaries(last_used);
+            CREATE TABLE IF NOT EXISTS counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+        """)
+        self._db.commit()
+        self.prune_missing()
+
+    def _embed(self, query_key: str) -> Optional[List[float]]:
+        if self.embed is None or not query_key:
+            return None
+        with self._embed_lock:
+            embedding = self._embeddings.get(query_key)
+            if embedding is not None:
+                self._embeddings.move_to_end(query_key)
+                return embedding
+        # Embedded outside the lock; concurrent misses for one query may both call the API
+        try:
+            embedding = self.embed(query_key)
+        except Exception as e:
+            # Fall back to comparing terms for this query
+            print(f"Warning: could not embed query for the summary cache: {str(e)}")
+            return None
+        with self._embed_lock:
+            self._embeddings[query_key] = embedding
+            self._embeddings.move_to_end(query_key)
+            while len(self._embeddings) > 256:
+                self._embeddings.popitem(last=False)
+        return embedding
+
+    def _count(self, name: str, amount: int = 1):
+        self._db.execute("INSERT INTO counters (name, value) VALUES (?, ?) "
+                         "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, amount))
+
+    def _invalidate_locked(self, file_path: str, file_hash: str):
+        removed = self._db.execute("DELETE FROM summaries WHERE file_path = ? AND file_hash != ?",
+                                   (file_path, file_hash)).rowcount
+        if removed:
+            self._count("invalidations", removed)
+
+    def get(self, file_path: Path, file_hash: str, excerpt_hash: str, query: str,
+            vocabulary: Optional[Set[str]] = None) -> Optional[str]:
+        """Cached summary of this excerpt for the query or an equivalent one"""
+        query_key = normalize_query(query)
+        embedding = self._embed(query_key)
+        with self._lock:
+            self._invalidate_locked(os.path.abspath(file_path), file_hash)
+            self._count("lookups")
+            rows = self._db.execute(
+                "SELECT query_key, embedding, summary FROM summaries WHERE file_hash = ? AND excerpt_hash = ?",
+                (file_hash, excerpt_hash)).fetchall()
+            terms = set(query_key.split())
+            if vocabulary is not None:
+                terms &= vocabulary
+            best_key, best_summary, best_score = None, None, self.threshold
+            exact = False
+            for key, stored_embedding, summary in rows:
+                if key == query_key:
+                    best_key, best_summary, exact = key, summary, True
+                    break
+                if embedding is not None and stored_embedding:
+                    score = _cosine(embedding, json.loads(stored_embedding))
+                    if score >= best_score:
+                        best_key, best_summary, best_score = key, summary, score
+                elif best_key is None and vocabulary is not None and terms:
+                    # Without embeddings only wording the file does not contain may differ
+                    if set(key.split()) & vocabulary == terms:
+                        best_key, best_summary = key, summary
+
+            if best_key is None:
+                self._count("misses")
+            else:
+                self._count("exact_hits" if exact else "similar_hits")
+                self._db.execute("UPDATE summaries SET last_used = ? "
+                                 "WHERE file_hash = ? AND excerpt_hash = ? AND query_key = ?",
+                                 (time.time(), file_hash, excerpt_hash, best_key))
+            self._db.commit()
+            return best_summary
+
+    def put(self, file_path: Path, file_hash: str, excerpt_hash: str, query: str, summary: str):
+        query_key = normalize_query(query)
+        embedding = self._embed(query_key)
+        now = time.time()
+        with self._lock:
+            self._invalidate_locked(os.path.abspath(file_path), file_hash)
+            self._db.execute(
+                "INSERT OR REPLACE INTO summaries "
+                "(file_path, file_hash, excerpt_hash, query_key, embedding, summary, created, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (os.path.abspath(file_path), file_hash, excerpt_hash, query_key,
+                 json.dumps(embedding) if embedding is not None else None, summary, now, now))
+            self._count("stores")
+            (total,) = self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()
+            if total > self.max_entries:
+                evicted = self._db.execute(
+                    "DELETE FROM summaries WHERE rowid IN "
+                    "(SELECT rowid FROM summaries ORDER BY last_used LIMIT ?)",
+                    (total - self.max_entries,)).rowcount
+                self._count("evictions", evicted)
+            self._db.commit()
+
+    def prune_missing(self):
+        """Drop summaries of files that no longer exist"""
+        with self._lock:
+            paths = [path for (path,) in self._db.execute("SELECT DISTINCT file_path FROM summaries")
+                     if not os.path.exists(path)]
+            removed = sum(self._db.execute("DELETE FROM summaries WHERE file_path = ?", (path,)).rowcount
+                          for path in paths)
+            if removed:
+                self._count("invalidations", removed)
+            self._db.commit()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            stats = dict.fromkeys(COUNTERS, 0)
+            stats.update(self._db.execute("SELECT name, value FROM counters").fetchall())
+            (stats["entries"],) = self._db.execute("SELECT COUNT(*) FROM summaries").fetchone()
+        hits = stats["exact_hits"] + stats["similar_hits"]
+        stats["hit_rate"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        # Every hit is a summarization the LLM did not have to do
+        stats["llm_calls_saved"] = hits
+        return stats
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM summaries")
+            self._db.execute("DELETE FROM counters")
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def get_summary_cache() -> Optional[SummaryCache]:
+    """The process-wide summary cache, or None when SUMMARY_CACHE_PATH is empty"""
+    global _shared_cache
+    if not Config.SUMMARY_CACHE_PATH:
+        return None
+    with _shared_lock:
+        if _shared_cache is None:
+            embeddings = get_azure_embeddings()
+            _shared_cache = SummaryCache(Config.SUMMARY_CACHE_PATH,
+                                         embed=embeddings.embed_query if embeddings is not None else None)
+        return _shared_cache
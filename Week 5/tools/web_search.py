@@ -1,15 +1,71 @@
-from typing import List, Dict, Any
+import hashlib
+import json
+import threading
+from typing import List, Dict, Any, Optional, Tuple
 from langchain_core.tools import tool
 from ddgs import DDGS
 from config import get_azure_model, Config
+from tools.ttl_cache import TTLCache
 
 
-class WebSearchTool:
-    """Tool for searching the web using DuckDuckGo"""
+def _succeeded(results: List[Dict[str, Any]]) -> bool:
+    return not any('error' in result for result in results)
+
+
+_shared_caches = None
+_shared_lock = threading.Lock()
+
+
+def get_web_search_caches() -> Tuple[TTLCache, TTLCache]:
+    """The process-wide (search results, analysis) caches.
 
-    def __init__(self):
-        self.llm = get_azure_model()
-        self.ddgs = DDGS()
+    Every Streamlit session builds its own agents and tools, so the caches
+    and their in-flight requests live here for repeated questions from
+    different users to share them.
+    """
+    global _shared_caches
+    with _shared_lock:
+        if _shared_caches is None:
+            _shared_caches = (
+                TTLCache(Config.WEB_SEARCH_CACHE_TTL_SECONDS, Config.WEB_SEARCH_CACHE_MAX_ENTRIES),
+                TTLCache(Config.WEB_ANALYSIS_CACHE_TTL_SECONDS, Config.WEB_SEARCH_CACHE_MAX_ENTRIES))
+        return _shared_caches
+
+
+class WebSearchTool:
+    """Tool for searching the web using DuckDuckGo.
+
+    Raw results are cached per search query and the LLM analysis per
+    (context, query, results), each for its own TTL; concurrent identical
+    searches share one request. The caches are process-wide unless given.
+    backend can be any object with the DDGS.text signature, e.g. a local
+    fake for tests.
+    """
+
+    def __init__(self, backend=None, llm=None, caches: Optional[Tuple[TTLCache, TTLCache]] = None):
+        self.llm = llm if llm is not None else get_azure_model()
+        self.ddgs = backend if backend is not None else DDGS()
+        self.search_cache, self.analysis_cache = caches if caches is not None else get_web_search_caches()
+
+    def _cached_search(self, query: str, max_results: int = None) -> List[Dict[str, Any]]:
+        """_search_web through the result cache; failed searches are not cached"""
+        if max_results is None:
+            max_results = Config.MAX_SEARCH_RESULTS
+        key = (" ".join(query.lower().split()), max_results)
+        return self.search_cache.get_or_load(key, lambda: self._search_web(query, max_results), _succeeded)
+
+    def _cached_analysis(self, results: List[Dict[str, Any]], query: str, context: str) -> str:
+        """_analyze_search_results through the analysis cache"""
+        if not results or not _succeeded(results):
+            return self._analyze_search_results(results, query, context)
+        fingerprint = hashlib.sha256(json.dumps(results, sort_keys=True).encode()).hexdigest()
+        key = (context.lower(), " ".join(query.lower().split()), fingerprint)
+        return self.analysis_cache.get_or_load(
+            key, lambda: self._analyze_search_results(results, query, context),
+            lambda summary: not summary.startswith("Error analyzing search results:"))
+
+    def get_stats(self) -> dict:
+        return {"search": self.search_cache.get_stats(), "analysis": self.analysis_cache.get_stats()}
 
     def _search_web(self, query: str, max_results: int = None) -> List[Dict[str, Any]]:
         """Perform web search using DuckDuckGo"""
@@ -70,10 +126,11 @@ class WebSearchTool:
             return f"Error analyzing search results: {str(e)}\n\nRaw results:\n{search_content[:1000]}..."
 
 
-def create_web_search_tool(context: str, tool_name: str = "web_search"):
+def create_web_search_tool(context: str, tool_name: str = "web_search", backend=None, llm=None,
+                           caches: Optional[Tuple[TTLCache, TTLCache]] = None):
     """Create a WebSearch tool for a specific context (IT or Finance)"""
 
-    searcher = WebSearchTool()
+    searcher = WebSearchTool(backend, llm, caches)
 
     @tool
     def web_search(query: str) -> str:
@@ -93,9 +150,9 @@ def create_web_search_tool(context: str, tool_name: str = "web_search"):
                 enhanced_query = f"{query} finance business accounting guide"
             else:
                 enhanced_query = query
-            results = searcher._search_web(enhanced_query)
+            results = searcher._cached_search(enhanced_query)
 
-            summary = searcher._analyze_search_results(results, query, context)
+            summary = searcher._cached_analysis(results, query, context)
 
             return summary
 